@@ -1,7 +1,10 @@
+import logging
 import os
 from typing import Dict, Any, List, Optional, Union
 from anthropic import Anthropic
 from db import get_db
+from tools.template_cache import template_cache
+from utils.category_normalizer import apply_category_key, category_key_for_update, normalize_category, touches_category
 import json
 import base64
 from PIL import Image
@@ -15,6 +18,7 @@ class BaseAgent:
     def __init__(self, name: str, system_message: str, model: str = "claude-3-5-haiku-20241022"):
         self.name = name
         self.model = model
+        self.logger = logging.getLogger(type(self).__module__)
         self.claude_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
         self.db = get_db()
     
@@ -97,14 +101,14 @@ class BaseAgent:
             # Debug: Log LLM response for all agents inheriting from BaseAgent
             agent_name = self.__class__.__name__
             response_text = self._extract_response_text(response)
-            print(f"DEBUG: {agent_name} LLM Response Length: {len(response_text)} chars")
-            print(f"DEBUG: {agent_name} LLM Response Preview: {response_text[:200]}...")
+            self.logger.debug("%s LLM Response Length: %s chars", agent_name, len(response_text))
+            self.logger.debug("%s LLM Response Preview: %s...", agent_name, response_text[:200])
             
             # Only log full response if it's very short (for debugging)
             if len(response_text) < 1000:
-                print(f"DEBUG: {agent_name} Full Response: {response_text}")
+                self.logger.debug("%s Full Response: %s", agent_name, response_text)
             else:
-                print(f"DEBUG: {agent_name} Response truncated for logging (too long)")
+                self.logger.debug("%s Response truncated for logging (too long)", agent_name)
             
             # If JSON extraction is requested, parse the response
             if extract_json and enable_cot:
@@ -115,7 +119,7 @@ class BaseAgent:
             return response_text
             
         except Exception as e:
-            print(f"Error calling Claude API: {e}")
+            self.logger.error(f"Error calling Claude API: {e}")
             return f"Error: {str(e)}"
     
     def _add_cot_instructions(self, prompt: str) -> str:
@@ -203,10 +207,10 @@ ANSWER:
     def get_templates_by_category(self, category: str) -> List[Dict[str, Any]]:
         """Get UI templates by category from database"""
         try:
-            templates = list(self.db.templates.find({"category": category}))
+            templates = list(self.db.templates.find({"category_key": normalize_category(category)}))
             return templates
         except Exception as e:
-            print(f"Error fetching templates: {e}")
+            self.logger.error(f"Error fetching templates: {e}")
             return []
     
     def save_template(self, template_data: Dict[str, Any]) -> str:
@@ -215,10 +219,12 @@ ANSWER:
             from datetime import datetime
             template_data["created_at"] = datetime.utcnow()
             template_data["updated_at"] = datetime.utcnow()
+            apply_category_key(template_data)
             result = self.db.templates.insert_one(template_data)
+            template_cache.invalidate(str(result.inserted_id))
             return str(result.inserted_id)
         except Exception as e:
-            print(f"Error saving template: {e}")
+            self.logger.error(f"Error saving template: {e}")
             return None
     
     def update_template(self, template_id: str, updates: Dict[str, Any]) -> bool:
@@ -226,13 +232,18 @@ ANSWER:
         try:
             from datetime import datetime
             updates["updated_at"] = datetime.utcnow()
+            if touches_category(updates):
+                # metadata.category wins over category, so the key depends on the stored document too
+                current = self.db.templates.find_one({"_id": template_id}, {"category": 1, "metadata.category": 1})
+                updates["category_key"] = category_key_for_update(updates, current)
             result = self.db.templates.update_one(
                 {"_id": template_id},
                 {"$set": updates}
             )
+            template_cache.invalidate(str(template_id))
             return result.modified_count > 0
         except Exception as e:
-            print(f"Error updating template: {e}")
+            self.logger.error(f"Error updating template: {e}")
             return False 
     
     def process_tool_results(self, tool_result: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
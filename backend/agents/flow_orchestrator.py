@@ -4,7 +4,6 @@ Follows single responsibility principle: Only handles coordination
 """
 
 import logging
-import uuid
 import re
 import time
 from typing import Any, Dict, List, Optional, Union
@@ -18,8 +17,32 @@ from .question_generation_agent import QuestionGenerationAgent
 from .user_proxy_agent import UserProxyAgent
 from .ui_editing_agent import UIEditingAgent
 from tools.report_generator import ReportGenerator
+from tools.async_tools import AsyncToolProxy
 from config.keyword_config import KeywordManager
 from session_manager import session_manager
+from session_store import SessionVersionConflict
+from utils.conversation_history import conversation_history
+from utils.logging_config import bind_session_id
+
+MAX_SESSION_SAVE_ATTEMPTS = 3
+# A bare number ("2", "#2", "2.") or one named as an option ("option 2", "version 2")
+CHOICE_NUMBER_PATTERN = re.compile(r"^#?(\d+)[.)!]?$|\b(?:option|version|variant|number|choice)\s*#?(\d+)\b")
+
+
+def _field_fingerprint(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _unsaved_entries(local: List[Dict[str, Any]], stored: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Trailing local history entries that the stored history does not contain yet"""
+    stored_fingerprints = {_field_fingerprint(entry) for entry in stored}
+    unsaved = []
+    for entry in reversed(local):
+        if _field_fingerprint(entry) in stored_fingerprints:
+            break
+        unsaved.append(entry)
+    unsaved.reverse()
+    return unsaved
 
 class FlowOrchestrator:
     """Intelligent orchestrator for the UI mockup generation workflow"""
@@ -27,39 +50,105 @@ class FlowOrchestrator:
         self.logger = logging.getLogger(__name__)
         self.requirements_agent = RequirementsAnalysisAgent()
         self.recommendation_agent = TemplateRecommendationAgent()
+        # Recommendations query MongoDB; async handlers await them on the database executor
+        self.async_recommendation_agent = AsyncToolProxy(self.recommendation_agent)
         self.question_agent = QuestionGenerationAgent()
         self.user_proxy_agent = UserProxyAgent()
         self.report_agent = ReportGenerator()
         
         self.keyword_manager = KeywordManager()
         
+        self._session_version = None
+        self._field_fingerprints: Dict[str, str] = {}
+        self._persisted_history_len = 0
+        
         if session_id:
             self.session_id = session_id
-            session_data = session_manager.get_session(session_id)
+            loaded = session_manager.load_session(session_id)
+            session_data = loaded[0] if loaded else None
             if session_data:
-                self.session_state = session_data
-                print(f"DEBUG ORCHESTRATOR: Loaded existing session {session_id}")
-                print(f"DEBUG ORCHESTRATOR: Session state keys: {list(self.session_state.keys())}")
-                print(f"DEBUG ORCHESTRATOR: Current phase: {self.session_state.get('current_phase', 'NOT_SET')}")
-                print(f"DEBUG ORCHESTRATOR: Session data loaded from manager with {len(session_data.keys())} keys")
+                self._track_loaded_session(session_data, loaded[1])
+                self.logger.debug("Loaded existing session %s", session_id)
+                self.logger.debug("Session state keys: %s", list(self.session_state.keys()))
+                self.logger.debug("Current phase: %s", self.session_state.get('current_phase', 'NOT_SET'))
+                self.logger.debug("Session data loaded from manager with %s keys", len(session_data.keys()))
             else:
-                self.session_id = session_manager.create_session()
-                self.session_state = session_manager.get_session(self.session_id)
-                print(f"DEBUG ORCHESTRATOR: Created new session {self.session_id} (existing not found)")
-                print(f"DEBUG ORCHESTRATOR: New session state created with {len(self.session_state.keys())} keys")
+                self._create_session()
+                self.logger.debug("Created new session %s (existing not found)", self.session_id)
+                self.logger.debug("New session state created with %s keys", len(self.session_state.keys()))
         else:
-            self.session_id = session_manager.create_session()
-            self.session_state = session_manager.get_session(self.session_id)
-            print(f"DEBUG ORCHESTRATOR: Created new session {self.session_id} (no session_id provided)")
+            self._create_session()
+            self.logger.debug("Created new session %s (no session_id provided)", self.session_id)
+        
+        bind_session_id(self.session_id)
         
         if 'current_phase' not in self.session_state:
             self.session_state['current_phase'] = 'initial'
-            print(f"DEBUG ORCHESTRATOR: Set default current_phase to 'initial'")
+            self.logger.debug("Set default current_phase to 'initial'")
         
         self.editing_agent = UIEditingAgent(session_id=self.session_id)
         
         self.phases = ["initial", "requirements", "template_recommendation", "template_selection", "editing", "report_generation"]
     
+    def _create_session(self):
+        self.session_id = session_manager.create_session()
+        state, version = session_manager.load_session(self.session_id)
+        self._track_loaded_session(state, version)
+    
+    def _track_loaded_session(self, state: Dict[str, Any], version: int):
+        """Remember what was loaded so persist_session only writes changed fields"""
+        self.session_state = state
+        self._session_version = version
+        self._field_fingerprints = {name: _field_fingerprint(value) for name, value in state.items()}
+        self._persisted_history_len = len(state.get("conversation_history", []))
+    
+    def persist_session(self) -> bool:
+        """Write the fields changed during this request back to the shared session store"""
+        changed = {
+            name: value for name, value in self.session_state.items()
+            if name != "conversation_history" and _field_fingerprint(value) != self._field_fingerprints.get(name)
+        }
+        history = self.session_state.get("conversation_history", [])
+        if len(history) != self._persisted_history_len:
+            # History was replaced rather than appended through _add_to_conversation_history
+            changed["conversation_history"] = history
+        if not changed:
+            return True
+        
+        for _ in range(MAX_SESSION_SAVE_ATTEMPTS):
+            try:
+                self._session_version = session_manager.save_fields(self.session_id, changed, self._session_version)
+                for name, value in changed.items():
+                    self._field_fingerprints[name] = _field_fingerprint(value)
+                self._persisted_history_len = len(history)
+                return True
+            except SessionVersionConflict as e:
+                # Another worker saved this session; keep its fields and re-apply ours on top
+                self.logger.warning(f"Session {self.session_id} changed concurrently, merging: {e}")
+                loaded = session_manager.load_session(self.session_id)
+                if not loaded:
+                    break
+                state, version = loaded
+                if "conversation_history" in changed:
+                    # Background compaction may have summarised the stored history meanwhile; writing the
+                    # local list back would undo that, so only append the entries the store is missing
+                    stored = state.get("conversation_history", [])
+                    unsaved = _unsaved_entries(changed.pop("conversation_history"), stored)
+                    if unsaved and not session_manager.append_history(self.session_id, unsaved):
+                        self.logger.error(f"Session {self.session_id} no longer exists, state not saved")
+                        return False
+                    state["conversation_history"] = stored + unsaved
+                state.update(changed)
+                self._track_loaded_session(state, version)
+                history = self.session_state.get("conversation_history", [])
+                if not changed:
+                    return True
+            except KeyError:
+                self.logger.error(f"Session {self.session_id} no longer exists, state not saved")
+                return False
+        self.logger.error(f"Could not save session {self.session_id} after {MAX_SESSION_SAVE_ATTEMPTS} attempts")
+        return False
+    
     def _extract_response_text(self, response) -> str:
         """Extract text from Claude response, handling different content types"""
         if not response.content:
@@ -86,12 +175,17 @@ class FlowOrchestrator:
     
     def _add_to_conversation_history(self, message: str, role: str):
         """Add message to conversation history"""
-        self.session_state["conversation_history"].append({
+        entry = {
             "role": role,
             "content": message,
             "timestamp": datetime.now().isoformat()
-        })
-        session_manager.update_session(self.session_id, self.session_state)
+        }
+        history = self.session_state.setdefault("conversation_history", [])
+        history.append(entry)
+        if session_manager.append_history(self.session_id, [entry]):
+            self._persisted_history_len += 1
+            # Older turns are summarised in the background once the window overflows
+            conversation_history.maybe_schedule(self.session_id, len(history))
     
     async def process_user_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Main entry point: Coordinate workflow between focused agents"""
@@ -113,12 +207,12 @@ class FlowOrchestrator:
             initial_intent = None
             if current_phase in ["initial", "unknown"]:
                 initial_intent = await self._detect_initial_intent(message, context)
-                print(f"DEBUG: Detected initial intent: {initial_intent}")
+                self.logger.debug("Detected initial intent: %s", initial_intent)
             else:
-                print(f"DEBUG: Skipping initial intent detection for phase: {current_phase}")
+                self.logger.debug("Skipping initial intent detection for phase: %s", current_phase)
                 
-            print(f"DEBUG: Current phase: {current_phase}")
-            print(f"DEBUG: Session state keys: {list(self.session_state.keys())}")
+            self.logger.debug("Current phase: %s", current_phase)
+            self.logger.debug("Session state keys: %s", list(self.session_state.keys()))
             
             if current_phase == "initial":
                 return await self._handle_initial_intent_phase(message, initial_intent, context)
@@ -148,6 +242,8 @@ class FlowOrchestrator:
                 "session_id": self.session_id,
                 "error": str(e)
             }
+        finally:
+            self.persist_session()
     
     async def _is_ui_modification_request(self, message: str) -> bool:
         """
@@ -165,7 +261,7 @@ class FlowOrchestrator:
             
             for pattern in completion_patterns:
                 if re.search(pattern, message_lower):
-                    self.logger.debug(f"Completion request detected with pattern: {pattern}, NOT treating as UI modification")
+                    self.logger.debug("Completion request detected with pattern: %s, NOT treating as UI modification", pattern)
                     return False
             
             modification_patterns = [
@@ -187,7 +283,7 @@ class FlowOrchestrator:
             
             for pattern in modification_patterns:
                 if re.search(pattern, message_lower):
-                    self.logger.debug(f"UI modification detected with pattern: {pattern}")
+                    self.logger.debug("UI modification detected with pattern: %s", pattern)
                     return True
                     
             return False
@@ -199,7 +295,7 @@ class FlowOrchestrator:
     async def _handle_initial_intent_phase(self, message: str, initial_intent: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle the initial intent detection phase"""
         
-        print(f"DEBUG: Entering _handle_initial_intent_phase with intent: {initial_intent}")
+        self.logger.debug("Entering _handle_initial_intent_phase with intent: %s", initial_intent)
         
         self.session_state["initial_intent"] = initial_intent
         
@@ -213,7 +309,7 @@ class FlowOrchestrator:
             
             self.session_state["current_phase"] = "requirements"
             
-            print(f"DEBUG: Transitioning to requirements phase with enhanced_context: {enhanced_context}")
+            self.logger.debug("Transitioning to requirements phase with enhanced_context: %s", enhanced_context)
             return await self._handle_requirements_phase(message, enhanced_context)
             
         elif initial_intent == "requirements_analysis":
@@ -258,26 +354,29 @@ class FlowOrchestrator:
         """Handle requirements analysis phase using intelligent orchestration"""
         
         phase_start_time = time.time()
-        print(f"DEBUG: Starting requirements phase execution...")
+        self.logger.debug("Starting requirements phase execution...")
         
         phase_decision = await self._analyze_phase_requirements(message, context)
-        print(f"DEBUG: Phase decision for requirements phase: {phase_decision}")
+        self.logger.debug("Phase decision for requirements phase: %s", phase_decision)
         
         if phase_decision.get("context_updates"):
             self.session_state.update(phase_decision["context_updates"])
         
-        print(f"DEBUG: Required agents for pipeline: {phase_decision['required_agents']}")
+        self.logger.debug("Required agents for pipeline: %s", phase_decision['required_agents'])
         pipeline_start_time = time.time()
-        pipeline_result = self._execute_agent_pipeline(
+        # The pipeline makes blocking LLM and MongoDB calls; run it on a worker thread rather than the
+        # bounded database executor, which would be held for the whole multi-second pipeline
+        pipeline_result = await asyncio.to_thread(
+            self._execute_agent_pipeline,
             phase_decision["required_agents"], 
             message, 
             context or {}
         )
         pipeline_end_time = time.time()
-        print(f"DEBUG: Agent pipeline completed in {pipeline_end_time - pipeline_start_time:.2f} seconds")
-        print(f"DEBUG: Pipeline result success: {pipeline_result['success']}")
-        print(f"DEBUG: Pipeline result keys: {pipeline_result.keys()}")
-        print(f"DEBUG: Pipeline final_output: {pipeline_result.get('final_output', 'None')}")
+        self.logger.debug("Agent pipeline completed in %.2f seconds", pipeline_end_time - pipeline_start_time)
+        self.logger.debug("Pipeline result success: %s", pipeline_result['success'])
+        self.logger.debug("Pipeline result keys: %s", pipeline_result.keys())
+        self.logger.debug("Pipeline final_output: %s", pipeline_result.get('final_output', 'None'))
         
         if not pipeline_result["success"]:
             response = self.user_proxy_agent.create_response_from_instructions(
@@ -396,7 +495,7 @@ class FlowOrchestrator:
         
         # Log total phase execution time
         phase_end_time = time.time()
-        print(f"DEBUG: Requirements phase total execution time: {phase_end_time - phase_start_time:.2f} seconds")
+        self.logger.debug("Requirements phase total execution time: %.2f seconds", phase_end_time - phase_start_time)
         
         return {
             "success": True,
@@ -470,7 +569,7 @@ class FlowOrchestrator:
                 context={"existing_requirements": current_requirements, "session_id": self.session_id}
             )
             
-            filtered_recommendations = self.recommendation_agent.recommend_templates(
+            filtered_recommendations = await self.async_recommendation_agent.recommend_templates(
                 updated_requirements, 
                 context={"existing_templates": current_recommendations, "session_id": self.session_id}
             )
@@ -543,7 +642,7 @@ class FlowOrchestrator:
         
         updated_requirements = self.requirements_agent.analyze_requirements(message, context=context)
         
-        recommendations = self.recommendation_agent.recommend_templates(updated_requirements, context=context)
+        recommendations = await self.async_recommendation_agent.recommend_templates(updated_requirements, context=context)
         questions_data = self.question_agent.generate_questions(recommendations, updated_requirements)
         
         # Update session state with the results
@@ -590,8 +689,8 @@ class FlowOrchestrator:
             
             if selected_template:
                 self.session_state["selected_template"] = selected_template
-                # Store in global session manager
-                session_manager.set_selected_template(self.session_id, selected_template)
+                self.session_state["current_phase"] = "template_selection"
+                self.persist_session()
                 self.logger.info(f"Template selected: {selected_template.get('name', 'Unknown')}")
                 
                 # Trigger Phase 2 transition
@@ -605,8 +704,8 @@ class FlowOrchestrator:
             # Auto-select the first/best template
             selected_template = recommendations[0]
             self.session_state["selected_template"] = selected_template
-            # Store in global session manager
-            session_manager.set_selected_template(self.session_id, selected_template)
+            self.session_state["current_phase"] = "template_selection"
+            self.persist_session()
             self.logger.info(f"Auto-selected template: {selected_template.get('name', 'Unknown')}")
             
             # Trigger Phase 2 transition
@@ -702,11 +801,13 @@ class FlowOrchestrator:
         # Step 1: Check for pending clarification response
         pending_clarification = self.session_state.get("pending_clarification")
         if pending_clarification:
-            print(f"DEBUG ORCHESTRATOR: Found pending clarification, handling user response")
-            return await self._handle_clarification_user_response(message, selected_template, context)
+            self.logger.debug("Found pending clarification, handling user response")
+            result = await self._handle_clarification_user_response(message, selected_template, context)
+            if result is not None:
+                return result
         
         # Enhanced intent detection
-        editing_intent = await self._detect_editing_intent_advanced(message, selected_template)
+        editing_intent = self._detect_editing_intent_advanced(message, selected_template)
         
         if editing_intent == "modification_request":
             return await self._handle_modification_request(message, selected_template, context)
@@ -804,8 +905,8 @@ Return ONLY the intent type (e.g., "modification_request").
             response = self.requirements_agent.call_claude_with_cot(prompt, enable_cot=False)
             intent = self._extract_intent_from_response(response, ["modification_request", "clarification_request", "preview_request", "completion_request", "general_request"])
             
-            print(f"DEBUG ORCHESTRATOR: Intent detection response: '{response}'")
-            print(f"DEBUG ORCHESTRATOR: Parsed intent: '{intent}'")
+            self.logger.debug("Intent detection response: '%s'", response)
+            self.logger.debug("Parsed intent: '%s'", intent)
             
             return intent
             
@@ -816,25 +917,26 @@ Return ONLY the intent type (e.g., "modification_request").
     async def _handle_modification_request(self, message: str, selected_template: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle specific modification requests with enhanced coordination"""
         try:
-            print(f"DEBUG ORCHESTRATOR: _handle_modification_request called with message: {message}")
+            self.logger.debug("_handle_modification_request called with message: %s", message)
             
             current_ui_state = await self._get_current_ui_state(selected_template)
-            print(f"DEBUG ORCHESTRATOR: Current UI state loaded, HTML length: {len(current_ui_state.get('html_export', ''))}")
-            print(f"DEBUG ORCHESTRATOR: Current UI state CSS length: {len(current_ui_state.get('style_css', ''))}")
-            print(f"DEBUG ORCHESTRATOR: Current UI state keys: {list(current_ui_state.keys())}")
+            self.logger.debug("Current UI state loaded, HTML length: %s", len(current_ui_state.get('html_export', '')))
+            self.logger.debug("Current UI state CSS length: %s", len(current_ui_state.get('style_css', '')))
+            self.logger.debug("Current UI state keys: %s", list(current_ui_state.keys()))
             
             # Use UI editing agent
-            print(f"DEBUG ORCHESTRATOR: Calling UI editing agent...")
+            self.logger.debug("Calling UI editing agent...")
             modification_result = self.editing_agent.process_modification_request(message, current_ui_state, self.session_state)
-            print(f"DEBUG ORCHESTRATOR: UI editing agent returned: {bool(modification_result)}")
+            self.logger.debug("UI editing agent returned: %s", bool(modification_result))
             if modification_result:
-                print(f"DEBUG ORCHESTRATOR: Modification success: {modification_result.get('success', False)}")
-                print(f"DEBUG ORCHESTRATOR: Has modified_template: {bool(modification_result.get('modified_template'))}")
-                print(f"DEBUG ORCHESTRATOR: Clarification needed: {modification_result.get('clarification_needed', False)}")
+                self.logger.debug("Modification success: %s", modification_result.get('success', False))
+                self.logger.debug("Has modified_template: %s", bool(modification_result.get('modified_template')))
+                self.logger.debug("Clarification needed: %s", modification_result.get('clarification_needed', False))
             
-            if modification_result.get("clarification_needed", False):
-                print(f"DEBUG ORCHESTRATOR: Clarification needed detected, handling clarification request")
-                return await self._handle_editing_clarification_response(modification_result, selected_template, context)
+            if modification_result.get("clarification_needed", False) or modification_result.get("requires_clarification", False):
+                self.logger.debug("Clarification needed detected, handling clarification request")
+                modification_result.setdefault("user_feedback", message)
+                return await self._handle_editing_clarification_response(modification_result, selected_template, context, current_ui_state)
             
             if not modification_result.get("success", False):
                 # Handle modification failure
@@ -865,8 +967,8 @@ Return ONLY the intent type (e.g., "modification_request").
                     }
                 }
                 
-                print(f"DEBUG ORCHESTRATOR: Prepared template data for saving - HTML length: {len(complete_template_data.get('html_export', ''))}")
-                print(f"DEBUG ORCHESTRATOR: Template data keys: {list(complete_template_data.keys())}")
+                self.logger.debug("Prepared template data for saving - HTML length: %s", len(complete_template_data.get('html_export', '')))
+                self.logger.debug("Template data keys: %s", list(complete_template_data.keys()))
                 
                 # Save modified template
                 await self._save_template_to_file(complete_template_data)
@@ -900,18 +1002,28 @@ Return ONLY the intent type (e.g., "modification_request").
                 "phase": "editing"
             }
     
-    async def _handle_editing_clarification_response(self, modification_result: Dict[str, Any], selected_template: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def _handle_editing_clarification_response(self, modification_result: Dict[str, Any], selected_template: Dict[str, Any], context: Optional[Dict[str, Any]] = None, current_ui_state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle clarification responses from the UI editing agent"""
         try:
-            print(f"DEBUG ORCHESTRATOR: Handling clarification response")
+            self.logger.debug("Handling clarification response")
             
             # Extract clarification information
             clarification_options = modification_result.get("clarification_options", [])
             error_message = modification_result.get("error", "Multiple possible targets found")
+            original_request = modification_result.get("original_request") or modification_result.get("user_feedback", "")
+            
+            # Variant mode: execute every option in parallel and let the user pick a rendered result
+            if self._variant_mode_enabled() and clarification_options and current_ui_state:
+                variant_response = await self._generate_edit_variants(
+                    original_request, clarification_options, current_ui_state,
+                    modification_result.get("modification_plan"), selected_template
+                )
+                if variant_response:
+                    return variant_response
             
             # Store clarification context
             self.session_state["pending_clarification"] = {
-                "original_request": modification_result.get("user_feedback", ""),
+                "original_request": original_request,
                 "clarification_options": clarification_options,
                 "original_template": modification_result.get("original_template", {}),
                 "timestamp": datetime.now().isoformat()
@@ -923,7 +1035,7 @@ Return ONLY the intent type (e.g., "modification_request").
                 "error_message": error_message,
                 "clarification_options": clarification_options,
                 "template": selected_template,
-                "original_request": modification_result.get("user_feedback", "")
+                "original_request": original_request
             })
             
             self._add_to_conversation_history(response, "assistant")
@@ -947,10 +1059,158 @@ Return ONLY the intent type (e.g., "modification_request").
                 "phase": "editing"
             }
     
+    def _variant_mode_enabled(self) -> bool:
+        """Check whether ambiguous edits should be answered with rendered variants"""
+        import os
+        setting = self.session_state.get("variant_mode")
+        if setting is None:
+            setting = os.getenv("UI_EDIT_VARIANT_MODE", "true").lower() == "true"
+        return bool(setting)
+    
+    async def _generate_edit_variants(self, original_request: str, clarification_options: List[Dict[str, Any]], current_ui_state: Dict[str, Any], modification_plan: Optional[Dict[str, Any]], selected_template: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run clarification options as parallel edits and render each one for side-by-side comparison"""
+        try:
+            variant_result = await asyncio.to_thread(
+                self.editing_agent.process_variant_request,
+                original_request, current_ui_state, clarification_options, modification_plan
+            )
+            if not variant_result.get("success"):
+                self.logger.warning(f"Variant generation failed, falling back to clarification: {variant_result.get('error')}")
+                return None
+            
+            variants = [variant for variant in variant_result.get("variants", []) if variant.get("success")]
+            if not variants:
+                self.logger.warning("No variant succeeded, falling back to clarification")
+                return None
+            
+            # Render all variants through the bounded screenshot pool
+            from services.screenshot_service import get_screenshot_service
+            screenshot_service = await get_screenshot_service()
+            screenshots = await screenshot_service.generate_screenshots_batch(
+                [
+                    {
+                        "html": variant["modified_template"]["html_export"],
+                        "css": variant["modified_template"]["globals_css"] + "\n" + variant["modified_template"]["style_css"]
+                    }
+                    for variant in variants
+                ],
+                self.session_id
+            )
+            
+            # Keep the code in session state, send previews only in the response
+            self.session_state["pending_clarification"] = {
+                "original_request": original_request,
+                "clarification_options": [variant["option"] for variant in variants],
+                "variants": [
+                    {
+                        "variant_id": variant["variant_id"],
+                        "label": variant.get("label"),
+                        "request": variant.get("request"),
+                        "modified_template": variant["modified_template"],
+                        "changes_summary": variant.get("changes_summary", [])
+                    }
+                    for variant in variants
+                ],
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            variant_previews = [
+                {
+                    "variant_id": variant["variant_id"],
+                    # Shown to the user and matched against their reply, so it follows the filtered order
+                    "number": number,
+                    "label": variant.get("label"),
+                    "option": variant["option"],
+                    "changes_summary": variant.get("changes_summary", []),
+                    "screenshot_preview": screenshot.get("base64_image", "") if screenshot.get("success") else "",
+                    "ui_codes": variant["modified_template"]
+                }
+                for number, (variant, screenshot) in enumerate(zip(variants, screenshots), 1)
+            ]
+            
+            response = self.user_proxy_agent.create_response_from_instructions({
+                "type": "editing_variants_ready",
+                "variants": variant_previews,
+                "template": selected_template,
+                "original_request": original_request
+            })
+            
+            self._add_to_conversation_history(response, "assistant")
+            
+            return {
+                "success": True,
+                "response": response,
+                "session_id": self.session_id,
+                "phase": "editing",
+                "intent": "variants_ready",
+                "clarification_options": [variant["option"] for variant in variants],
+                "variants": variant_previews,
+                "pending_clarification": True,
+                "variant_metadata": variant_result.get("metadata", {})
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error generating edit variants: {e}")
+            return None
+    
+    async def _apply_selected_variant(self, variant: Dict[str, Any], original_request: str, selected_template: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a pre-generated variant chosen by the user"""
+        modified_template = variant["modified_template"]
+        self.session_state["modified_template"] = modified_template
+        
+        await self._save_template_to_file({
+            "html_export": modified_template.get("html_export", ""),
+            "style_css": modified_template.get("style_css", ""),
+            "globals_css": modified_template.get("globals_css", ""),
+            "template_id": selected_template.get("template_id", ""),
+            "template_name": selected_template.get("name", ""),
+            "template_category": selected_template.get("category", ""),
+            "modification_metadata": {
+                "user_request": variant.get("request", original_request),
+                "modification_type": "ui_agent_variant",
+                "changes_applied": variant.get("changes_summary", ["UI modifications applied"])
+            }
+        })
+        
+        self.editing_agent.record_execution_rationale({
+            "html": modified_template.get("html_export", ""),
+            "style_css": modified_template.get("style_css", ""),
+            "globals_css": modified_template.get("globals_css", ""),
+            "changes_summary": variant.get("changes_summary", [])
+        }, variant.get("request", original_request))
+        
+        modification_result = {
+            "success": True,
+            "requires_clarification": False,
+            "changes_summary": variant.get("changes_summary", []),
+            "modified_template": modified_template,
+            "metadata": {"variant_id": variant.get("variant_id")}
+        }
+        
+        response = self.user_proxy_agent.create_response_from_instructions(
+            "modification_success",
+            {
+                "modification_result": modification_result,
+                "selected_template": selected_template,
+                "changes_summary": modification_result["changes_summary"]
+            }
+        )
+        
+        self._add_to_conversation_history(response, "assistant")
+        
+        return {
+            "success": True,
+            "response": response,
+            "session_id": self.session_id,
+            "phase": "editing",
+            "modification_result": modification_result,
+            "intent": "modification_request"
+        }
+    
     async def _handle_clarification_user_response(self, message: str, selected_template: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle user response to clarification request"""
         try:
-            print(f"DEBUG ORCHESTRATOR: Handling user clarification response: {message}")
+            self.logger.debug("Handling user clarification response: %s", message)
             
             # Get pending clarification context
             pending_clarification = self.session_state.get("pending_clarification", {})
@@ -959,10 +1219,16 @@ Return ONLY the intent type (e.g., "modification_request").
             original_template = pending_clarification.get("original_template", {})
             
             # Parse user's choice from the clarification options
-            user_choice = self._parse_user_clarification_choice(message, clarification_options)
+            choice_index = self._parse_user_clarification_choice(message, clarification_options)
             
-            if user_choice is None:
-                # User didn't provide a clear choice, ask again
+            if choice_index is None:
+                if self._extract_choice_number(message) is None:
+                    # Not an answer to the prompt: drop it and treat the message as a new request
+                    self.logger.debug("Message does not pick an option, leaving clarification")
+                    self.session_state.pop("pending_clarification", None)
+                    return None
+                
+                # A number outside the offered options, ask again
                 response = self.user_proxy_agent.create_response_from_instructions({
                     "type": "editing_clarification_invalid_choice",
                     "clarification_options": clarification_options,
@@ -985,11 +1251,17 @@ Return ONLY the intent type (e.g., "modification_request").
             # Clear pending clarification
             self.session_state.pop("pending_clarification", None)
             
+            # A pre-generated variant only needs to be applied
+            variants = pending_clarification.get("variants", [])
+            if choice_index < len(variants):
+                return await self._apply_selected_variant(variants[choice_index], original_request, selected_template)
+            user_choice = clarification_options[choice_index].get("text_content", f"Option {choice_index + 1}")
+            
             # Create a refined request with the user's choice
             refined_request = f"{original_request} (targeting: {user_choice})"
             
             # Process the refined modification request
-            print(f"DEBUG ORCHESTRATOR: Processing refined request: {refined_request}")
+            self.logger.debug("Processing refined request: %s", refined_request)
             
             # Get current UI state
             current_ui_state = await self._get_current_ui_state(selected_template)
@@ -997,9 +1269,10 @@ Return ONLY the intent type (e.g., "modification_request").
             # Use UI editing agent with the refined request
             modification_result = self.editing_agent.process_modification_request(refined_request, current_ui_state, self.session_state)
             
-            if modification_result.get("clarification_needed", False):
+            if modification_result.get("clarification_needed", False) or modification_result.get("requires_clarification", False):
                 # Still needs clarification, handle again
-                return await self._handle_editing_clarification_response(modification_result, selected_template, context)
+                modification_result.setdefault("user_feedback", original_request)
+                return await self._handle_editing_clarification_response(modification_result, selected_template, context, current_ui_state)
             
             if not modification_result.get("success", False):
                 # Handle modification failure
@@ -1049,33 +1322,27 @@ Return ONLY the intent type (e.g., "modification_request").
                 "phase": "editing"
             }
     
-    def _parse_user_clarification_choice(self, message: str, clarification_options: List[Dict[str, Any]]) -> Optional[str]:
-        """Parse user's choice from clarification options"""
+    def _extract_choice_number(self, message: str) -> Optional[int]:
+        """Option number the message names as a whole token, if any"""
+        match = CHOICE_NUMBER_PATTERN.search(message.lower().strip())
+        return int(match.group(1) or match.group(2)) if match else None
+    
+    def _parse_user_clarification_choice(self, message: str, clarification_options: List[Dict[str, Any]]) -> Optional[int]:
+        """Parse user's choice from clarification options; returns the index of the chosen option"""
         try:
             message_lower = message.lower().strip()
             
-            # Try to match by option number (1, 2, 3, etc.)
-            for i, option in enumerate(clarification_options, 1):
-                if str(i) in message_lower or f"option {i}" in message_lower:
-                    return option.get("text_content", f"Option {i}")
-            
-            # Try to match by text content
-            for option in clarification_options:
-                text_content = option.get("text_content", "").lower()
-                if text_content and text_content in message_lower:
-                    return option.get("text_content", "")
-            
-            # Try to match by CSS selector
-            for option in clarification_options:
-                css_selector = option.get("css_selector", "").lower()
-                if css_selector and css_selector in message_lower:
-                    return option.get("text_content", "")
-            
-            # Try to match by description
-            for option in clarification_options:
-                description = option.get("description", "").lower()
-                if description and description in message_lower:
-                    return option.get("text_content", "")
+            # Try to match by option number (1, 2, 3, etc.), as numbered in the prompt
+            number = self._extract_choice_number(message)
+            if number is not None:
+                return number - 1 if 1 <= number <= len(clarification_options) else None
+            
+            # Try to match by text content, CSS selector, then description
+            for field in ("text_content", "css_selector", "description"):
+                for index, option in enumerate(clarification_options):
+                    value = (option.get(field) or "").lower().strip()
+                    if value and re.search(rf"(?<!\w){re.escape(value)}(?!\w)", message_lower):
+                        return index
             
             return None
             
@@ -1086,8 +1353,16 @@ Return ONLY the intent type (e.g., "modification_request").
     async def _handle_clarification_request(self, message: str, selected_template: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Handle clarification requests about what can be modified"""
         try:
-            # Generate editing suggestions
-            suggestions = self._generate_editing_suggestions(selected_template)
+            # Use suggestions precomputed by the warm-up when they match the current code
+            from services.warmup_service import warmup_service
+            current_ui_state = await self._get_current_ui_state(selected_template)
+            suggestions = warmup_service.get_cached_suggestions(
+                self.session_id,
+                current_ui_state.get("html_export", ""),
+                current_ui_state.get("globals_css", "") + "\n" + current_ui_state.get("style_css", "")
+            )
+            if not suggestions:
+                suggestions = self._generate_editing_suggestions(current_ui_state)
             
             response = self.user_proxy_agent.create_response_from_instructions(
                 "editing_clarification",
@@ -1267,28 +1542,28 @@ Return ONLY the intent type (e.g., "modification_request").
     async def _get_current_ui_state(self, selected_template: Dict[str, Any]) -> Dict[str, Any]:
         """Get current UI state including any modifications"""
         try:
-            print(f"DEBUG ORCHESTRATOR: Getting current UI state for session {self.session_id}")
+            self.logger.debug("Getting current UI state for session %s", self.session_id)
             
             # Load from session files
-            print(f"DEBUG ORCHESTRATOR: Step 1 - Loading from session files for session: {self.session_id}")
+            self.logger.debug("Step 1 - Loading from session files for session: %s", self.session_id)
             session_ui_state = await self._load_ui_state_from_session()
             if session_ui_state and session_ui_state.get("html_export"):
-                print(f"DEBUG ORCHESTRATOR: Using session UI state - HTML length: {len(session_ui_state.get('html_export', ''))}")
-                print(f"DEBUG ORCHESTRATOR: Session UI state CSS length: {len(session_ui_state.get('style_css', ''))}")
+                self.logger.debug("Using session UI state - HTML length: %s", len(session_ui_state.get('html_export', '')))
+                self.logger.debug("Session UI state CSS length: %s", len(session_ui_state.get('style_css', '')))
                 
                 # Check if the target text is in the session content
                 html_content = session_ui_state.get("html_export", "")
                 if "Welcome back!" in html_content or "Glad you're back!" in html_content:
-                    print(f"DEBUG ORCHESTRATOR: Found welcome text in session HTML")
+                    self.logger.debug("Found welcome text in session HTML")
                 else:
-                    print(f"DEBUG ORCHESTRATOR: Welcome text NOT found in session HTML")
+                    self.logger.debug("Welcome text NOT found in session HTML")
                 
                 return session_ui_state
             else:
-                print(f"DEBUG ORCHESTRATOR: No session UI state loaded, falling back to MongoDB template")
+                self.logger.debug("No session UI state loaded, falling back to MongoDB template")
             
             # Fallback to MongoDB template
-            print(f"DEBUG ORCHESTRATOR: No session file found, using MongoDB template")
+            self.logger.debug("No session file found, using MongoDB template")
             ui_state = {
                 "template_id": selected_template.get("_id"),
                 "template_name": selected_template.get("name"),
@@ -1298,16 +1573,16 @@ Return ONLY the intent type (e.g., "modification_request").
             }
             
             # Add debug logging to verify template content
-            print(f"DEBUG TEMPLATE: Template name: {selected_template.get('name')}")
-            print(f"DEBUG TEMPLATE: Template ID: {selected_template.get('_id')}")
-            print(f"DEBUG TEMPLATE: HTML length: {len(selected_template.get('html_export', ''))}")
-            print(f"DEBUG TEMPLATE: CSS length: {len(selected_template.get('style_css', ''))}")
+            self.logger.debug("Template name: %s", selected_template.get('name'))
+            self.logger.debug("Template ID: %s", selected_template.get('_id'))
+            self.logger.debug("HTML length: %s", len(selected_template.get('html_export', '')))
+            self.logger.debug("CSS length: %s", len(selected_template.get('style_css', '')))
             
             # Check if the target text is in the template
             if "Welcome back!" in selected_template.get("html_export", ""):
-                print(f"DEBUG TEMPLATE: Found 'Welcome back!' in template HTML")
+                self.logger.debug("Found 'Welcome back!' in template HTML")
             else:
-                print(f"DEBUG TEMPLATE: 'Welcome back!' NOT found in template HTML")
+                self.logger.debug("'Welcome back!' NOT found in template HTML")
             
             # Apply pending modifications
             modifications = self.session_state.get("modifications", {})
@@ -1326,33 +1601,31 @@ Return ONLY the intent type (e.g., "modification_request").
     async def _load_ui_state_from_session(self) -> Optional[Dict[str, Any]]:
         """Load UI state from the session using file manager"""
         try:
-            from utils.file_manager import UICodeFileManager
-            import os
+            from utils.file_manager import get_file_manager
             
             # Initialize file manager
-            base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-            file_manager = UICodeFileManager(base_dir=base_dir)
+            file_manager = get_file_manager()
             
-            print(f"DEBUG ORCHESTRATOR: Loading UI state for session: {self.session_id}")
+            self.logger.debug("Loading UI state for session: %s", self.session_id)
             
             # Check if session exists in new file-based format
             if file_manager.session_exists(self.session_id):
-                print(f"DEBUG ORCHESTRATOR: Session {self.session_id} exists, loading data...")
+                self.logger.debug("Session %s exists, loading data...", self.session_id)
                 session_data = file_manager.load_session(self.session_id)
                 if session_data and session_data.get("current_codes", {}).get("html_export"):
                     current_codes = session_data["current_codes"]
                     html_length = len(current_codes.get('html_export', ''))
                     css_length = len(current_codes.get('style_css', ''))
-                    print(f"DEBUG ORCHESTRATOR: Loaded session data - HTML: {html_length}, CSS: {css_length}")
+                    self.logger.debug("Loaded session data - HTML: %s, CSS: %s", html_length, css_length)
                     
                     # Check if the target text is in the loaded content
                     html_content = current_codes.get('html_export', '')
                     if "Glad you're back!" in html_content:
-                        print(f"DEBUG ORCHESTRATOR: Found 'Glad you're back!' in session HTML")
+                        self.logger.debug("Found 'Glad you're back!' in session HTML")
                     elif "Welcome back!" in html_content:
-                        print(f"DEBUG ORCHESTRATOR: Found 'Welcome back!' in session HTML")
+                        self.logger.debug("Found 'Welcome back!' in session HTML")
                     else:
-                        print(f"DEBUG ORCHESTRATOR: No welcome text found in session HTML")
+                        self.logger.debug("No welcome text found in session HTML")
                     
                     self.logger.info(f"Loaded UI codes from file-based session {self.session_id} with HTML length: {html_length}")
                     return {
@@ -1363,45 +1636,9 @@ Return ONLY the intent type (e.g., "modification_request").
                         "session_file": f"temp_ui_files/{self.session_id}/"
                     }
                 else:
-                    print(f"DEBUG ORCHESTRATOR: Session data is empty or invalid")
+                    self.logger.debug("Session data is empty or invalid")
             else:
-                print(f"DEBUG ORCHESTRATOR: Session {self.session_id} does not exist")
-            
-            # Fallback: Check for old JSON format and migrate
-            from pathlib import Path
-            import json
-            
-            temp_dir = Path("temp_ui_files")
-            
-            # Try multiple session file patterns
-            session_patterns = [
-                f"ui_codes_{self.session_id}.json",
-                "ui_codes_test_session.json",  # Fallback for debugging
-                "ui_codes_demo_session.json"   # Another fallback
-            ]
-            
-            for pattern in session_patterns:
-                session_file = temp_dir / pattern
-                if session_file.exists():
-                    try:
-                        # Migrate from old JSON format
-                        success = file_manager.migrate_from_json(self.session_id, str(session_file))
-                        if success:
-                            # Retry loading the migrated session
-                            session_data = file_manager.load_session(self.session_id)
-                            if session_data and session_data.get("current_codes", {}).get("html_export"):
-                                current_codes = session_data["current_codes"]
-                                self.logger.info(f"Migrated and loaded UI codes from {pattern} with HTML length: {len(current_codes.get('html_export', ''))}")
-                                return {
-                                    "html_export": current_codes.get("html_export", ""),
-                                    "style_css": current_codes.get("style_css", ""),
-                                    "globals_css": current_codes.get("globals_css", ""),
-                                    "template_info": session_data.get("template_info", {}),
-                                    "session_file": f"temp_ui_files/{self.session_id}/"
-                                }
-                    except Exception as e:
-                        self.logger.warning(f"Failed to migrate session file {pattern}: {e}")
-                        continue
+                self.logger.debug("Session %s does not exist", self.session_id)
             
             self.logger.warning("No valid session file found with UI codes")
             return None
@@ -1942,6 +2179,8 @@ EXAMPLES:
         if agent_name == "requirements_analysis":
             # Full context for requirements analysis
             context = base_context.copy()
+            # Earlier turns within the prompt budget; the current message is passed separately
+            context["conversation_context"] = conversation_history.format_for_prompt(self.session_state, skip_latest=1)
             
         elif agent_name == "template_recommendation":
             # Minimal context + requirements output
@@ -1950,12 +2189,12 @@ EXAMPLES:
             if isinstance(previous_output, dict) and previous_output.get("page_type"):
                 # Use the page_type from requirements analysis (this is the correct one)
                 page_type = previous_output["page_type"]
-                print(f"DEBUG: _build_agent_context: Using page_type '{page_type}' from requirements analysis output")
+                self.logger.debug("_build_agent_context: Using page_type '%s' from requirements analysis output", page_type)
             else:
                 # Only fall back to base context if requirements analysis didn't provide page_type
                 page_type = base_context.get("page_type")
                 if page_type:
-                    print(f"DEBUG: _build_agent_context: Fallback to page_type '{page_type}' from base context")
+                    self.logger.debug("_build_agent_context: Fallback to page_type '%s' from base context", page_type)
             
             context = {
                 "page_type": page_type,
@@ -2000,7 +2239,7 @@ EXAMPLES:
         for agent_name in required_agents:
             try:
                 agent_start_time = time.time()
-                print(f"DEBUG: Starting {agent_name} agent execution...")
+                self.logger.debug("Starting %s agent execution...", agent_name)
                 
                 agent_context = self._build_agent_context(agent_name, current_output, context)
                 
@@ -2009,7 +2248,7 @@ EXAMPLES:
                         start_time = time.time()
                         result = self.requirements_agent.analyze_requirements(message, context=agent_context)
                         end_time = time.time()
-                        print(f"DEBUG: Requirements Analysis Agent LLM call completed in {end_time - start_time:.2f} seconds")
+                        self.logger.debug("Requirements Analysis Agent LLM call completed in %.2f seconds", end_time - start_time)
                         
                         # Standardize the output
                         result = self.requirements_agent.enhance_agent_output(result, agent_context)
@@ -2018,8 +2257,8 @@ EXAMPLES:
                     
                         # Log total time for this agent
                         agent_end_time = time.time()
-                        print(f"DEBUG: {agent_name} total execution time: {agent_end_time - agent_start_time:.2f} seconds")
-                        print(f"DEBUG: {agent_name} total execution time: {agent_end_time - agent_start_time:.2f} seconds")
+                        self.logger.debug("%s total execution time: %.2f seconds", agent_name, agent_end_time - agent_start_time)
+                        self.logger.debug("%s total execution time: %.2f seconds", agent_name, agent_end_time - agent_start_time)
                     except Exception as e:
                         self.logger.error(f"Error in requirements_analysis: {e}")
                         # Create error response
@@ -2042,34 +2281,34 @@ EXAMPLES:
                         
                         # CRITICAL: Use page_type from requirements analysis
                         # The requirements analysis agent has already determined the correct page_type
-                        print(f"DEBUG: Template Recommendation - Requirements from session: {self.session_state.get('requirements', {}).get('page_type', 'None')}")
-                        print(f"DEBUG: Template Recommendation - Current output page_type: {current_output.get('page_type', 'None') if isinstance(current_output, dict) else 'Not a dict'}")
-                        print(f"DEBUG: Template Recommendation - Agent context page_type: {agent_context.get('page_type', 'None')}")
+                        self.logger.debug("Template Recommendation - Requirements from session: %s", self.session_state.get('requirements', {}).get('page_type', 'None'))
+                        self.logger.debug("Template Recommendation - Current output page_type: %s", current_output.get('page_type', 'None') if isinstance(current_output, dict) else 'Not a dict')
+                        self.logger.debug("Template Recommendation - Agent context page_type: %s", agent_context.get('page_type', 'None'))
                         
                         if isinstance(requirements, dict) and requirements.get("page_type"):
                             # Use the page_type from requirements analysis (this is the correct one)
-                            print(f"DEBUG: Using page_type '{requirements['page_type']}' from requirements analysis")
+                            self.logger.debug("Using page_type '%s' from requirements analysis", requirements['page_type'])
                         elif agent_context.get("page_type") and isinstance(requirements, dict):
                             # Only fall back to context page_type if requirements doesn't have one
                             requirements["page_type"] = agent_context["page_type"]
-                            print(f"DEBUG: Fallback: Added page_type '{agent_context['page_type']}' from context to requirements")
+                            self.logger.debug("Fallback: Added page_type '%s' from context to requirements", agent_context['page_type'])
                         
                         start_time = time.time()
-                        print(f"DEBUG: Template Recommendation - Calling recommend_templates with requirements: {requirements}")
+                        self.logger.debug("Template Recommendation - Calling recommend_templates with requirements: %s", requirements)
                         result = self.recommendation_agent.recommend_templates(requirements, context=agent_context)
                         end_time = time.time()
-                        print(f"DEBUG: Template Recommendation Agent LLM call completed in {end_time - start_time:.2f} seconds")
-                        print(f"DEBUG: Template Recommendation - Raw result: {result}")
+                        self.logger.debug("Template Recommendation Agent LLM call completed in %.2f seconds", end_time - start_time)
+                        self.logger.debug("Template Recommendation - Raw result: %s", result)
                         
                         # Standardize the output
                         result = self.recommendation_agent.enhance_agent_output(result, agent_context)
                         current_output = result["data"]["primary_result"]
-                        print(f"DEBUG: Template Recommendation - Standardized result primary_result: {current_output}")
+                        self.logger.debug("Template Recommendation - Standardized result primary_result: %s", current_output)
                         agent_results[agent_name] = result
                     
                     # Log total time for this agent
                         agent_end_time = time.time()
-                        print(f"DEBUG: {agent_name} total execution time: {agent_end_time - agent_start_time:.2f} seconds")
+                        self.logger.debug("%s total execution time: %.2f seconds", agent_name, agent_end_time - agent_start_time)
                     except Exception as e:
                         self.logger.error(f"Error in template_recommendation: {e}")
                         # Create error response
@@ -2091,7 +2330,7 @@ EXAMPLES:
                         # Skip question generation if only one template
                         recommendations = self.session_state.get("recommendations", [])
                         if isinstance(recommendations, list) and len(recommendations) == 1:
-                            print(f"DEBUG: Skipping question generation - only one template found ({recommendations[0].get('template', {}).get('name', 'Unknown')})")
+                            self.logger.debug("Skipping question generation - only one template found (%s)", recommendations[0].get('template', {}).get('name', 'Unknown'))
                             # Create placeholder result
                             result = {
                                 "questions": [],
@@ -2114,22 +2353,22 @@ EXAMPLES:
                         
                         # If no templates available, fetch them directly
                         if not templates:
-                            print("DEBUG: No templates available for question generation, fetching templates...")
+                            self.logger.debug("No templates available for question generation, fetching templates...")
                             requirements = self.session_state.get("requirements", {})
-                            print(f"DEBUG: Question Generation - Session requirements: {requirements}")
-                            print(f"DEBUG: Question Generation - Session requirements page_type: {requirements.get('page_type', 'None') if isinstance(requirements, dict) else 'Not a dict'}")
+                            self.logger.debug("Question Generation - Session requirements: %s", requirements)
+                            self.logger.debug("Question Generation - Session requirements page_type: %s", requirements.get('page_type', 'None') if isinstance(requirements, dict) else 'Not a dict')
                             
                             # Ensure page_type is included - get from requirements or session state
                             page_type = None
                             if isinstance(requirements, dict) and requirements.get("page_type"):
                                 page_type = requirements["page_type"]
-                                print(f"DEBUG: Using page_type '{page_type}' from requirements")
+                                self.logger.debug("Using page_type '%s' from requirements", page_type)
                             else:
                                 # Try to get page_type from session state requirements
                                 session_requirements = self.session_state.get("requirements", {})
                                 if isinstance(session_requirements, dict) and session_requirements.get("page_type"):
                                     page_type = session_requirements["page_type"]
-                                    print(f"DEBUG: Using page_type '{page_type}' from session requirements")
+                                    self.logger.debug("Using page_type '%s' from session requirements", page_type)
                                     # Add it to current requirements for template fetching
                                     if isinstance(requirements, dict):
                                         requirements["page_type"] = page_type
@@ -2138,12 +2377,12 @@ EXAMPLES:
                                     page_type = self.session_state.get("context", {}).get("page_type")
                                     if page_type and isinstance(requirements, dict):
                                         requirements["page_type"] = page_type
-                                        print(f"DEBUG: Fallback: Added page_type '{page_type}' from context to requirements")
+                                        self.logger.debug("Fallback: Added page_type '%s' from context to requirements", page_type)
                             
                             if page_type:
-                                print(f"DEBUG: Template fetching with page_type: {page_type}")
+                                self.logger.debug("Template fetching with page_type: %s", page_type)
                             else:
-                                print(f"DEBUG: No page_type found, using default category")
+                                self.logger.debug("No page_type found, using default category")
                             
                             # Get templates and standardize the output like in normal flow
                             template_list = self.recommendation_agent.recommend_templates(requirements)
@@ -2153,13 +2392,13 @@ EXAMPLES:
                                 templates = template_result["data"].get("primary_result", [])
                                 # Store in session for future use
                                 self.session_state["recommendations"] = templates
-                                print(f"DEBUG: Fetched {len(templates)} templates for question generation")
+                                self.logger.debug("Fetched %s templates for question generation", len(templates))
                         
                         requirements = self.session_state.get("requirements", {})
                         start_time = time.time()
                         result = self.question_agent.generate_questions(templates, requirements)
                         end_time = time.time()
-                        print(f"DEBUG: Question Generation Agent LLM call completed in {end_time - start_time:.2f} seconds")
+                        self.logger.debug("Question Generation Agent LLM call completed in %.2f seconds", end_time - start_time)
                         
                         # The result is already a dictionary, not standardized format
                         current_output = result
@@ -2167,7 +2406,7 @@ EXAMPLES:
                     
                     # Log total time for this agent
                         agent_end_time = time.time()
-                        print(f"DEBUG: {agent_name} total execution time: {agent_end_time - agent_start_time:.2f} seconds")
+                        self.logger.debug("%s total execution time: %.2f seconds", agent_name, agent_end_time - agent_start_time)
                     except Exception as e:
                         self.logger.error(f"Error in question_generation: {e}")
                         # Create error response
@@ -2204,7 +2443,7 @@ EXAMPLES:
                     agent_results[agent_name] = result
                 # Log total time for this agent
                 agent_end_time = time.time()
-                print(f"DEBUG: {agent_name} total execution time: {agent_end_time - agent_start_time:.2f} seconds")
+                self.logger.debug("%s total execution time: %.2f seconds", agent_name, agent_end_time - agent_start_time)
                     
             except Exception as e:
                 self.logger.error(f"Error executing agent {agent_name}: {e}")
@@ -2333,18 +2572,7 @@ EXAMPLES:
     
     def reset_session(self) -> Dict[str, Any]:
         """Reset the session"""
-        self.session_id = str(uuid.uuid4())
-        self.session_state = {
-            "current_phase": "initial",
-            "conversation_history": [],
-            "requirements": {},
-            "recommendations": [],
-            "questions": {},
-            "selected_template": None,
-            "modifications": [],
-            "report": None
-        }
-        session_manager.update_session(self.session_id, self.session_state)
+        self._create_session()
         
         return {
             "success": True,
@@ -2357,16 +2585,16 @@ EXAMPLES:
         phase_start_time = time.time()
         try:
             self.logger.info(f"Handling logo analysis request for session {context.get('session_id')}")
-            print(f"DEBUG: Starting logo analysis execution...")
+            self.logger.debug("Starting logo analysis execution...")
             
             logo_analysis_start_time = time.time()
-            print(f"DEBUG: Starting logo analysis with RequirementsAnalysisAgent...")
+            self.logger.debug("Starting logo analysis with RequirementsAnalysisAgent...")
             logo_analysis_result = self.requirements_agent.analyze_logo_and_requirements(
                 user_message, 
                 context
             )
             logo_analysis_end_time = time.time()
-            print(f"DEBUG: Logo analysis with RequirementsAnalysisAgent completed in {logo_analysis_end_time - logo_analysis_start_time:.2f} seconds")
+            self.logger.debug("Logo analysis with RequirementsAnalysisAgent completed in %.2f seconds", logo_analysis_end_time - logo_analysis_start_time)
             
             # Debug: Log the response structure
             self.logger.info(f"Logo analysis result structure: {list(logo_analysis_result.keys())}")
@@ -2375,30 +2603,30 @@ EXAMPLES:
                 self.logger.info(f"Logo analysis data keys: {list(logo_analysis_result['data'].keys())}")
             
             if not logo_analysis_result.get("success", False):
-                print(f"DEBUG: Logo analysis failed, total logo analysis time: {time.time() - phase_start_time:.2f} seconds")
+                self.logger.debug("Logo analysis failed, total logo analysis time: %.2f seconds", time.time() - phase_start_time)
                 return self._create_error_response("Failed to analyze logo")
             
             data_extraction_start_time = time.time()
-            print(f"DEBUG: Starting data extraction from logo analysis...")
+            self.logger.debug("Starting data extraction from logo analysis...")
             # The standardized response has data nested under 'data' key
             data = logo_analysis_result.get("data", {})
             logo_analysis = data.get("logo_analysis", {})
             design_preferences = data.get("design_preferences", {})
             data_extraction_end_time = time.time()
-            print(f"DEBUG: Data extraction completed in {data_extraction_end_time - data_extraction_start_time:.2f} seconds")
+            self.logger.debug("Data extraction completed in %.2f seconds", data_extraction_end_time - data_extraction_start_time)
             
             plan_creation_start_time = time.time()
-            print(f"DEBUG: Starting modification plan creation...")
+            self.logger.debug("Starting modification plan creation...")
             modification_plan = self._create_logo_modification_plan(
                 logo_analysis, 
                 design_preferences, 
                 user_message
             )
             plan_creation_end_time = time.time()
-            print(f"DEBUG: Modification plan creation completed in {plan_creation_end_time - plan_creation_start_time:.2f} seconds")
+            self.logger.debug("Modification plan creation completed in %.2f seconds", plan_creation_end_time - plan_creation_start_time)
             
             ui_modification_start_time = time.time()
-            print(f"DEBUG: Starting UI modifications with UI Editing Agent...")
+            self.logger.debug("Starting UI modifications with UI Editing Agent...")
             current_ui_codes = context.get("current_ui_codes", {})
             
             # Ensure current_ui_codes has the expected structure
@@ -2415,14 +2643,14 @@ EXAMPLES:
                     self.session_state
                 )
             ui_modification_end_time = time.time()
-            print(f"DEBUG: UI modifications completed in {ui_modification_end_time - ui_modification_start_time:.2f} seconds")
+            self.logger.debug("UI modifications completed in %.2f seconds", ui_modification_end_time - ui_modification_start_time)
             
             if not modification_result.get("success", False):
-                print(f"DEBUG: UI modifications failed, total logo analysis time: {time.time() - phase_start_time:.2f} seconds")
+                self.logger.debug("UI modifications failed, total logo analysis time: %.2f seconds", time.time() - phase_start_time)
                 return self._create_error_response("Failed to apply logo-based modifications")
             
             user_response_start_time = time.time()
-            print(f"DEBUG: Starting user response generation...")
+            self.logger.debug("Starting user response generation...")
             user_response = self.user_proxy_agent.create_response_from_instructions(
                 "logo_analysis_success",
                 {
@@ -2433,18 +2661,18 @@ EXAMPLES:
                 }
             )
             user_response_end_time = time.time()
-            print(f"DEBUG: User response generation completed in {user_response_end_time - user_response_start_time:.2f} seconds")
+            self.logger.debug("User response generation completed in %.2f seconds", user_response_end_time - user_response_start_time)
             
             # Log total logo analysis execution time
             phase_end_time = time.time()
-            print(f"DEBUG: Logo analysis total execution time: {phase_end_time - phase_start_time:.2f} seconds")
-            print(f"DEBUG: Breakdown:")
-            print(f"  - Logo analysis (RequirementsAnalysisAgent): {logo_analysis_end_time - logo_analysis_start_time:.2f} seconds")
-            print(f"  - Data extraction: {data_extraction_end_time - data_extraction_start_time:.2f} seconds")
-            print(f"  - Modification plan creation: {plan_creation_end_time - plan_creation_start_time:.2f} seconds")
-            print(f"  - UI modifications (UI Editing Agent): {ui_modification_end_time - ui_modification_start_time:.2f} seconds")
-            print(f"  - User response generation: {user_response_end_time - user_response_start_time:.2f} seconds")
-            print(f"  - Total overhead: {phase_end_time - phase_start_time - (logo_analysis_end_time - logo_analysis_start_time) - (data_extraction_end_time - data_extraction_start_time) - (plan_creation_end_time - plan_creation_start_time) - (ui_modification_end_time - ui_modification_start_time) - (user_response_end_time - user_response_start_time):.2f} seconds")
+            self.logger.debug("Logo analysis total execution time: %.2f seconds", phase_end_time - phase_start_time)
+            self.logger.debug("Breakdown:")
+            self.logger.debug("  - Logo analysis (RequirementsAnalysisAgent): %.2f seconds", logo_analysis_end_time - logo_analysis_start_time)
+            self.logger.debug("  - Data extraction: %.2f seconds", data_extraction_end_time - data_extraction_start_time)
+            self.logger.debug("  - Modification plan creation: %.2f seconds", plan_creation_end_time - plan_creation_start_time)
+            self.logger.debug("  - UI modifications (UI Editing Agent): %.2f seconds", ui_modification_end_time - ui_modification_start_time)
+            self.logger.debug("  - User response generation: %.2f seconds", user_response_end_time - user_response_start_time)
+            self.logger.debug("  - Total overhead: %.2f seconds", phase_end_time - phase_start_time - (logo_analysis_end_time - logo_analysis_start_time) - (data_extraction_end_time - data_extraction_start_time) - (plan_creation_end_time - plan_creation_start_time) - (ui_modification_end_time - ui_modification_start_time) - (user_response_end_time - user_response_start_time))
             
             return {
                 "success": True,
@@ -2469,9 +2697,11 @@ EXAMPLES:
                 
         except Exception as e:
             phase_end_time = time.time()
-            print(f"DEBUG: Logo analysis failed after {phase_end_time - phase_start_time:.2f} seconds")
+            self.logger.debug("Logo analysis failed after %.2f seconds", phase_end_time - phase_start_time)
             self.logger.error(f"Error in logo analysis: {e}")
             return self._create_error_response(f"Error analyzing logo: {str(e)}")
+        finally:
+            self.persist_session()
 
     def _create_logo_modification_plan(self, logo_analysis: Dict[str, Any], design_preferences: Dict[str, Any], user_message: str) -> str:
         """Create a modification plan based on logo analysis results"""
@@ -2666,7 +2896,7 @@ Current user question: {user_message}"""
             self.logger.info(f"Starting Phase 1 → Phase 2 transition for template: {selected_template.get('name', 'Unknown')}")
             
             # Step 1: Save conversation history to session
-            self.session_state["phase1_conversation_history"] = self.session_state.get("conversation_history", [])
+            self.session_state["phase1_conversation_history"] = conversation_history.get_history_slice(self.session_state)
             
             actual_template = selected_template
             if "template" in selected_template:
@@ -2680,9 +2910,9 @@ Current user question: {user_message}"""
             
             self.logger.info(f"Template ID for transition: {template_id}")
             
-            from tools.ui_preview_tools import UIPreviewTools
-            ui_tools = UIPreviewTools()
-            template_result = ui_tools.get_template_code(template_id)
+            from tools.async_tools import get_async_ui_preview_tools
+            ui_tools = get_async_ui_preview_tools()
+            template_result = await ui_tools.get_template_code(template_id)
             
             self.logger.info(f"Template result received - success: {template_result.get('success', False)}")
             
@@ -2690,35 +2920,10 @@ Current user question: {user_message}"""
                 error_msg = template_result.get("error", "Unknown error") if template_result else "No result returned"
                 raise ValueError(f"Failed to fetch template code for ID: {template_id}. Error: {error_msg}")
             
-            ui_codes_data = {
-                "template_id": template_id,
-                "session_id": self.session_id,
-                "last_updated": datetime.now().isoformat(),
-                "current_codes": {
-                    "html_export": template_result.get("html_export", ""),
-                    "globals_css": template_result.get("global_css", ""),
-                    "style_css": template_result.get("style_css", "")
-                },
-                "history": [
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "modification": f"Template '{actual_template.get('name', 'Unknown')}' selected from Phase 1"
-                    }
-                ],
-                "template_info": {
-                    "name": actual_template.get("name", "Unknown"),
-                    "category": actual_template.get("category", "unknown"),
-                    "description": actual_template.get("description", ""),
-                    "tags": actual_template.get("tags", [])
-                }
-            }
-            
-            from utils.file_manager import UICodeFileManager
-            import os
+            from utils.file_manager import get_file_manager
             
-            # Use absolute path to match main.py
-            base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-            file_manager = UICodeFileManager(base_dir=base_dir)
+            # Same storage backend as main.py
+            file_manager = get_file_manager()
             
             # Create session with template data
             template_data = {
@@ -2733,43 +2938,28 @@ Current user question: {user_message}"""
             import time
             success = file_manager.create_session(self.session_id, template_data)
             
-            if success:
-                self.logger.info(f"[{time.strftime('%H:%M:%S')}] Session created using file manager: {self.session_id}")
-                # Add longer delay to ensure files are fully written and accessible
-                time.sleep(0.5)
-                self.logger.info(f"[{time.strftime('%H:%M:%S')}] Files should now be accessible")
-                
-                # Verify that the session is actually accessible
-                retry_count = 0
-                max_retries = 5
-                while retry_count < max_retries:
-                    if file_manager.session_exists(self.session_id):
-                        self.logger.info(f"[{time.strftime('%H:%M:%S')}] Session verified as accessible after {retry_count + 1} attempts")
-                        break
-                    else:
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            self.logger.info(f"[{time.strftime('%H:%M:%S')}] Session not yet accessible, retrying in 0.2s... (attempt {retry_count})")
-                            time.sleep(0.2)
-                        else:
-                            self.logger.warning(f"[{time.strftime('%H:%M:%S')}] Session still not accessible after {max_retries} attempts")
-            else:
-                self.logger.error(f"Failed to create session using file manager: {self.session_id}")
-                # Fallback to old JSON format
-                import json
-                import os
-                
-                temp_dir = "temp_ui_files"
-                if not os.path.exists(temp_dir):
-                    os.makedirs(temp_dir)
-                
-                json_filename = f"ui_codes_{self.session_id}.json"
-                json_filepath = os.path.join(temp_dir, json_filename)
-                
-                with open(json_filepath, 'w') as f:
-                    json.dump(ui_codes_data, f, indent=2)
-                
-                self.logger.info(f"Fallback JSON file created: {json_filepath}")
+            if not success:
+                # The editor reads codes only from the session store, so there is nothing to fall back to
+                raise ValueError(f"Failed to create UI code session: {self.session_id}")
+            # Writes are atomic and metadata.json lands last, so the session is readable as soon as this returns
+            self.logger.info(f"[{time.strftime('%H:%M:%S')}] Session created using file manager: {self.session_id}")
+            
+            # Warm up preview, code index and suggestions in the background
+            try:
+                from services.warmup_service import warmup_service
+                # Warm the code as stored (cleaned HTML, pruned CSS) so cache hashes match later reads
+                stored_session = file_manager.load_session(self.session_id)
+                warmup_service.schedule(
+                    self.session_id,
+                    stored_session["current_codes"] if stored_session else {
+                        "html_export": template_data["html_export"],
+                        "style_css": template_data["style_css"],
+                        "globals_css": template_data["globals_css"]
+                    },
+                    suggestion_builder=self._generate_editing_suggestions
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to schedule session warm-up: {e}")
             
             # Step 7: Update session state
             self.session_state["current_phase"] = "editing"
@@ -2792,7 +2982,7 @@ Current user question: {user_message}"""
                 self.logger.error(f"Failed to store phase transition decision: {e}")
             
             # Update global session manager
-            session_manager.update_session(self.session_id, self.session_state)
+            self.persist_session()
             
             # Step 8: Create transition response
             transition_response = self.user_proxy_agent.create_response_from_instructions({
@@ -2844,15 +3034,13 @@ Current user question: {user_message}"""
     async def _save_template_to_file(self, modified_template: Dict[str, Any]) -> None:
         """Save the modified template using file manager"""
         try:
-            from utils.file_manager import UICodeFileManager
-            import os
+            from utils.file_manager import get_file_manager
             
-            print(f"DEBUG SAVE: Starting save process for session {self.session_id}")
-            print(f"DEBUG SAVE: Modified template keys: {list(modified_template.keys())}")
+            self.logger.debug("Starting save process for session %s", self.session_id)
+            self.logger.debug("Modified template keys: %s", list(modified_template.keys()))
             
             # Initialize file manager
-            base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-            file_manager = UICodeFileManager(base_dir=base_dir)
+            file_manager = get_file_manager()
             
             # Check if session exists in new format, if not create it
             if not file_manager.session_exists(self.session_id):
@@ -2890,7 +3078,7 @@ Current user question: {user_message}"""
                     return
             
             self.logger.info(f"Modified template saved using file manager for session {self.session_id}")
-            print(f"DEBUG SAVE: Template saved successfully")
+            self.logger.debug("Template saved successfully")
             
             # Trigger screenshot regeneration
             try:
@@ -2913,16 +3101,16 @@ Current user question: {user_message}"""
         """
         try:
             self.logger.info(f"Processing UI edit request for session {session_id}: {message}")
-            print(f"DEBUG ORCHESTRATOR: Processing UI edit request for session {session_id}: {message}")
-            print(f"DEBUG ORCHESTRATOR: Orchestrator session ID: {self.session_id}")
-            print(f"DEBUG ORCHESTRATOR: Request session ID: {session_id}")
-            print(f"DEBUG ORCHESTRATOR: Session ID match: {self.session_id == session_id}")
-            print(f"DEBUG ORCHESTRATOR: Current phase: {self.session_state.get('current_phase', 'unknown')}")
-            print(f"DEBUG ORCHESTRATOR: Has selected template: {bool(self.session_state.get('selected_template'))}")
+            self.logger.debug("Processing UI edit request for session %s: %s", session_id, message)
+            self.logger.debug("Orchestrator session ID: %s", self.session_id)
+            self.logger.debug("Request session ID: %s", session_id)
+            self.logger.debug("Session ID match: %s", self.session_id == session_id)
+            self.logger.debug("Current phase: %s", self.session_state.get('current_phase', 'unknown'))
+            self.logger.debug("Has selected template: %s", bool(self.session_state.get('selected_template')))
             
                         # Ensure we're in editing phase and have a selected template
             if self.session_state.get("current_phase") != "editing" or not self.session_state.get("selected_template"):
-                print(f"DEBUG ORCHESTRATOR: Setting up editing phase - current phase: {self.session_state.get('current_phase', 'NOT_SET')}")
+                self.logger.debug("Setting up editing phase - current phase: %s", self.session_state.get('current_phase', 'NOT_SET'))
                 
                 # If no current_ui_codes provided, try to load from session file
                 if not current_ui_codes:
@@ -2938,8 +3126,8 @@ Current user question: {user_message}"""
                     self.logger.info(f"Set up editing session with template: {current_ui_codes.get('template_info', {}).get('name', 'Unknown')}")
                     
                     # Update the session in the global manager
-                    session_manager.update_session(self.session_id, self.session_state)
-                    print(f"DEBUG ORCHESTRATOR: Updated session state in global manager")
+                    self.persist_session()
+                    self.logger.debug("Updated session state in global manager")
                 else:
                     return {
                         "success": False,
@@ -2948,40 +3136,49 @@ Current user question: {user_message}"""
                         "metadata": {"error": "no_template_selected"}
                     }
             
-            editing_intent = self._detect_editing_intent_advanced(message, self.session_state["selected_template"])
-            print(f"DEBUG ORCHESTRATOR: UI Editor intent detected: {editing_intent}")
-            
-            if editing_intent == "modification_request":
-                result = await self._handle_modification_request(
-                    message=message,
-                    selected_template=self.session_state["selected_template"],
-                    context={"ui_codes": current_ui_codes}
-                )
-            elif editing_intent == "clarification_request":
-                result = await self._handle_clarification_request(
-                    message=message,
-                    selected_template=self.session_state["selected_template"],
-                    context={"ui_codes": current_ui_codes}
-                )
-            elif editing_intent == "completion_request":
-                result = await self._handle_completion_request(
-                    message=message,
-                    selected_template=self.session_state["selected_template"],
-                    context={"ui_codes": current_ui_codes}
-                )
-            elif editing_intent == "preview_request":
-                result = await self._handle_preview_request(
-                    message=message,
-                    selected_template=self.session_state["selected_template"],
-                    context={"ui_codes": current_ui_codes}
-                )
-            else:
-                result = await self._handle_general_request(
+            result = None
+            if self.session_state.get("pending_clarification"):
+                result = await self._handle_clarification_user_response(
                     message=message,
                     selected_template=self.session_state["selected_template"],
                     context={"ui_codes": current_ui_codes}
                 )
             
+            if result is None:
+                editing_intent = self._detect_editing_intent_advanced(message, self.session_state["selected_template"])
+                self.logger.debug("UI Editor intent detected: %s", editing_intent)
+                
+                if editing_intent == "modification_request":
+                    result = await self._handle_modification_request(
+                        message=message,
+                        selected_template=self.session_state["selected_template"],
+                        context={"ui_codes": current_ui_codes}
+                    )
+                elif editing_intent == "clarification_request":
+                    result = await self._handle_clarification_request(
+                        message=message,
+                        selected_template=self.session_state["selected_template"],
+                        context={"ui_codes": current_ui_codes}
+                    )
+                elif editing_intent == "completion_request":
+                    result = await self._handle_completion_request(
+                        message=message,
+                        selected_template=self.session_state["selected_template"],
+                        context={"ui_codes": current_ui_codes}
+                    )
+                elif editing_intent == "preview_request":
+                    result = await self._handle_preview_request(
+                        message=message,
+                        selected_template=self.session_state["selected_template"],
+                        context={"ui_codes": current_ui_codes}
+                    )
+                else:
+                    result = await self._handle_general_request(
+                        message=message,
+                        selected_template=self.session_state["selected_template"],
+                        context={"ui_codes": current_ui_codes}
+                    )
+            
             # Format the response for the UI Editor API
             response = {
                 "success": result.get("success", True),
@@ -2995,6 +3192,11 @@ Current user question: {user_message}"""
                 }
             }
             
+            # Rendered alternatives for ambiguous requests
+            if result.get("variants"):
+                response["variants"] = result.get("variants")
+                response["metadata"]["variant_metadata"] = result.get("variant_metadata", {})
+            
             # Add report-related fields if they exist
             if result.get("report_generated"):
                 response["report_generated"] = result.get("report_generated")
@@ -3010,7 +3212,9 @@ Current user question: {user_message}"""
                 "response": f"Sorry, I encountered an error while processing your request: {str(e)}",
                 "session_id": session_id,
                 "metadata": {"error": "processing_error"}
-            } 
+            }
+        finally:
+            self.persist_session()
 
 
     
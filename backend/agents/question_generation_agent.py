@@ -43,9 +43,9 @@ You focus ONLY on question generation. You do not analyze requirements or recomm
                 rationale_manager = RationaleManager(session_id)
                 reasoning = f"Generated {len(result.get('questions', []))} strategic questions for {len(templates)} templates"
                 rationale_manager.add_question_generation_rationale(result.get('questions', []), reasoning)
-                print("INFO: Stored question generation rationale")
+                self.logger.debug("INFO: Stored question generation rationale")
         except Exception as e:
-            print(f"ERROR: Failed to store question generation rationale: {e}")
+            self.logger.error(f"Failed to store question generation rationale: {e}")
         
         return result
     
@@ -167,20 +167,20 @@ IMPORTANT:
             response = self.call_claude_with_cot(prompt, enable_cot=True, extract_json=True)
             
             # Debug: Log JSON response for debugging
-            print(f"DEBUG: Question Generation Agent JSON Response Length: {len(response)} chars")
-            print(f"DEBUG: Question Generation Agent JSON Response Preview: {response[:200]}...")
+            self.logger.debug("Question Generation Agent JSON Response Length: %s chars", len(response))
+            self.logger.debug("Question Generation Agent JSON Response Preview: %s...", response[:200])
             
             return response
             
         except Exception as e:
-            print(f"ERROR: Error calling Claude with tools: {e}")
+            self.logger.error(f"Error calling Claude with tools: {e}")
             return f"Error: {str(e)}"
     
     def _parse_question_response(self, response: str, templates: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Parse the LLM response for question generation"""
         
-        print(f"DEBUG: Question Generation Agent - Parsing response with {len(templates)} templates")
-        print(f"DEBUG: Question Generation Agent - Raw response preview: {response[:200]}...")
+        self.logger.debug("Question Generation Agent - Parsing response with %s templates", len(templates))
+        self.logger.debug("Question Generation Agent - Raw response preview: %s...", response[:200])
         
         try:
             # Use the base agent's consolidated method
@@ -189,10 +189,10 @@ IMPORTANT:
                 # Fallback regex approach
                 json_match = re.search(r'\{.*\}', response, re.DOTALL)
                 if not json_match:
-                    print("DEBUG: Question Generation Agent - No JSON found, using fallback")
+                    self.logger.debug("Question Generation Agent - No JSON found, using fallback")
                     return self._fallback_question_generation(templates)
                 json_str = json_match.group()
-                print(f"DEBUG: Question Generation Agent - Extracted JSON: {json_str[:200]}...")
+                self.logger.debug("Question Generation Agent - Extracted JSON: %s...", json_str[:200])
                 parsed_response = json.loads(json_str)
             
             questions = parsed_response.get("questions", [])
@@ -218,7 +218,7 @@ IMPORTANT:
             }
             
         except Exception as e:
-            print(f"ERROR: Error parsing question generation response: {e}")
+            self.logger.error(f"Error parsing question generation response: {e}")
             return self._fallback_question_generation(templates)
     
     def _fallback_question_generation(self, templates: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -1,9 +1,11 @@
 from .base_agent import BaseAgent
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import re
 import logging
 from tools.tool_utility import ToolUtility
+from db import TEMPLATE_LISTING_PROJECTION
+from utils.category_normalizer import normalize_category
 from config.keyword_manager import KeywordManager
 
 class RequirementsAnalysisAgent(BaseAgent):
@@ -28,12 +30,12 @@ You focus ONLY on requirements analysis. You do not recommend templates or gener
         
         # Detect page type from prompt
         detected_page_type = self.keyword_manager.detect_page_type(user_prompt)
-        print(f"Detected page type: {detected_page_type} from prompt: '{user_prompt}'")
+        self.logger.debug("Detected page type: %s from prompt: '%s'", detected_page_type, user_prompt)
         
         # Override with provided category if available
         if category:
             detected_page_type = category
-            print(f"OVERRIDE: page_type = {category}")
+            self.logger.debug("OVERRIDE: page_type = %s", category)
         
         # Get database context
         db_context = self._get_database_context(detected_page_type)
@@ -103,13 +105,17 @@ You focus ONLY on requirements analysis. You do not recommend templates or gener
             
             # Build logo analysis prompt
             self.logger.info("Building logo analysis prompt")
-            prompt = self._build_logo_analysis_prompt(user_message, logo_filename, current_ui_codes)
+            prompt, compressor = self._build_logo_analysis_prompt(user_message, logo_filename, current_ui_codes)
             
             # Call Claude with vision capabilities
             self.logger.info("Calling Claude with vision capabilities")
             response = self._call_claude_with_vision(prompt, logo_image)
             self.logger.info(f"Received vision API response, length: {len(response)}")
             
+            # Expand any placeholders the model echoed from the compressed stylesheet
+            if compressor:
+                response = compressor.expand(response)
+            
             # Parse logo analysis results
             logo_analysis = self._parse_logo_analysis_response(response, context)
             
@@ -184,14 +190,37 @@ IMPORTANT:
 - Use the available tools to gather information if needed
 """
         
+        if context.get('conversation_context'):
+            base_prompt += f"\n\nCONVERSATION SO FAR (use it to resolve references in the request):\n{context['conversation_context']}"
+        
         if logo_image:
             base_prompt += "\n\nLOGO ANALYSIS: Analyze the uploaded logo for design preferences and color schemes."
         
         return base_prompt
     
-    def _build_logo_analysis_prompt(self, user_message: str, logo_filename: str, current_ui_codes: Dict[str, str]) -> str:
-        """Build the logo analysis prompt"""
-        return f"""
+    def _build_logo_analysis_prompt(self, user_message: str, logo_filename: str, current_ui_codes: Dict[str, str]) -> Tuple[str, Optional[Any]]:
+        """Build the logo analysis prompt; returns (prompt, compressor used for the embedded CSS or None)"""
+        from utils.prompt_compressor import PromptCompressor, is_compression_enabled
+        import os
+        
+        codes = current_ui_codes.get("current_codes", current_ui_codes) if current_ui_codes else {}
+        html_content = codes.get("html_export", codes.get("html", ""))
+        css_content = (codes.get("globals_css", "") + "\n" + codes.get("style_css", "")).strip()
+        
+        # Embed the current stylesheet compressed so colour recommendations can name real selectors
+        css_context = ""
+        compressor = None
+        if css_content and is_compression_enabled():
+            compressor = PromptCompressor()
+            compressed_css = compressor.compress_css(css_content)
+            budget = int(os.getenv("LOGO_PROMPT_CSS_BUDGET", "6000"))
+            if len(compressed_css) > budget:
+                compressed_css = compressed_css[:budget].rsplit("\n", 1)[0]
+            report = compressor.get_report()
+            self.logger.info(f"Logo prompt CSS compressed: {report['original_tokens_est']} -> {report['compressed_tokens_est']} tokens (saved ~{report['tokens_saved_est']})")
+            css_context = f"\nCURRENT STYLESHEET (compressed):\n```css\n{compressed_css}\n```\n"
+        
+        prompt = f"""
 You are analyzing a logo image to extract design preferences for UI modification.
 
 USER REQUEST: {user_message}
@@ -199,8 +228,9 @@ USER REQUEST: {user_message}
 LOGO FILENAME: {logo_filename}
 
 CURRENT UI CONTEXT:
-- HTML: {len(current_ui_codes.get('html', ''))} characters
-- CSS: {len(current_ui_codes.get('style_css', ''))} characters
+- HTML: {len(html_content)} characters
+- CSS: {len(css_content)} characters
+{css_context}
 
 ANALYZE THE LOGO FOR:
 1. **Color Scheme**: Extract dominant colors, color temperature, brightness
@@ -233,6 +263,7 @@ PROVIDE ANALYSIS IN THIS JSON FORMAT:
 
 IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
 """
+        return prompt, compressor
     
     def _extract_response_text(self, response) -> str:
         """Extract text from Claude response, handling different content types"""
@@ -295,14 +326,14 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
 
             # Debug: Log LLM response
             response_text = self._extract_response_text(response)
-            print(f"DEBUG: Requirements Analysis Agent LLM Response Length: {len(response_text)} chars")
-            print(f"DEBUG: Requirements Analysis Agent LLM Response Preview: {response_text[:200]}...")
+            self.logger.debug("Requirements Analysis Agent LLM Response Length: %s chars", len(response_text))
+            self.logger.debug("Requirements Analysis Agent LLM Response Preview: %s...", response_text[:200])
                     
             # Only log full response if it's very short (for debugging)
             if len(response_text) < 1000:
-                print(f"DEBUG: Requirements Analysis Agent Full Response: {response_text}")
+                self.logger.debug("Requirements Analysis Agent Full Response: %s", response_text)
             else:
-                print(f"DEBUG: Requirements Analysis Agent Response truncated for logging (too long)")
+                self.logger.debug("Requirements Analysis Agent Response truncated for logging (too long)")
 
             # Handle tool calls if any
             if response.content and hasattr(response.content[0], 'tool_use') and response.content[0].tool_use:
@@ -382,22 +413,22 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
 
                     # Debug: Log final LLM response after tool calls
                     final_response_text = self._extract_response_text(final_response)
-                    print(f"DEBUG: Requirements Analysis Agent Final Response: {final_response_text[:500]}...")
+                    self.logger.debug("Requirements Analysis Agent Final Response: %s...", final_response_text[:500])
                     if len(final_response_text) > 500:
-                        print(f"DEBUG: Full Requirements Analysis Final Response: {final_response_text}")
+                        self.logger.debug("Full Requirements Analysis Final Response: %s", final_response_text)
 
                     return final_response_text
 
             return response_text
 
         except Exception as e:
-            print(f"ERROR: Error calling Claude with tools: {e}")
+            self.logger.error(f"Error calling Claude with tools: {e}")
             return f"Error: {str(e)}"
     
     def _parse_requirements_response(self, response: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Parse the LLM response and return structured requirements"""
-        print(f"DEBUG: Requirements Analysis Agent - Parsing response")
-        print(f"DEBUG: Requirements Analysis Agent - Raw response preview: {response[:200]}...")
+        self.logger.debug("Requirements Analysis Agent - Parsing response")
+        self.logger.debug("Requirements Analysis Agent - Raw response preview: %s...", response[:200])
         
         try:
             # Simple JSON extraction - look for JSON object in response
@@ -406,29 +437,29 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
                 end = response.rfind("}") + 1
                 json_str = response[start:end]
                 json_str = json_str.replace('\n', ' ').replace('\r', ' ')
-                print(f"DEBUG: Requirements Analysis Agent - Extracted JSON: {json_str[:200]}...")
+                self.logger.debug("Requirements Analysis Agent - Extracted JSON: %s...", json_str[:200])
                 
                 try:
                     specifications = json.loads(json_str)
-                    print("DEBUG: Requirements Analysis Agent - JSON parsing successful")
+                    self.logger.debug("Requirements Analysis Agent - JSON parsing successful")
                 except json.JSONDecodeError as e:
-                    print(f"DEBUG: Requirements Analysis Agent - JSON parsing failed: {e}")
+                    self.logger.debug("Requirements Analysis Agent - JSON parsing failed: %s", e)
                     specifications = self._get_default_specifications()
             else:
-                print("DEBUG: Requirements Analysis Agent - No JSON structure found, using default specifications")
+                self.logger.debug("Requirements Analysis Agent - No JSON structure found, using default specifications")
                 specifications = self._get_default_specifications()
             
             # CRITICAL FIX: Don't override the LLM's page_type analysis with old context
             # The LLM has analyzed the user's request and determined the correct page_type
-            print(f"DEBUG: LLM returned page_type: '{specifications.get('page_type', 'None')}'")
-            print(f"DEBUG: Context has page_type: '{context.get('page_type', 'None')}'")
+            self.logger.debug("LLM returned page_type: '%s'", specifications.get('page_type', 'None'))
+            self.logger.debug("Context has page_type: '%s'", context.get('page_type', 'None'))
             
             if context.get("page_type") and not specifications.get("page_type"):
                 # Only use context page_type if LLM didn't provide one
                 specifications["page_type"] = context["page_type"]
-                print(f"Fallback: Using page_type '{context['page_type']}' from context (LLM didn't provide one)")
+                self.logger.debug("Fallback: Using page_type '%s' from context (LLM didn't provide one)", context['page_type'])
             elif specifications.get("page_type"):
-                print(f"Using LLM-analyzed page_type: '{specifications['page_type']}'")
+                self.logger.debug("Using LLM-analyzed page_type: '%s'", specifications['page_type'])
             
             # Add database context to specifications
             specifications["database_context"] = {
@@ -440,20 +471,20 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
             return specifications
             
         except json.JSONDecodeError as e:
-            print(f"ERROR: Failed to parse JSON response: {e}")
+            self.logger.error(f"Failed to parse JSON response: {e}")
             specifications = self._get_default_specifications()
             # Only use context page_type on error if we don't have one from LLM
             if context.get("page_type") and not specifications.get("page_type"):
                 specifications["page_type"] = context["page_type"]
-                print(f"Error fallback: Using page_type '{context['page_type']}' from context")
+                self.logger.error(f"Error fallback: Using page_type '{context['page_type']}' from context")
             return specifications
         except Exception as e:
-            print(f"ERROR: Unexpected error in parse_requirements_response: {e}")
+            self.logger.error(f"Unexpected error in parse_requirements_response: {e}")
             specifications = self._get_default_specifications()
             # Only use context page_type on error if we don't have one from LLM
             if context.get("page_type") and not specifications.get("page_type"):
                 specifications["page_type"] = context["page_type"]
-                print(f"Error fallback: Using page_type '{context['page_type']}' from context")
+                self.logger.error(f"Error fallback: Using page_type '{context['page_type']}' from context")
             return specifications
     
     def _get_default_specifications(self) -> Dict[str, Any]:
@@ -524,18 +555,18 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
     def _get_database_context(self, page_type: str) -> Dict[str, Any]:
         """Get database context for the given page type"""
         try:
+            from services.category_catalog import category_catalog
+            
             # Get available categories
-            categories = list(self.db.templates.distinct("category"))
+            categories = category_catalog.get_categories(self.db)
             
             # Get templates for the specific page type
-            category_templates = list(self.db.templates.find({"category": page_type}))
+            category_templates = list(self.db.templates.find(
+                {"category_key": normalize_category(page_type)}, TEMPLATE_LISTING_PROJECTION
+            ))
             
             # Get all available tags
-            all_tags = []
-            for template in self.db.templates.find():
-                if "tags" in template:
-                    all_tags.extend(template["tags"])
-            all_tags = list(set(all_tags))  # Remove duplicates
+            all_tags = category_catalog.get_tags(self.db)
             
             return {
                 "available_categories": categories,
@@ -543,7 +574,7 @@ IMPORTANT: Respond with ONLY the JSON object above. NO explanatory text.
                 "available_tags": all_tags
             }
         except Exception as e:
-            print(f"Error getting database context: {e}")
+            self.logger.error(f"Error getting database context: {e}")
             return {
                 "available_categories": [],
                 "category_templates": [],
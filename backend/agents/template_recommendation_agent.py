@@ -1,9 +1,52 @@
 from .base_agent import BaseAgent
 from typing import Dict, Any, List, Optional
 import json
+import os
 import re
+import threading
 from tools.tool_utility import ToolUtility
 from config.keyword_config import KeywordManager
+from utils.template_ranker import template_ranker
+from utils.recommendation_cache import recommendation_cache
+
+class RecommendationCallMetrics:
+    """Counts how recommendations were produced and how many LLM round trips they took"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "recommendations": 0,
+            "cache_hits": 0,
+            "local_decisions": 0,
+            "prefetched_single_call": 0,
+            "tool_mode_single_call": 0,
+            "tool_mode_two_call": 0,
+            "tool_calls": 0
+        }
+    
+    def increment(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        tool_mode_calls = counts["tool_mode_single_call"] + counts["tool_mode_two_call"]
+        return {
+            **counts,
+            "two_call_rate": round(counts["tool_mode_two_call"] / tool_mode_calls, 3) if tool_mode_calls else 0.0,
+            "prefetch_mode": is_prefetch_mode_enabled()
+        }
+
+
+def is_prefetch_mode_enabled() -> bool:
+    """Inline pre-fetched database context instead of offering tools to the model"""
+    return os.getenv("RECOMMENDATION_PREFETCH_MODE", "true").lower() == "true"
+
+
+# Global instance
+recommendation_call_metrics = RecommendationCallMetrics()
+
 
 class TemplateRecommendationAgent(BaseAgent):
     """Focused agent with single responsibility: Recommend templates based on requirements"""
@@ -20,21 +63,36 @@ You focus ONLY on template recommendation and scoring. You do not analyze requir
         super().__init__("TemplateRecommendation", system_message)
         self.tool_utility = ToolUtility("template_recommendation_agent")
         self.keyword_manager = KeywordManager()
+        self._local_scores: Dict[str, float] = {}
     
     def recommend_templates(self, requirements: Dict[str, Any], category: str = None, context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Single job: Recommend templates based on requirements"""
         
-        # Get templates from database
-        templates = self._get_templates_from_database(requirements, category)
-        print(f"DEBUG: Templates after database fetch: {len(templates)} templates")
-        
-        if not templates:
-            print("DEBUG: No templates found, returning empty list")
-            return []
-        
-        # Let the LLM do the scoring and recommendation
-        scored_templates = self._score_templates_with_llm(requirements, templates, context)
-        print(f"DEBUG: Scored templates result: {len(scored_templates)} templates")
+        recommendation_call_metrics.increment("recommendations")
+        cache_key = recommendation_cache.make_key(requirements, category)
+        scored_templates = recommendation_cache.get(cache_key)
+        if scored_templates is not None:
+            recommendation_call_metrics.increment("cache_hits")
+            self.logger.debug("Recommendation cache hit: %s templates", len(scored_templates))
+        else:
+            # Get templates from database
+            templates = self._get_templates_from_database(requirements, category)
+            self.logger.debug("Templates after database fetch: %s templates", len(templates))
+            
+            if not templates:
+                self.logger.debug("No templates found, returning empty list")
+                return []
+            
+            # Shortlist locally; the LLM only scores the top candidates, or nothing when the winner is clear
+            scored_templates = self._pre_rank_templates(requirements, templates)
+            if scored_templates is None:
+                shortlist = self._shortlist_templates(requirements, templates)
+                scored_templates = self._score_templates_with_llm(requirements, shortlist, context)
+            self.logger.debug("Scored templates result: %s templates", len(scored_templates))
+            
+            # Fallback scores come from a failed LLM call and should be retried next time
+            if not any(item.get("ranking_source") == "fallback" for item in scored_templates):
+                recommendation_cache.put(cache_key, scored_templates)
         
         # Record rationale for template recommendations
         try:
@@ -50,40 +108,94 @@ You focus ONLY on template recommendation and scoring. You do not analyze requir
         
         return scored_templates[:self.keyword_manager.get_default_values()["max_templates"]]
     
+    def _get_pre_ranker_config(self) -> Dict[str, Any]:
+        """Pre-ranker settings from keywords.yaml default_values"""
+        config = {"enabled": True, "shortlist_size": 6, "decisive_margin": 0.15, "min_top_score": 0.3}
+        config.update(self.keyword_manager.get_default_values().get("pre_ranker") or {})
+        return config
+    
+    def _pre_rank_templates(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Rank locally and return final results when the margin is decisive, else None"""
+        config = self._get_pre_ranker_config()
+        self._local_scores = {}
+        if not config["enabled"]:
+            return None
+        
+        try:
+            ranked = template_ranker.rank(requirements, templates)
+        except Exception as e:
+            self.logger.error(f"Local template ranking failed: {e}")
+            return None
+        
+        self._local_scores = {self._template_identity(template): score for template, score in ranked}
+        if not template_ranker.is_decisive(ranked, config["decisive_margin"], config["min_top_score"]):
+            return None
+        
+        recommendation_call_metrics.increment("local_decisions")
+        self.logger.debug("Local ranking is decisive (%.3f vs %.3f), skipping LLM scoring", ranked[0][1], ranked[1][1])
+        return [
+            {
+                "template": template,
+                "score": round(score, 3),
+                "reasoning": "Ranked by tag and description similarity to your requirements",
+                "suitability_level": "high" if index == 0 else "medium",
+                "ranking_source": "local"
+            }
+            for index, (template, score) in enumerate(ranked)
+        ]
+    
+    def _shortlist_templates(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the locally best-ranked templates for LLM scoring"""
+        config = self._get_pre_ranker_config()
+        shortlist_size = config["shortlist_size"]
+        if not self._local_scores or len(templates) <= shortlist_size:
+            return templates
+        shortlist = sorted(
+            templates,
+            key=lambda template: self._local_scores.get(self._template_identity(template), 0.0),
+            reverse=True
+        )[:shortlist_size]
+        self.logger.debug("Shortlisted %s of %s templates for LLM scoring", len(shortlist), len(templates))
+        return shortlist
+    
+    @staticmethod
+    def _template_identity(template: Dict[str, Any]) -> str:
+        return str(template.get("template_id") or template.get("name"))
+    
     def _get_templates_from_database(self, requirements: Dict[str, Any], category: str = None) -> List[Dict[str, Any]]:
         """Get templates from database based on requirements"""
         templates = []
         
         # DEBUG: Print what we received
-        print(f"DEBUG: _get_templates_from_database called with:")
-        print(f"  requirements type: {type(requirements)}")
-        print(f"  requirements content: {requirements}")
-        print(f"  category parameter: {category}")
+        self.logger.debug("_get_templates_from_database called with:")
+        self.logger.debug("  requirements type: %s", type(requirements))
+        self.logger.debug("  requirements content: %s", requirements)
+        self.logger.debug("  category parameter: %s", category)
         
         # Get category from requirements or use provided category
         target_category = requirements.get("page_type") or category or self.keyword_manager.get_default_values()["fallback_category"]
-        print(f"Searching for templates in category: {target_category}")
+        self.logger.debug("Searching for templates in category: %s", target_category)
         
         # Get templates for the target category
         result = self.tool_utility.call_function("get_templates_by_category", {"category": target_category, "limit": 20})
         if result.get("success"):
             templates.extend(result.get("templates", []))
-            print(f"Found {len(result.get('templates', []))} templates in {target_category}")
+            self.logger.debug("Found %s templates in %s", len(result.get('templates', [])), target_category)
         
         # If no templates found, try related categories
         if not templates:
             related_categories = self.keyword_manager.get_related_categories_for(target_category)
-            print(f"No templates found in {target_category}, trying related categories: {related_categories}")
+            self.logger.debug("No templates found in %s, trying related categories: %s", target_category, related_categories)
             
             for cat in related_categories:
                 cat_result = self.tool_utility.call_function("get_templates_by_category", {"category": cat, "limit": 10})
                 if cat_result.get("success") and cat_result.get("templates"):
                     templates.extend(cat_result.get("templates", []))
-                    print(f"Found {len(cat_result.get('templates', []))} templates in related category {cat}")
+                    self.logger.debug("Found %s templates in related category %s", len(cat_result.get('templates', [])), cat)
         
         # If still no templates, try all available categories
         if not templates:
-            print("No templates found in related categories, trying all available categories")
+            self.logger.debug("No templates found in related categories, trying all available categories")
             categories_result = self.tool_utility.call_function("get_available_categories", {})
             if categories_result.get("success"):
                 available_categories = categories_result.get("categories", [])
@@ -92,24 +204,61 @@ You focus ONLY on template recommendation and scoring. You do not analyze requir
                         cat_result = self.tool_utility.call_function("get_templates_by_category", {"category": cat, "limit": 5})
                         if cat_result.get("success") and cat_result.get("templates"):
                             templates.extend(cat_result.get("templates", []))
-                            print(f"Found {len(cat_result.get('templates', []))} templates in fallback category {cat}")
+                            self.logger.debug("Found %s templates in fallback category %s", len(cat_result.get('templates', [])), cat)
         
-        print(f"Total templates found: {len(templates)}")
+        self.logger.debug("Total templates found: %s", len(templates))
         return templates
     
     def _score_templates_with_llm(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Use LLM to score templates based on requirements"""
         
-        print(f"DEBUG: Starting LLM scoring with {len(templates)} templates")
+        self.logger.debug("Starting LLM scoring with %s templates", len(templates))
         prompt = self._build_scoring_prompt(requirements, templates, context)
-        response = self._call_claude_with_tools(prompt)
-        print(f"DEBUG: LLM response length: {len(response)} characters")
-        print(f"DEBUG: LLM response preview: {response[:200]}...")
+        if is_prefetch_mode_enabled():
+            # Everything the tools would return is inlined, so this is always one round trip
+            prompt += self._build_prefetched_context(requirements, templates)
+            response = self._call_claude_single(prompt)
+        else:
+            response = self._call_claude_with_tools(prompt)
+        self.logger.debug("LLM response length: %s characters", len(response))
+        self.logger.debug("LLM response preview: %s...", response[:200])
         
         result = self._parse_scoring_response(response, templates)
-        print(f"DEBUG: Parsed result: {len(result)} templates")
+        self.logger.debug("Parsed result: %s templates", len(result))
         return result
     
+    def _build_prefetched_context(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]]) -> str:
+        """Fetch what the model would ask the tools for and inline it compactly"""
+        page_type = requirements.get("page_type") or "landing"
+        search_tags = [str(tag) for tag in (requirements.get("style_preferences") or []) + (requirements.get("key_features") or [])]
+        
+        context: Dict[str, Any] = {
+            "page_type": page_type,
+            "related_categories": self.keyword_manager.get_related_categories_for(page_type),
+            "candidate_ids": [str(template.get("template_id")) for template in templates]
+        }
+        
+        categories_result = self.tool_utility.call_function("get_available_categories", {})
+        if categories_result.get("success"):
+            context["available_categories"] = categories_result.get("categories", [])
+        
+        if search_tags:
+            tag_result = self.tool_utility.call_function(
+                "search_templates_by_tags", {"tags": search_tags, "category": page_type, "limit": 20}
+            )
+            if tag_result.get("success"):
+                candidate_ids = set(context["candidate_ids"])
+                context["tag_matched_candidate_ids"] = [
+                    template["template_id"] for template in tag_result.get("templates", [])
+                    if template.get("template_id") in candidate_ids
+                ]
+        
+        return (
+            "\nPREFETCHED DATABASE CONTEXT (no tools are available; this is everything the database tools would return):\n"
+            + json.dumps(context, separators=(",", ":"))
+            + "\n"
+        )
+    
     def _build_scoring_prompt(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> str:
         """Build prompt for LLM-based template scoring"""
         
@@ -225,6 +374,24 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
         # Fallback
         return str(content)
     
+    def _call_claude_single(self, prompt: str) -> str:
+        """Single round-trip scoring call with the database context already inlined"""
+        try:
+            response = self.claude_client.messages.create(
+                model=self.model,
+                max_tokens=8000,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            recommendation_call_metrics.increment("prefetched_single_call")
+            
+            response_text = self._extract_response_text(response)
+            self.logger.debug("Template Recommendation Agent LLM Response: %s...", response_text[:500])
+            return response_text
+            
+        except Exception as e:
+            self.logger.error(f"Error calling Claude: {e}")
+            return f"Error: {str(e)}"
+    
     def _call_claude_with_tools(self, prompt: str) -> str:
         """Call Claude with tool calling capabilities"""
         try:
@@ -233,83 +400,77 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             
             # Get available tools
             tools = self.tool_utility.get_tools()
+            request_args = {"tools": tools, "tool_choice": {"type": "auto"}} if tools else {}
             
             # Call Claude
             response = client.messages.create(
                 model=self.model,
                 max_tokens=8000,
                 messages=messages,
-                tools=tools if tools else None,
-                tool_choice={"type": "auto"} if tools else None
+                **request_args
             )
             
             # Debug: Log LLM response
             response_text = self._extract_response_text(response)
-            print(f"DEBUG: Template Recommendation Agent LLM Response: {response_text[:500]}...")
+            self.logger.debug("Template Recommendation Agent LLM Response: %s...", response_text[:500])
             if len(response_text) > 500:
-                print(f"DEBUG: Full Template Recommendation Response: {response_text}")
+                self.logger.debug("Full Template Recommendation Response: %s", response_text)
             
             # Handle tool calls if any
-            if response.content and hasattr(response.content[0], 'tool_use') and response.content[0].tool_use:
-                tool_results = []
-                for tool_use in response.content[0].tool_use:
-                    tool_name = tool_use.name
-                    
-                    # Handle tool use format
-                    if hasattr(tool_use, 'input') and tool_use.input:
-                        try:
-                            tool_args = json.loads(tool_use.input)
-                        except json.JSONDecodeError:
-                            tool_args = {"input": str(tool_use.input)}
-                    else:
-                        tool_args = {}
-                    
-                    # Call the tool
-                    tool_result = self.tool_utility.call_function(tool_name, tool_args)
-                    tool_results.append({
-                        "tool_use_id": getattr(tool_use, 'id', 'unknown'),
-                        "name": tool_name,
-                        "result": tool_result
-                    })
+            tool_uses = [block for block in (response.content or []) if getattr(block, "type", None) == "tool_use"]
+            if not tool_uses:
+                recommendation_call_metrics.increment("tool_mode_single_call")
+                return response_text
+            
+            tool_results = []
+            for tool_use in tool_uses:
+                tool_args = tool_use.input if isinstance(tool_use.input, dict) else {}
+                if isinstance(tool_use.input, str):
+                    try:
+                        tool_args = json.loads(tool_use.input)
+                    except json.JSONDecodeError:
+                        tool_args = {"input": tool_use.input}
                 
-                # If we have tool results, make another call with the results
-                if tool_results:
-                    tool_response_prompt = f"""
-                    Based on the tool results below, please provide your final template recommendations:
-
-                    TOOL RESULTS:
-                    {json.dumps(tool_results, indent=2)}
-
-                    ORIGINAL PROMPT:
-                    {prompt}
-
-                    Please provide your template recommendations in the requested JSON format.
-                    """
-                    
-                    final_response = client.messages.create(
-                        model=self.model,
-                        max_tokens=8000,
-                        messages=[{"role": "user", "content": tool_response_prompt}]
-                    )
-                    
-                    # Debug: Log final LLM response after tool calls
-                    final_response_text = self._extract_response_text(final_response)
-                    print(f"DEBUG: Template Recommendation Agent Final Response: {final_response_text[:500]}...")
-                    if len(final_response_text) > 500:
-                        print(f"DEBUG: Full Template Recommendation Final Response: {final_response_text}")
-                    
-                    return final_response_text
+                # Call the tool
+                tool_result = self.tool_utility.call_function(tool_use.name, tool_args)
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tool_use.id,
+                    "content": json.dumps(tool_result, separators=(",", ":"), default=str)
+                })
             
-            return response_text
+            recommendation_call_metrics.increment("tool_mode_two_call")
+            recommendation_call_metrics.increment("tool_calls", len(tool_uses))
+            
+            # Continue the same conversation with the tool results. The tools must stay defined because
+            # the history holds tool_use blocks, but another round is refused so the answer is plain text
+            final_response = client.messages.create(
+                model=self.model,
+                max_tokens=8000,
+                messages=messages + [
+                    {"role": "assistant", "content": response.content},
+                    {"role": "user", "content": tool_results}
+                ],
+                tools=tools,
+                tool_choice={"type": "none"}
+            )
+            
+            # Debug: Log final LLM response after tool calls
+            final_response_text = self._extract_response_text(final_response)
+            self.logger.debug("Template Recommendation Agent Final Response: %s...", final_response_text[:500])
+            if len(final_response_text) > 500:
+                self.logger.debug("Full Template Recommendation Final Response: %s", final_response_text)
+            
+            return final_response_text
             
         except Exception as e:
-            print(f"ERROR: Error calling Claude with tools: {e}")
+            self.logger.error(f"Error calling Claude with tools: {e}")
             return f"Error: {str(e)}"
     
     def _parse_scoring_response(self, response: str, templates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Parse the LLM response and convert to the expected format"""
         
-        print(f"DEBUG: Parsing response with {len(templates)} templates available")
+        self.logger.debug("Parsing response with %s templates available", len(templates))
         try:
             # Prefer robust base extractor first
             extracted = self._extract_json_from_text(response)
@@ -317,15 +478,15 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
                 # Preserve legacy extractor behavior for arrays in strings
                 json_str = self._extract_json_from_response(response)
                 if not json_str:
-                    print("No JSON found in response, using fallback scoring")
+                    self.logger.debug("No JSON found in response, using fallback scoring")
                     fallback_result = self._fallback_scoring(templates)
-                    print(f"DEBUG: Fallback scoring returned {len(fallback_result)} templates")
+                    self.logger.debug("Fallback scoring returned %s templates", len(fallback_result))
                     return fallback_result
-                print(f"DEBUG: Extracted JSON: {json_str[:200]}...")
+                self.logger.debug("Extracted JSON: %s...", json_str[:200])
                 recommendations = json.loads(json_str)
             else:
                 recommendations = extracted
-            print(f"DEBUG: Parsed JSON has {len(recommendations)} recommendations")
+            self.logger.debug("Parsed JSON has %s recommendations", len(recommendations))
             
             scored_templates = []
             
@@ -364,7 +525,7 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             return scored_templates
             
         except Exception as e:
-            print(f"ERROR: Error parsing scoring response: {e}")
+            self.logger.error(f"Error parsing scoring response: {e}")
             return self._fallback_scoring(templates)
     
     def _extract_json_from_text(self, response: str) -> Optional[List[Dict[str, Any]]]:
@@ -378,7 +539,7 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             # If base method fails, try our custom extraction
             return None
         except Exception as e:
-            print(f"DEBUG: Base agent JSON extraction failed: {e}")
+            self.logger.debug("Base agent JSON extraction failed: %s", e)
             return None
 
     def _extract_json_from_response(self, response: str) -> Optional[str]:
@@ -392,13 +553,13 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             # Fallback to legacy extraction if base method fails
             return self._legacy_json_extraction(response)
         except Exception as e:
-            print(f"DEBUG: Base agent JSON extraction failed: {e}")
+            self.logger.debug("Base agent JSON extraction failed: %s", e)
             return None
     
     def _legacy_json_extraction(self, response: str) -> Optional[str]:
         """Legacy JSON extraction method as fallback"""
-        print(f"DEBUG: Attempting legacy JSON extraction from response of length {len(response)}")
-        print(f"DEBUG: Response preview: {response[:300]}...")
+        self.logger.debug("Attempting legacy JSON extraction from response of length %s", len(response))
+        self.logger.debug("Response preview: %s...", response[:300])
         
         # Strategy 1: Find JSON array (most common format)
         json_match = re.search(r'\[.*\]', response, re.DOTALL)
@@ -406,10 +567,10 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             try:
                 json_str = json_match.group()
                 json.loads(json_str)
-                print(f"DEBUG: Strategy 1 succeeded - found valid JSON array")
+                self.logger.debug("Strategy 1 succeeded - found valid JSON array")
                 return json_str
             except json.JSONDecodeError as e:
-                print(f"DEBUG: Strategy 1 failed - JSON decode error: {e}")
+                self.logger.debug("Strategy 1 failed - JSON decode error: %s", e)
                 pass
         
         # Strategy 2: Find JSON object
@@ -418,10 +579,10 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             try:
                 json_str = json_match.group()
                 json.loads(json_str)
-                print(f"DEBUG: Strategy 2 succeeded - found valid JSON object")
+                self.logger.debug("Strategy 2 succeeded - found valid JSON object")
                 return json_str
             except json.JSONDecodeError as e:
-                print(f"DEBUG: Strategy 2 failed - JSON decode error: {e}")
+                self.logger.debug("Strategy 2 failed - JSON decode error: %s", e)
                 pass
         
         # Strategy 3: Look for specific patterns like "recommendations:" or "templates:"
@@ -438,10 +599,10 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
                 try:
                     json_str = match.group(1)
                     json.loads(json_str)
-                    print(f"DEBUG: Strategy 3.{i+1} succeeded - found JSON after pattern")
+                    self.logger.debug("Strategy 3.%s succeeded - found JSON after pattern", i + 1)
                     return json_str
                 except json.JSONDecodeError as e:
-                    print(f"DEBUG: Strategy 3.{i+1} failed - JSON decode error: {e}")
+                    self.logger.debug("Strategy 3.%s failed - JSON decode error: %s", i + 1, e)
                     pass
         
         # Strategy 4: Try to find JSON between markdown code blocks
@@ -450,10 +611,10 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             try:
                 json_str = code_block_match.group(1)
                 json.loads(json_str)
-                print(f"DEBUG: Strategy 4 succeeded - found JSON in code block")
+                self.logger.debug("Strategy 4 succeeded - found JSON in code block")
                 return json_str
             except json.JSONDecodeError as e:
-                print(f"DEBUG: Strategy 4 failed - JSON decode error: {e}")
+                self.logger.debug("Strategy 4 failed - JSON decode error: %s", e)
                 pass
         
         # Strategy 5: Look for JSON after common prefixes
@@ -470,10 +631,10 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
                 try:
                     json_str = match.group(1)
                     json.loads(json_str)
-                    print(f"DEBUG: Strategy 5.{i+1} succeeded - found JSON after prefix")
+                    self.logger.debug("Strategy 5.%s succeeded - found JSON after prefix", i + 1)
                     return json_str
                 except json.JSONDecodeError as e:
-                    print(f"DEBUG: Strategy 5.{i+1} failed - JSON decode error: {e}")
+                    self.logger.debug("Strategy 5.%s failed - JSON decode error: %s", i + 1, e)
                     pass
         
         # Strategy 6: Try to extract and fix common JSON issues
@@ -486,13 +647,13 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
             if fixed_json:
                 try:
                     json.loads(fixed_json)
-                    print(f"DEBUG: Strategy 6 succeeded - fixed JSON issues")
+                    self.logger.debug("Strategy 6 succeeded - fixed JSON issues")
                     return fixed_json
                 except json.JSONDecodeError as e:
-                    print(f"DEBUG: Strategy 6 failed - JSON decode error after fixing: {e}")
+                    self.logger.debug("Strategy 6 failed - JSON decode error after fixing: %s", e)
                     pass
         
-        print(f"DEBUG: All JSON extraction strategies failed")
+        self.logger.debug("All JSON extraction strategies failed")
         return None
     
     def _fix_common_json_issues(self, json_str: str) -> Optional[str]:
@@ -517,19 +678,22 @@ REMEMBER: Your response must begin with [ and end with ]. No other text allowed.
     def _fallback_scoring(self, templates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Simple fallback scoring if LLM parsing fails"""
         scored_templates = []
+        local_scores = getattr(self, "_local_scores", {})
         for template in templates:
-            # Simple fallback scoring
+            # Simple fallback scoring, nudged by local similarity when available
             score = 0.5  # Default score
             if template.get("category") == "landing":
                 score += 0.2
             if template.get("tags"):
                 score += 0.1
+            score += 0.2 * local_scores.get(self._template_identity(template), 0.0)
             
             scored_templates.append({
                 "template": template,
                 "score": score,
                 "reasoning": "Fallback scoring applied due to LLM parsing error",
-                "suitability_level": "medium"
+                "suitability_level": "medium",
+                "ranking_source": "fallback"
             })
         
         scored_templates.sort(key=lambda x: x["score"], reverse=True)
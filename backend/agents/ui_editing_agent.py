@@ -47,7 +47,7 @@ Your role is to:
     def _extract_json_from_response(self, response: str, context: str = "response") -> Optional[Dict[str, Any]]:
         """Extract JSON from LLM response using consolidated base method"""
         try:
-            self.logger.debug(f"JSON EXTRACTION: Extracting JSON from {context}: {response[:200]}...")
+            self.logger.debug("JSON EXTRACTION: Extracting JSON from %s: %s...", context, response[:200])
             
             # Use the base agent's consolidated method
             result = super()._extract_json_from_response(response, return_type="dict", context=context)
@@ -133,7 +133,7 @@ Your role is to:
                     self.logger.info(f"UI EDITING AGENT: Phase status - current: {current_phase}, transition: {phase_transition_completed}")
             
             self.logger.info(f"UI EDITING AGENT: Starting modification request: {user_feedback}")
-            print(f"DEBUG: UI Editing Agent - Starting modification request...")
+            self.logger.debug("UI Editing Agent - Starting modification request...")
             
             # Extract current UI code
             code_extraction_start_time = time.time()
@@ -141,29 +141,32 @@ Your role is to:
             style_css = current_template.get("style_css", "")
             globals_css = current_template.get("globals_css", "")
             code_extraction_end_time = time.time()
-            print(f"DEBUG: UI Editing Agent - Code extraction completed in {code_extraction_end_time - code_extraction_start_time:.2f} seconds")
+            self.logger.debug("UI Editing Agent - Code extraction completed in %.2f seconds", code_extraction_end_time - code_extraction_start_time)
             
             self.logger.info(f"📊 UI EDITING AGENT: Template loaded - HTML: {len(html_content)} chars, CSS: {len(style_css)} chars")
             
             if not html_content:
                 self.logger.error(f"UI EDITING AGENT: No HTML content found in template")
-                print(f"DEBUG: UI Editing Agent - Failed after {time.time() - phase_start_time:.2f} seconds (no HTML content)")
+                self.logger.debug("UI Editing Agent - Failed after %.2f seconds (no HTML content)", time.time() - phase_start_time)
                 return {
                     "success": False,
                     "error": "No HTML content found in template"
                 }
             
+            # Compress the code embedded in both prompts
+            compressor, prompt_html, prompt_style, prompt_globals = self._compress_template_code(html_content, style_css, globals_css)
+            
             # Step 1: Create detailed modification plan
             planner_start_time = time.time()
             self.logger.info(f"PLANNER PHASE: Creating modification plan...")
-            print(f"DEBUG: UI Editing Agent - Starting planner phase...")
-            plan_result = self._create_modification_plan(user_feedback, html_content, style_css, globals_css)
+            self.logger.debug("UI Editing Agent - Starting planner phase...")
+            plan_result = self._create_modification_plan(user_feedback, prompt_html, prompt_style, prompt_globals)
             planner_end_time = time.time()
-            print(f"DEBUG: UI Editing Agent - Planner phase completed in {planner_end_time - planner_start_time:.2f} seconds")
+            self.logger.debug("UI Editing Agent - Planner phase completed in %.2f seconds", planner_end_time - planner_start_time)
             
             if not plan_result.get("success"):
                 self.logger.error(f"PLANNER PHASE: Failed to create modification plan")
-                print(f"DEBUG: UI Editing Agent - Failed after {time.time() - phase_start_time:.2f} seconds (planner failed)")
+                self.logger.debug("UI Editing Agent - Failed after %.2f seconds (planner failed)", time.time() - phase_start_time)
                 return plan_result
             
             modification_plan = plan_result["plan"]
@@ -172,25 +175,26 @@ Your role is to:
             # Check if clarification is needed
             if modification_plan.get("requires_clarification", False):
                 self.logger.info(f"❓ PLANNER PHASE: Clarification needed from user")
-                print(f"DEBUG: UI Editing Agent - Clarification needed, total time: {time.time() - phase_start_time:.2f} seconds")
+                self.logger.debug("UI Editing Agent - Clarification needed, total time: %.2f seconds", time.time() - phase_start_time)
                 return {
                     "success": True,
                     "requires_clarification": True,
                     "clarification_options": modification_plan.get("clarification_options", []),
-                    "original_request": user_feedback
+                    "original_request": user_feedback,
+                    "modification_plan": modification_plan
                 }
             
             # Step 2: Execute the plan and generate new code
             executor_start_time = time.time()
             self.logger.info(f"EXECUTOR PHASE: Executing modification plan...")
-            print(f"DEBUG: UI Editing Agent - Starting executor phase...")
-            execution_result = self._execute_modification_plan(modification_plan, html_content, style_css, globals_css, user_feedback)
+            self.logger.debug("UI Editing Agent - Starting executor phase...")
+            execution_result = self._execute_modification_plan(modification_plan, prompt_html, prompt_style, prompt_globals, user_feedback)
             executor_end_time = time.time()
-            print(f"DEBUG: UI Editing Agent - Executor phase completed in {executor_end_time - executor_start_time:.2f} seconds")
+            self.logger.debug("UI Editing Agent - Executor phase completed in %.2f seconds", executor_end_time - executor_start_time)
             
             if not execution_result.get("success"):
                 self.logger.error(f"EXECUTOR PHASE: Failed to execute modification plan")
-                print(f"DEBUG: UI Editing Agent - Failed after {time.time() - phase_start_time:.2f} seconds (executor failed)")
+                self.logger.debug("UI Editing Agent - Failed after %.2f seconds (executor failed)", time.time() - phase_start_time)
                 return execution_result
             
             self.logger.info(f"EXECUTOR PHASE: Plan executed successfully")
@@ -198,24 +202,25 @@ Your role is to:
             
             # Log total execution time
             phase_end_time = time.time()
-            print(f"DEBUG: UI Editing Agent - Total execution time: {phase_end_time - phase_start_time:.2f} seconds")
-            print(f"DEBUG: Breakdown:")
-            print(f"  - Code extraction: {code_extraction_end_time - code_extraction_start_time:.2f} seconds")
-            print(f"  - Planner phase: {planner_end_time - planner_start_time:.2f} seconds")
-            print(f"  - Executor phase: {executor_end_time - executor_start_time:.2f} seconds")
-            print(f"  - Total overhead: {phase_end_time - phase_start_time - (code_extraction_end_time - code_extraction_start_time) - (planner_end_time - planner_start_time) - (executor_end_time - executor_start_time):.2f} seconds")
+            self.logger.debug("UI Editing Agent - Total execution time: %.2f seconds", phase_end_time - phase_start_time)
+            self.logger.debug("Breakdown:")
+            self.logger.debug("  - Code extraction: %.2f seconds", code_extraction_end_time - code_extraction_start_time)
+            self.logger.debug("  - Planner phase: %.2f seconds", planner_end_time - planner_start_time)
+            self.logger.debug("  - Executor phase: %.2f seconds", executor_end_time - executor_start_time)
+            self.logger.debug("  - Total overhead: %.2f seconds", phase_end_time - phase_start_time - (code_extraction_end_time - code_extraction_start_time) - (planner_end_time - planner_start_time) - (executor_end_time - executor_start_time))
             
             # Return the complete result
             return {
                 "success": True,
                 "requires_clarification": False,
                 "changes_summary": execution_result.get("changes_summary", []),
-                "modified_template": {
-                    "html_export": execution_result.get("html", html_content),
-                    "style_css": execution_result.get("style_css", style_css),
-                    "globals_css": execution_result.get("globals_css", globals_css)
-                },
+                "modified_template": self._restore_template_code(
+                    execution_result, compressor,
+                    (prompt_html, prompt_style, prompt_globals),
+                    (html_content, style_css, globals_css)
+                ),
                 "metadata": {
+                    "prompt_compression": compressor.get_report() if compressor else None,
                     "execution_time": phase_end_time - phase_start_time,
                     "timing_breakdown": {
                         "code_extraction": code_extraction_end_time - code_extraction_start_time,
@@ -228,43 +233,166 @@ Your role is to:
             
         except Exception as e:
             phase_end_time = time.time()
-            print(f"DEBUG: UI Editing Agent - Failed after {phase_end_time - phase_start_time:.2f} seconds")
+            self.logger.debug("UI Editing Agent - Failed after %.2f seconds", phase_end_time - phase_start_time)
             self.logger.error(f"UI EDITING AGENT: Error processing modification request: {e}")
             return {
                     "success": False,
                 "error": f"Processing failed: {str(e)}"
             }
     
+    def _compress_template_code(self, html_content: str, style_css: str, globals_css: str):
+        """Compress template code for prompts; returns (compressor, html, style_css, globals_css)"""
+        from utils.prompt_compressor import PromptCompressor, is_compression_enabled
+        if not is_compression_enabled():
+            return None, html_content, style_css, globals_css
+        
+        compressor = PromptCompressor()
+        prompt_html = compressor.compress_html(html_content)
+        prompt_style = compressor.compress_css(style_css)
+        prompt_globals = compressor.compress_css(globals_css)
+        
+        report = compressor.get_report()
+        self.logger.info(f"PROMPT COMPRESSION: {report['original_tokens_est']} -> {report['compressed_tokens_est']} tokens (saved ~{report['tokens_saved_est']}, {report['placeholders']} placeholders)")
+        return compressor, prompt_html, prompt_style, prompt_globals
+    
+    def _restore_template_code(self, execution_result: Dict[str, Any], compressor, prompt_codes: tuple, original_codes: tuple) -> Dict[str, str]:
+        """Map executor output back to real code: untouched files stay original, edited CSS is spliced into the original text"""
+        restored = {}
+        for result_key, template_key, prompt_code, original_code in zip(
+            ("html", "style_css", "globals_css"),
+            ("html_export", "style_css", "globals_css"),
+            prompt_codes,
+            original_codes
+        ):
+            value = execution_result.get(result_key, prompt_code)
+            if value == prompt_code:
+                restored[template_key] = original_code
+            elif compressor is None:
+                restored[template_key] = value
+            elif template_key == "html_export":
+                restored[template_key] = compressor.expand(value)
+            else:
+                restored[template_key] = compressor.splice_css(original_code, prompt_code, value)
+        return restored
+    
+    def process_variant_request(self, user_feedback: str, current_template: Dict[str, Any], clarification_options: List[Dict[str, Any]], base_plan: Optional[Dict[str, Any]] = None, max_variants: Optional[int] = None, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Execute every clarification option concurrently so the user can pick a rendered variant"""
+        import copy
+        import os
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        
+        start_time = time.time()
+        if max_variants is None:
+            max_variants = int(os.getenv("UI_EDIT_MAX_VARIANTS", "3"))
+        if max_workers is None:
+            max_workers = int(os.getenv("UI_EDIT_VARIANT_WORKERS", "3"))
+        
+        html_content = current_template.get("html_export", "")
+        style_css = current_template.get("style_css", "")
+        globals_css = current_template.get("globals_css", "")
+        
+        options = [option for option in clarification_options if isinstance(option, dict)][:max_variants]
+        if not html_content or not options:
+            return {
+                "success": False,
+                "error": "No HTML content or clarification options to build variants from"
+            }
+        
+        compressor, prompt_html, prompt_style, prompt_globals = self._compress_template_code(html_content, style_css, globals_css)
+        
+        def build_variant(index: int, option: Dict[str, Any]) -> Dict[str, Any]:
+            target_label = option.get("text_content") or option.get("description") or option.get("css_selector") or f"Option {index}"
+            variant_request = f"{user_feedback} (targeting: {target_label})"
+            
+            # Resolve the ambiguity in the plan by pinning this option as the target
+            plan = copy.deepcopy(base_plan) if base_plan else {}
+            plan["requires_clarification"] = False
+            plan["clarification_options"] = []
+            plan.setdefault("target_identification", {})
+            plan["target_identification"]["primary_target"] = {
+                "text_content": option.get("text_content", ""),
+                "css_selector": option.get("css_selector", ""),
+                "confidence": 1.0,
+                "reasoning": f"Variant generated for clarification option {index}"
+            }
+            plan["target_identification"]["alternative_targets"] = []
+            
+            execution_result = self._execute_modification_plan(
+                plan, prompt_html, prompt_style, prompt_globals, variant_request, record_rationale=False
+            )
+            return {
+                "variant_id": index,
+                "option": option,
+                "label": target_label,
+                "request": variant_request,
+                "success": execution_result.get("success", False),
+                "error": execution_result.get("error"),
+                "changes_summary": execution_result.get("changes_summary", []),
+                "modified_template": self._restore_template_code(
+                    execution_result, compressor,
+                    (prompt_html, prompt_style, prompt_globals),
+                    (html_content, style_css, globals_css)
+                ) if execution_result.get("success") else None
+            }
+        
+        self.logger.info(f"VARIANT MODE: Executing {len(options)} variants with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(options)))) as executor:
+            futures = [executor.submit(build_variant, index, option) for index, option in enumerate(options, 1)]
+            variants = []
+            for index, future in enumerate(futures, 1):
+                try:
+                    variants.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"VARIANT MODE: Variant {index} failed: {e}")
+                    variants.append({"variant_id": index, "option": options[index - 1], "success": False, "error": str(e), "modified_template": None})
+        
+        successful = [variant for variant in variants if variant.get("success")]
+        self.logger.info(f"VARIANT MODE: {len(successful)}/{len(variants)} variants generated in {time.time() - start_time:.2f} seconds")
+        
+        return {
+            "success": bool(successful),
+            "variants": variants,
+            "original_request": user_feedback,
+            "error": None if successful else "None of the variants could be generated",
+            "metadata": {
+                "prompt_compression": compressor.get_report() if compressor else None,
+                "execution_time": time.time() - start_time,
+                "variant_count": len(variants),
+                "successful_variants": len(successful)
+            }
+        }
+    
     def _create_modification_plan(self, user_feedback: str, html_content: str, style_css: str, globals_css: str) -> Dict[str, Any]:
         """Step 1: Create a detailed modification plan using LLM analysis"""
         import time
         planner_start_time = time.time()
         try:
             self.logger.info(f"PLANNER: Building enhanced planning prompt...")
-            print(f"DEBUG: PLANNER - Building enhanced planning prompt...")
+            self.logger.debug("PLANNER - Building enhanced planning prompt...")
             
             # Build the enhanced planning prompt that lets LLM do all analysis
             prompt_build_start_time = time.time()
             prompt = self._build_planning_prompt(user_feedback, html_content, style_css, globals_css)
             prompt_build_end_time = time.time()
-            print(f"DEBUG: PLANNER - Prompt building completed in {prompt_build_end_time - prompt_build_start_time:.2f} seconds")
+            self.logger.debug("PLANNER - Prompt building completed in %.2f seconds", prompt_build_end_time - prompt_build_start_time)
             
             self.logger.info(f"PLANNER: Sending planning request to Claude Haiku...")
-            print(f"DEBUG: PLANNER - Sending planning request to Claude Haiku...")
+            self.logger.debug("PLANNER - Sending planning request to Claude Haiku...")
             llm_call_start_time = time.time()
             response = self.call_claude_with_cot(prompt, enable_cot=True, extract_json=True)
             llm_call_end_time = time.time()
-            print(f"DEBUG: PLANNER - LLM call completed in {llm_call_end_time - llm_call_start_time:.2f} seconds")
+            self.logger.debug("PLANNER - LLM call completed in %.2f seconds", llm_call_end_time - llm_call_start_time)
             
             self.logger.info(f"PLANNER: Received response from Claude Haiku (length: {len(response)})")
             
             # Parse the planning response
             self.logger.info(f"PLANNER: Parsing JSON from planning response...")
-            print(f"DEBUG: PLANNER - Parsing JSON from planning response...")
+            self.logger.debug("PLANNER - Parsing JSON from planning response...")
             parsing_start_time = time.time()
             plan = self._extract_json_from_response(response, "planning response")
             parsing_end_time = time.time()
-            print(f"DEBUG: PLANNER - JSON parsing completed in {parsing_end_time - parsing_start_time:.2f} seconds")
+            self.logger.debug("PLANNER - JSON parsing completed in %.2f seconds", parsing_end_time - parsing_start_time)
             
             if plan:
                 self.logger.info(f"PLANNER: Successfully parsed modification plan")
@@ -281,12 +409,12 @@ Your role is to:
                 
                 # Log total planner execution time
                 planner_end_time = time.time()
-                print(f"DEBUG: PLANNER - Total execution time: {planner_end_time - planner_start_time:.2f} seconds")
-                print(f"DEBUG: Breakdown:")
-                print(f"  - Prompt building: {prompt_build_end_time - prompt_build_start_time:.2f} seconds")
-                print(f"  - LLM call: {llm_call_end_time - llm_call_start_time:.2f} seconds")
-                print(f"  - JSON parsing: {parsing_end_time - parsing_start_time:.2f} seconds")
-                print(f"  - Total overhead: {planner_end_time - planner_start_time - (prompt_build_end_time - prompt_build_start_time) - (llm_call_end_time - llm_call_start_time) - (parsing_end_time - parsing_start_time):.2f} seconds")
+                self.logger.debug("PLANNER - Total execution time: %.2f seconds", planner_end_time - planner_start_time)
+                self.logger.debug("Breakdown:")
+                self.logger.debug("  - Prompt building: %.2f seconds", prompt_build_end_time - prompt_build_start_time)
+                self.logger.debug("  - LLM call: %.2f seconds", llm_call_end_time - llm_call_start_time)
+                self.logger.debug("  - JSON parsing: %.2f seconds", parsing_end_time - parsing_start_time)
+                self.logger.debug("  - Total overhead: %.2f seconds", planner_end_time - planner_start_time - (prompt_build_end_time - prompt_build_start_time) - (llm_call_end_time - llm_call_start_time) - (parsing_end_time - parsing_start_time))
                 
                 return {
                     "success": True,
@@ -294,7 +422,7 @@ Your role is to:
                 }
             else:
                 self.logger.error(f"PLANNER: Failed to parse modification plan from LLM response")
-                print(f"DEBUG: PLANNER - Failed after {time.time() - planner_start_time:.2f} seconds (JSON parsing failed)")
+                self.logger.debug("PLANNER - Failed after %.2f seconds (JSON parsing failed)", time.time() - planner_start_time)
                 return {
                     "success": False,
                     "error": "Failed to parse modification plan from LLM response"
@@ -302,7 +430,7 @@ Your role is to:
             
         except Exception as e:
             planner_end_time = time.time()
-            print(f"DEBUG: PLANNER - Failed after {planner_end_time - planner_start_time:.2f} seconds")
+            self.logger.debug("PLANNER - Failed after %.2f seconds", planner_end_time - planner_start_time)
             self.logger.error(f"PLANNER: Error creating modification plan: {e}")
             return {
                 "success": False,
@@ -603,55 +731,50 @@ Create valid CSS selectors that:
 - **Handle ambiguity gracefully**: Provide clarification options when needed
 - **Consider all context**: Spatial, visual, semantic, and functional aspects"""
     
-    def _execute_modification_plan(self, modification_plan: Dict[str, Any], html_content: str, style_css: str, globals_css: str, user_request: str) -> Dict[str, Any]:
+    def _execute_modification_plan(self, modification_plan: Dict[str, Any], html_content: str, style_css: str, globals_css: str, user_request: str, record_rationale: bool = True) -> Dict[str, Any]:
         """Step 2: Execute the modification plan and generate new code"""
         import time
         executor_start_time = time.time()
         try:
             self.logger.info(f"EXECUTOR: Building execution prompt...")
-            print(f"DEBUG: EXECUTOR - Building execution prompt...")
+            self.logger.debug("EXECUTOR - Building execution prompt...")
           
             # Build the execution prompt
             prompt_build_start_time = time.time()
             prompt = self._build_execution_prompt(modification_plan, html_content, style_css, globals_css, user_request)
             prompt_build_end_time = time.time()
-            print(f"DEBUG: EXECUTOR - Prompt building completed in {prompt_build_end_time - prompt_build_start_time:.2f} seconds")
+            self.logger.debug("EXECUTOR - Prompt building completed in %.2f seconds", prompt_build_end_time - prompt_build_start_time)
             
             llm_call_start_time = time.time()
-            print(f"DEBUG: EXECUTOR - Sending execution request to Claude Haiku...")
+            self.logger.debug("EXECUTOR - Sending execution request to Claude Haiku...")
             response = self.call_claude_with_cot(prompt, enable_cot=False, extract_json=True)
             llm_call_end_time = time.time()
-            print(f"DEBUG: EXECUTOR - LLM call completed in {llm_call_end_time - llm_call_start_time:.2f} seconds")
+            self.logger.debug("EXECUTOR - LLM call completed in %.2f seconds", llm_call_end_time - llm_call_start_time)
             
             self.logger.info(f"EXECUTOR: Received response from Claude Haiku (length: {len(response)})")
             
             # Parse the execution response (no CoT format expected)
             parsing_start_time = time.time()
-            print(f"DEBUG: EXECUTOR - Parsing execution response...")
+            self.logger.debug("EXECUTOR - Parsing execution response...")
             result = self._parse_execution_response(response, html_content, style_css, globals_css)
             parsing_end_time = time.time()
-            print(f"DEBUG: EXECUTOR - Response parsing completed in {parsing_end_time - parsing_start_time:.2f} seconds")
+            self.logger.debug("EXECUTOR - Response parsing completed in %.2f seconds", parsing_end_time - parsing_start_time)
             
             if result:
                 self.logger.info(f"EXECUTOR: Successfully parsed execution result")
                 
-                # Store execution summary in rationale
-                try:
-                    from utils.rationale_manager import RationaleManager
-                    rationale_manager = RationaleManager(self.session_id)
-                    rationale_manager.add_ui_editing_execution_summary(result, user_request)
-                    self.logger.info("Stored UI editing execution rationale")
-                except Exception as e:
-                    self.logger.error(f"Failed to store UI editing execution rationale: {e}")
+                # Store execution summary in rationale (variants record only the chosen one)
+                if record_rationale:
+                    self.record_execution_rationale(result, user_request)
                 
                 # Log total executor execution time
                 executor_end_time = time.time()
-                print(f"DEBUG: EXECUTOR - Total execution time: {executor_end_time - executor_start_time:.2f} seconds")
-                print(f"DEBUG: Breakdown:")
-                print(f"  - Prompt building: {prompt_build_end_time - prompt_build_start_time:.2f} seconds")
-                print(f"  - LLM call: {llm_call_end_time - llm_call_start_time:.2f} seconds")
-                print(f"  - Response parsing: {parsing_end_time - parsing_start_time:.2f} seconds")
-                print(f"  - Total overhead: {executor_end_time - executor_start_time - (prompt_build_end_time - prompt_build_start_time) - (llm_call_end_time - llm_call_start_time) - (parsing_end_time - parsing_start_time):.2f} seconds")
+                self.logger.debug("EXECUTOR - Total execution time: %.2f seconds", executor_end_time - executor_start_time)
+                self.logger.debug("Breakdown:")
+                self.logger.debug("  - Prompt building: %.2f seconds", prompt_build_end_time - prompt_build_start_time)
+                self.logger.debug("  - LLM call: %.2f seconds", llm_call_end_time - llm_call_start_time)
+                self.logger.debug("  - Response parsing: %.2f seconds", parsing_end_time - parsing_start_time)
+                self.logger.debug("  - Total overhead: %.2f seconds", executor_end_time - executor_start_time - (prompt_build_end_time - prompt_build_start_time) - (llm_call_end_time - llm_call_start_time) - (parsing_end_time - parsing_start_time))
                 
                 return {
                     "success": True,
@@ -662,7 +785,7 @@ Create valid CSS selectors that:
                 }
             else:
                 self.logger.error(f"EXECUTOR: Failed to parse execution result from LLM response")
-                print(f"DEBUG: EXECUTOR - Failed after {time.time() - executor_start_time:.2f} seconds (response parsing failed)")
+                self.logger.debug("EXECUTOR - Failed after %.2f seconds (response parsing failed)", time.time() - executor_start_time)
                 return {
                     "success": False,
                     "error": "Failed to parse execution result from LLM response"
@@ -670,13 +793,23 @@ Create valid CSS selectors that:
                 
         except Exception as e:
             executor_end_time = time.time()
-            print(f"DEBUG: EXECUTOR - Failed after {executor_end_time - executor_start_time:.2f} seconds")
+            self.logger.debug("EXECUTOR - Failed after %.2f seconds", executor_end_time - executor_start_time)
             self.logger.error(f"EXECUTOR: Error executing modification plan: {e}")
             return {
                 "success": False,
                 "error": f"Execution failed: {str(e)}"
             }
     
+    def record_execution_rationale(self, result: Dict[str, Any], user_request: str):
+        """Store an execution summary in the session rationale"""
+        try:
+            from utils.rationale_manager import RationaleManager
+            rationale_manager = RationaleManager(self.session_id)
+            rationale_manager.add_ui_editing_execution_summary(result, user_request)
+            self.logger.info("Stored UI editing execution rationale")
+        except Exception as e:
+            self.logger.error(f"Failed to store UI editing execution rationale: {e}")
+    
     def _build_execution_prompt(self, modification_plan: Dict[str, Any], html_content: str, style_css: str, globals_css: str, user_request: str) -> str:
         """Build the execution prompt"""
         
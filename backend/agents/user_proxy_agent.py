@@ -28,19 +28,11 @@ Do NOT use any emojis or special characters - use plain text only."""
         
         # Now that self.db is available, get database constraints
         try:
-            categories = self.db.templates.distinct('category')
-            metadata_categories = self.db.templates.distinct('metadata.category')
-            all_categories = list(set(categories + metadata_categories))
-            all_categories = [cat for cat in all_categories if cat]
+            from services.category_catalog import category_catalog
+            all_categories = category_catalog.get_categories(self.db)
             
             # Get available tags
-            all_tags = []
-            templates = list(self.db.templates.find())
-            for template in templates:
-                tags = template.get('tags', [])
-                if tags:
-                    all_tags.extend(tags)
-            unique_tags = list(set(all_tags))
+            unique_tags = category_catalog.get_tags(self.db)
             
             # Update system message with database constraints
             updated_system_message = f"""You are a User Proxy Agent responsible for:
@@ -66,7 +58,7 @@ IMPORTANT RULES:
             self.system_message = updated_system_message
             
         except Exception as e:
-            print(f"Warning: Could not load database constraints for UserProxyAgent: {e}")
+            self.logger.warning(f"Could not load database constraints for UserProxyAgent: {e}")
             # Continue with basic system message
 
     def create_response_from_instructions(self, instructions, final_data=None):
@@ -332,6 +324,8 @@ IMPORTANT RULES:
                 return response
             elif response_type == "editing_clarification_needed":
                 return self._create_clarification_needed_response(instructions)
+            elif response_type == "editing_variants_ready":
+                return self._create_variants_ready_response(instructions)
             elif response_type == "editing_clarification_invalid_choice":
                 return self._create_clarification_invalid_choice_response(instructions)
             elif response_type == "clarification_needed":
@@ -395,6 +389,29 @@ IMPORTANT RULES:
             self.logger.error(f"Error creating clarification needed response: {e}")
             return "I found multiple possible targets for your request. Please specify which element you'd like me to modify."
 
+    def _create_variants_ready_response(self, instructions: Dict[str, Any]) -> str:
+        """Create response presenting rendered variants for an ambiguous edit"""
+        try:
+            variants = instructions.get("variants", [])
+            original_request = instructions.get("original_request", "")
+            
+            response = f"Your request '{original_request}' could apply to more than one element, so I've prepared {len(variants)} versions for you to compare:\n\n"
+            
+            for number, variant in enumerate(variants, 1):
+                response += f"{variant.get('number', number)}. {variant.get('label', 'Variant')}"
+                changes = variant.get("changes_summary", [])
+                if changes:
+                    response += f" - {changes[0]}"
+                response += "\n"
+            
+            response += "\nPick the version you like by number (1, 2, 3, etc.) and I'll apply it."
+            
+            return response
+            
+        except Exception as e:
+            self.logger.error(f"Error creating variants ready response: {e}")
+            return "I've prepared a few versions of your change. Please pick the one you'd like me to apply."
+
     def _create_clarification_invalid_choice_response(self, instructions: Dict[str, Any]) -> str:
         """Create response when user's clarification choice is invalid"""
         try:
@@ -113,6 +113,10 @@ class KeywordManager:
         """Get template selection keywords"""
         return self._config_data.get("template_selection_keywords", {})
     
+    def get_constraint_keywords(self) -> Dict[str, List[str]]:
+        """Get tag classification keywords for category constraints"""
+        return self._config_data.get("constraint_keywords", {})
+    
     def get_default_values(self) -> Dict[str, Any]:
         """Get default values"""
         return self._config_data.get("default_values", {})
@@ -1,7 +1,15 @@
 import os
-from pymongo import MongoClient
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from pymongo import MongoClient, ASCENDING
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Try to load .env file, but don't fail if it doesn't exist or is corrupted
 try:
     load_dotenv()
@@ -12,8 +20,73 @@ except Exception as e:
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "ui_templates")
 
-client = MongoClient(MONGODB_URI)
+# Connection pool sizing, shared by sync callers and the async executor
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+}
+
+client = MongoClient(MONGODB_URI, **MONGO_CLIENT_OPTIONS)
 db = client[MONGO_DB_NAME]
 
 def get_db():
-    return db 
\ No newline at end of file
+    """Synchronous database handle for agents and scripts"""
+    return db 
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Bounded executor for database calls made from async code"""
+    global _db_executor
+    if _db_executor is None:
+        workers = int(os.getenv("MONGO_ASYNC_WORKERS", str(min(MONGO_CLIENT_OPTIONS["maxPoolSize"], 32))))
+        _db_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo")
+    return _db_executor
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database call without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry contextvars (correlation and session id for logging) into the worker, as asyncio.to_thread does
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+# Fields needed to list templates; excludes html_export / globals_css / style_css
+TEMPLATE_LISTING_PROJECTION = {
+    "name": 1,
+    "category": 1,
+    "category_key": 1,
+    "tags": 1,
+    "thumbnail_url": 1,
+    "metadata.category": 1,
+    "metadata.description": 1,
+    "metadata.figma_url": 1,
+}
+
+# Indexes backing the template listing queries
+TEMPLATE_INDEXES = [
+    ("category_key_1", [("category_key", ASCENDING)]),
+    ("category_key_1_tags_1", [("category_key", ASCENDING), ("tags", ASCENDING)]),
+    ("tags_1", [("tags", ASCENDING)]),
+    ("source_path_1", [("source_path", ASCENDING)]),
+]
+
+# Indexes on the raw category fields, superseded by category_key
+OBSOLETE_TEMPLATE_INDEXES = ["category_1", "metadata.category_1", "category_1_tags_1", "metadata.category_1_tags_1"]
+
+def ensure_indexes(database=None) -> List[str]:
+    """Create the template indexes if they are missing and drop obsolete ones; returns the index names"""
+    database = database if database is not None else db
+    existing = database.templates.index_information()
+    for name in OBSOLETE_TEMPLATE_INDEXES:
+        if name in existing:
+            database.templates.drop_index(name)
+            logger.info(f"Dropped obsolete template index {name}")
+    created = []
+    for name, keys in TEMPLATE_INDEXES:
+        database.templates.create_index(keys, name=name, background=True)
+        created.append(name)
+    logger.info(f"Ensured template indexes: {created}")
+    return created
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Bulk template ingestion
+
+Walks a templates root (UIpages/* by default), reads index.html, globals.css,
+style.css and template.txt of every template folder in parallel, skips folders
+whose content hash is unchanged, renders thumbnails for the rest and upserts
+them in batched bulk writes keyed by source path.
+
+Usage:
+    python ingest_templates.py [--root ../UIpages] [--workers 8] [--batch-size 100] [--force] [--dry-run] [--no-thumbnails]
+"""
+
+import argparse
+import ast
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from db import get_db
+from services.thumbnail_store import thumbnail_store
+from utils.category_normalizer import apply_category_key, compute_category_key
+
+CODE_FILES = {
+    "html_export": "index.html",
+    "globals_css": "globals.css",
+    "style_css": "style.css",
+}
+METADATA_FILE = "template.txt"
+
+
+def _first_literal_block(text: str) -> str:
+    """Return the first top-level {...} block; some files contain several dicts"""
+    start = text.find("{")
+    if start == -1:
+        return text.strip().rstrip(",")
+    depth = 0
+    quote = None
+    index = start
+    while index < len(text):
+        char = text[index]
+        if quote:
+            if char == "\\":
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "#":
+            newline = text.find("\n", index)
+            index = len(text) if newline == -1 else newline
+            continue
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+        index += 1
+    return text[start:]
+
+
+def parse_template_txt(text: str) -> Dict[str, Any]:
+    """Parse the Python-dict-like template.txt, ignoring variables and calls such as datetime.now()"""
+
+    class _StripNonLiterals(ast.NodeTransformer):
+        def visit_Name(self, node):
+            return ast.copy_location(ast.Constant(value=None), node)
+
+        def visit_Call(self, node):
+            return ast.copy_location(ast.Constant(value=None), node)
+
+    source = _first_literal_block(text)
+    tree = ast.parse(source, mode="eval")
+    tree = ast.fix_missing_locations(_StripNonLiterals().visit(tree))
+    parsed = ast.literal_eval(tree)
+    if isinstance(parsed, (list, tuple)):
+        parsed = parsed[0] if parsed else {}
+    if not isinstance(parsed, dict):
+        raise ValueError("template.txt does not contain a dict")
+    return parsed
+
+
+def normalize_tags(tags: Any) -> List[str]:
+    """Strip, lower-case and de-duplicate tags, keeping their order"""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    normalized = []
+    for tag in tags or []:
+        tag = " ".join(str(tag).strip().lower().split())
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def _template_identity(template_info: Dict[str, Any], folder_name: str) -> Tuple[str, Dict[str, Any]]:
+    """Template name and metadata, falling back to the folder name"""
+    metadata = dict(template_info.get("metadata") or {})
+    if not metadata.get("category"):
+        # Folder names look like <category>_UI_template_<n>
+        metadata["category"] = folder_name.split("_")[0]
+    return template_info.get("name") or folder_name.replace("_", " "), metadata
+
+
+def read_template_key(folder: str) -> Tuple[str, Optional[str]]:
+    """(name, category_key) of a template folder, reading only its metadata file"""
+    template_info: Dict[str, Any] = {}
+    metadata_path = os.path.join(folder, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, encoding="utf-8") as f:
+            template_info = parse_template_txt(f.read())
+    name, metadata = _template_identity(template_info, os.path.basename(folder))
+    return name, compute_category_key({"metadata": metadata})
+
+
+def read_template_folder(folder: str, root: str) -> Dict[str, Any]:
+    """Read one template folder into a document and its content hash"""
+    digest = hashlib.sha256()
+    document: Dict[str, Any] = {}
+
+    for field, file_name in CODE_FILES.items():
+        path = os.path.join(folder, file_name)
+        content = ""
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+        document[field] = content
+        digest.update(file_name.encode("utf-8") + b"\0" + content.encode("utf-8") + b"\0")
+
+    metadata_path = os.path.join(folder, METADATA_FILE)
+    template_info: Dict[str, Any] = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, encoding="utf-8") as f:
+            metadata_text = f.read()
+        digest.update(metadata_text.encode("utf-8"))
+        template_info = parse_template_txt(metadata_text)
+
+    name, metadata = _template_identity(template_info, os.path.basename(folder))
+    document.update({
+        "name": name,
+        "metadata": metadata,
+        "tags": normalize_tags(template_info.get("tags")),
+        "source_path": os.path.relpath(folder, root).replace(os.sep, "/"),
+        "content_hash": digest.hexdigest(),
+    })
+    apply_category_key(document)
+    return document
+
+
+class TemplateIngestor:
+    """Parallel reader and batched upserter for a templates root"""
+
+    def __init__(self, root: str, workers: int = 8, batch_size: int = 100, force: bool = False,
+                 dry_run: bool = False, thumbnails: bool = True):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.force = force
+        self.dry_run = dry_run
+        self.thumbnails = thumbnails
+        self.db = get_db()
+        self.stats = {"found": 0, "read": 0, "unchanged": 0, "upserted": 0, "modified": 0, "failed": 0, "thumbnails": 0, "ambiguous": 0}
+        self.ambiguous: List[str] = []
+        # (name, category_key) -> number of folders in this run sharing it
+        self.folder_keys: Dict[tuple, int] = {}
+
+    def discover(self) -> List[str]:
+        """Template folders are direct children of the root with an index.html"""
+        folders = []
+        for entry in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, entry)
+            if os.path.isdir(folder) and os.path.exists(os.path.join(folder, CODE_FILES["html_export"])):
+                folders.append(folder)
+        return folders
+
+    def _existing_documents(self, documents: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], set]:
+        """Existing templates by source path; legacy documents without one are matched by name and category
+
+        Names repeat across folders, so a (name, category) pair shared by several folders of the
+        run or by several legacy documents is reported as ambiguous rather than guessed; the
+        returned set holds those source paths, which must not be upserted.
+        """
+        paths = [document["source_path"] for document in documents]
+        existing = {
+            template["source_path"]: template
+            for template in self.db.templates.find(
+                {"source_path": {"$in": paths}}, {"source_path": 1, "content_hash": 1, "thumbnail_url": 1}
+            )
+        }
+        unmatched: Dict[tuple, List[str]] = {}
+        for document in documents:
+            if document["source_path"] not in existing:
+                unmatched.setdefault((document["name"], document.get("category_key")), []).append(document["source_path"])
+        legacy: Dict[tuple, List[Dict[str, Any]]] = {}
+        if unmatched:
+            for template in self.db.templates.find(
+                {"source_path": {"$exists": False}, "name": {"$in": list({name for name, _ in unmatched})}},
+                {"name": 1, "category": 1, "metadata.category": 1, "category_key": 1}
+            ):
+                key = (template["name"], template.get("category_key") or compute_category_key(template))
+                if key in unmatched:
+                    legacy.setdefault(key, []).append(template)
+        ambiguous = set()
+        for key, templates in legacy.items():
+            paths = unmatched[key]
+            folders = max(self.folder_keys.get(key, 0), len(paths))
+            if folders == 1 and len(templates) == 1:
+                existing.setdefault(paths[0], templates[0])
+            else:
+                ambiguous.update(paths)
+                self.stats["ambiguous"] += len(paths)
+                self.ambiguous.extend(paths)
+                print(f"  Ambiguous legacy template {key[0]!r} ({key[1]}): {len(templates)} documents, "
+                      f"{folders} folders; skipped")
+        return existing, ambiguous
+
+    def _flush(self, documents: List[Dict[str, Any]]):
+        existing, ambiguous = self._existing_documents(documents)
+        now = datetime.utcnow()
+        operations = []
+        changed = []
+        for document in documents:
+            if document["source_path"] in ambiguous:
+                # Upserting by source_path would add a duplicate next to the legacy document
+                continue
+            current = existing.get(document["source_path"])
+            unchanged = current and current.get("content_hash") == document["content_hash"] and not self.force
+            if unchanged and (not self.thumbnails or current.get("thumbnail_url") == thumbnail_store.url_for(document["content_hash"])):
+                self.stats["unchanged"] += 1
+                continue
+            changed.append((document, current, unchanged))
+
+        thumbnail_urls = self._render_thumbnails([document for document, _, _ in changed])
+
+        for document, current, unchanged in changed:
+            query = {"_id": current["_id"]} if current else {"source_path": document["source_path"]}
+            thumbnail_url = thumbnail_urls.get(document["content_hash"])
+            if unchanged:
+                # Only the thumbnail is missing
+                self.stats["unchanged"] += 1
+                if thumbnail_url:
+                    operations.append(UpdateOne(query, {"$set": {"thumbnail_url": thumbnail_url}}))
+                continue
+            operations.append(UpdateOne(
+                query,
+                {"$set": {**document, "thumbnail_url": thumbnail_url, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+
+        if not operations:
+            return
+        if self.dry_run:
+            self.stats["upserted"] += len(operations)
+            return
+        result = self.db.templates.bulk_write(operations, ordered=False)
+        self.stats["upserted"] += result.upserted_count
+        self.stats["modified"] += result.modified_count
+
+    def _render_thumbnails(self, documents: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Render missing thumbnails for a batch in parallel through the screenshot service"""
+        if not self.thumbnails or self.dry_run or not documents:
+            return {}
+        items = [
+            {
+                "content_hash": document["content_hash"],
+                "html": document["html_export"],
+                "css": document["globals_css"] + "\n" + document["style_css"],
+            }
+            for document in documents
+        ]
+        try:
+            urls = asyncio.run(thumbnail_store.generate_batch(items))
+        except Exception as e:
+            print(f"  Thumbnail rendering failed: {e}")
+            return {}
+        self.stats["thumbnails"] += len(urls)
+        return urls
+
+    def run(self) -> Dict[str, Any]:
+        started = time.time()
+        folders = self.discover()
+        self.stats["found"] = len(folders)
+        print(f"Found {len(folders)} template folders under {self.root}")
+        self._count_folder_keys(folders)
+
+        batch: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(read_template_folder, folder, self.root): folder for folder in folders}
+            for future in as_completed(futures):
+                folder = futures[future]
+                try:
+                    batch.append(future.result())
+                    self.stats["read"] += 1
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"  Failed to read {folder}: {e}")
+
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+                    self._report_progress(started)
+
+        if batch:
+            self._flush(batch)
+        self._report_progress(started)
+
+        elapsed = time.time() - started
+        summary = {**self.stats, "seconds": round(elapsed, 2), "dry_run": self.dry_run, "ambiguous_paths": self.ambiguous}
+        print(f"Done: {summary}")
+        return summary
+
+    def _count_folder_keys(self, folders: List[str]):
+        """Count (name, category_key) pairs over the whole run, so ambiguity does not depend on batching"""
+        self.folder_keys = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for key in executor.map(self._safe_template_key, folders):
+                if key is not None:
+                    self.folder_keys[key] = self.folder_keys.get(key, 0) + 1
+
+    @staticmethod
+    def _safe_template_key(folder: str) -> Optional[tuple]:
+        try:
+            return read_template_key(folder)
+        except Exception:
+            # read_template_folder reports the failure later
+            return None
+
+    def _report_progress(self, started: float):
+        processed = self.stats["read"] + self.stats["failed"]
+        elapsed = max(time.time() - started, 1e-6)
+        print(
+            f"  [{processed}/{self.stats['found']}] {processed / elapsed:.1f} templates/s - "
+            f"upserted {self.stats['upserted']}, modified {self.stats['modified']}, "
+            f"unchanged {self.stats['unchanged']}, thumbnails {self.stats['thumbnails']}, failed {self.stats['failed']}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    default_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "UIpages")
+    parser = argparse.ArgumentParser(description="Bulk-load UI templates into MongoDB")
+    parser.add_argument("--root", default=default_root, help="Directory containing one folder per template")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel file readers")
+    parser.add_argument("--batch-size", type=int, default=100, help="Templates per bulk write")
+    parser.add_argument("--force", action="store_true", help="Rewrite templates even if their content hash is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Read and diff without writing")
+    parser.add_argument("--no-thumbnails", action="store_true", help="Skip rendering thumbnails")
+    args = parser.parse_args(argv)
+
+    ingestor = TemplateIngestor(args.root, args.workers, args.batch_size, args.force, args.dry_run, not args.no_thumbnails)
+    summary = ingestor.run()
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
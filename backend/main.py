@@ -5,9 +5,9 @@ Clean FastAPI application with proper route ordering for screenshot service
 
 import asyncio
 import sys
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
@@ -15,20 +15,37 @@ import logging
 import json
 import anthropic
 from pathlib import Path
-from db import get_db
+from db import get_db, ensure_indexes, run_db
+from utils.category_normalizer import backfill_category_keys
 from datetime import datetime
 from services.screenshot_service import get_screenshot_service
+from services.warmup_service import warmup_service
+from services.session_lifecycle import session_lifecycle
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 from agents.flow_orchestrator import FlowOrchestrator
 
-logging.basicConfig(level=logging.INFO)
+from utils.logging_config import configure_logging, new_correlation_id, set_correlation_id, reset_correlation_id
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+@app.middleware("http")
+async def correlation_id_middleware(request: Request, call_next):
+    """Tag every log record of a request with its X-Request-ID (generated when absent)"""
+    correlation_id = request.headers.get("X-Request-ID") or new_correlation_id()
+    token = set_correlation_id(correlation_id)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_correlation_id(token)
+    response.headers["X-Request-ID"] = correlation_id
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -37,9 +54,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_database_indexes():
+    """Make sure the template indexes and category keys exist before serving requests"""
+    try:
+        await run_db(ensure_indexes)
+        await run_db(backfill_category_keys, get_db())
+    except Exception as e:
+        logger.warning(f"Could not ensure MongoDB indexes: {e}")
+
+@app.on_event("startup")
+async def start_template_cache_watcher():
+    """Follow template writes from other processes (ingest CLI, sample_data) from the start"""
+    from tools.template_cache import template_cache
+    template_cache.start_watcher()
+
+@app.on_event("shutdown")
+async def stop_template_cache_watcher():
+    from tools.template_cache import template_cache
+    template_cache.stop()
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    """Expire idle sessions and enforce disk quotas in the background"""
+    await session_lifecycle.start()
+
+@app.on_event("shutdown")
+async def stop_session_sweeper():
+    await session_lifecycle.stop()
+
+@app.on_event("startup")
+async def start_legacy_migration():
+    """Convert legacy ui_codes_*.json sessions in the background, once"""
+    from services.legacy_migration import legacy_migration_service
+    await legacy_migration_service.start()
+
 CLAUDE_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 if not CLAUDE_API_KEY:
-    print("Warning: ANTHROPIC_API_KEY not found. LLM features will be limited.")
+    logger.warning("ANTHROPIC_API_KEY not found. LLM features will be limited.")
     CLAUDE_API_KEY = "placeholder_key"
 
 class ChatMessage(BaseModel):
@@ -69,6 +121,7 @@ class UIEditorChatResponse(BaseModel):
     ui_modifications: Optional[Dict[str, Any]] = None
     session_id: str
     metadata: Optional[Dict[str, Any]] = None
+    variants: Optional[List[Dict[str, Any]]] = None
 
 class GenerateReportRequest(BaseModel):
     session_id: Optional[str] = None
@@ -97,18 +150,98 @@ def read_root():
 def health_check():
     return {"status": "healthy", "message": "UI Editor API is running"}
 
+@app.get("/api/stats/css-pruning")
+async def get_css_pruning_stats():
+    """Bytes and rules removed by dead-CSS pruning, per template"""
+    from utils.css_pruner import css_pruner
+    return {"success": True, **css_pruner.get_stats()}
+
+@app.get("/api/stats/recommendation-cache")
+async def get_recommendation_cache_stats():
+    """Hit/miss counters of the template recommendation cache"""
+    from utils.recommendation_cache import recommendation_cache
+    return {"success": True, **recommendation_cache.get_stats()}
+
+@app.get("/api/stats/ui-code-cache")
+async def get_ui_code_cache_stats():
+    """Hit/miss counters of the in-memory cache of loaded UI code sessions"""
+    from utils.file_manager import get_file_manager
+    return {"success": True, **get_file_manager().get_cache_stats()}
+
+@app.get("/api/stats/conversation-history")
+async def get_conversation_history_stats():
+    """Summaries written and messages folded by conversation history windowing"""
+    from utils.conversation_history import conversation_history
+    return {"success": True, **conversation_history.get_stats()}
+
+@app.get("/api/stats/session-lifecycle")
+async def get_session_lifecycle_stats():
+    """Idle-session expiry, quota evictions and bytes reclaimed by the sweeper"""
+    return {"success": True, **session_lifecycle.get_stats()}
+
+@app.get("/api/stats/legacy-migration")
+async def get_legacy_migration_stats():
+    """Progress of the startup conversion of legacy ui_codes_*.json sessions"""
+    from services.legacy_migration import legacy_migration_service
+    return {"success": True, **legacy_migration_service.get_stats()}
+
+@app.post("/api/sessions/sweep")
+async def sweep_sessions(dry_run: bool = True):
+    """Run a lifecycle sweep now; defaults to a dry run that only reports what would be removed"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, session_lifecycle.sweep, dry_run)
+
+@app.get("/api/sessions/{session_id}/bundle")
+async def export_session_bundle(session_id: str):
+    """Stream a session (code, history, rationale, logo, screenshot) as one .tar.gz bundle"""
+    from services.session_bundle import session_bundle_service, SessionBundleError
+    loop = asyncio.get_running_loop()
+    try:
+        # Snapshot first so a missing session is a 404 rather than a broken stream
+        chunks = await loop.run_in_executor(None, session_bundle_service.iter_export, session_id)
+    except SessionBundleError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="session_{session_id}.tar.gz"'}
+    )
+
+@app.post("/api/sessions/import-bundle")
+async def import_session_bundle(bundle: UploadFile = File(...), session_id: Optional[str] = None, overwrite: bool = False):
+    """Restore a session bundle; session_id imports it under a new ID"""
+    from services.session_bundle import session_bundle_service, SessionBundleError
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(None, session_bundle_service.import_bundle, bundle.file, session_id, overwrite)
+    except SessionBundleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/stats/recommendation-calls")
+async def get_recommendation_call_stats():
+    """How recommendations were produced and how often scoring needed a second LLM call"""
+    from agents.template_recommendation_agent import recommendation_call_metrics
+    return {"success": True, **recommendation_call_metrics.get_stats()}
+
+@app.get("/api/templates/thumbnails/{content_hash}")
+async def get_template_thumbnail(content_hash: str):
+    """Serve a pre-rendered template thumbnail; content-addressed, so cacheable forever"""
+    from services.thumbnail_store import thumbnail_store
+    if not thumbnail_store.exists(content_hash):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(
+        thumbnail_store.path_for(content_hash),
+        media_type=thumbnail_store.media_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{content_hash}"'}
+    )
+
 @app.get("/api/templates/categories")
 async def get_template_categories():
     """Get all available template categories from the database"""
     try:
-        from tools.mongodb_tools import MongoDBTools
-        tools = MongoDBTools()
-        result = tools.get_available_categories()
-        
-        if result["success"]:
-            return {"success": True, "categories": result["categories"]}
-        else:
-            return {"success": False, "categories": [], "error": result.get("error", "Unknown error")}
+        from services.category_catalog import category_catalog
+        categories = await category_catalog.get_categories_async()
+        return {"success": True, "categories": categories}
     except Exception as e:
         logger.error(f"Error fetching categories: {e}")
         return {"success": False, "categories": [], "error": str(e)}
@@ -117,44 +250,14 @@ async def get_template_categories():
 async def get_category_constraints(category: str):
     """Get constraints and available options for a specific category"""
     try:
-        from tools.mongodb_tools import MongoDBTools
-        tools = MongoDBTools()
-        result = tools.get_templates_by_category(category)
-        
-        if not result["success"]:
-            return {"success": False, "error": result.get("error", "Unknown error")}
-        
-        templates = result["templates"]
-        
-        # Extract unique tags, styles, and features from templates
-        all_tags = set()
-        all_styles = set()
-        all_features = set()
-        
-        for template in templates:
-            tags = template.get('tags', [])
-            if isinstance(tags, list):
-                all_tags.update(tags)
-            elif isinstance(tags, str):
-                all_tags.update([tag.strip() for tag in tags.split(',') if tag.strip()])
-        
-        # Categorize tags into styles and features
-        style_keywords = ['modern', 'minimal', 'clean', 'bold', 'colorful', 'dark', 'light', 'sleek', 'elegant', 'professional', 'playful', 'soft', 'natural', 'futuristic']
-        feature_keywords = ['responsive', 'mobile', 'desktop', 'tablet', 'interactive', 'animated', 'static', 'hero', 'navigation', 'footer', 'sidebar', 'form', 'button', 'image']
-        
-        for tag in all_tags:
-            tag_lower = tag.lower()
-            if any(style in tag_lower for style in style_keywords):
-                all_styles.add(tag)
-            elif any(feature in tag_lower for feature in feature_keywords):
-                all_features.add(tag)
-        
+        from services.category_constraints import category_constraints_service
+        result = await category_constraints_service.get_constraints_async(category)
         return {
             "success": True,
-            "templates_count": len(templates),
-            "category_tags": list(all_tags),
-            "styles": list(all_styles),
-            "features": list(all_features)
+            "templates_count": result["templates_count"],
+            "category_tags": result["category_tags"],
+            "styles": result["styles"],
+            "features": result["features"]
         }
     except Exception as e:
         logger.error(f"Error fetching category constraints for {category}: {e}")
@@ -372,196 +475,54 @@ body {
 async def get_session_ui_codes(session_id: str):
     """Get UI codes for a specific session using file manager"""
     try:
-        from utils.file_manager import UICodeFileManager
-        
-        # Initialize file manager with absolute path
-        import os
-        base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-        file_manager = UICodeFileManager(base_dir=base_dir)
-        
-        # Check if session exists in new file-based format
-        import time
-        import os
-        logger.info(f"[{time.strftime('%H:%M:%S')}] Checking if session {session_id} exists in file-based format...")
-        logger.info(f"[{time.strftime('%H:%M:%S')}] Current working directory: {os.getcwd()}")
-        
-        # Add retry logic for race conditions during phase transitions
-        max_retries = 10  # Increased retries for phase transitions
-        retry_delay = 0.2  # 200ms initial delay
-        
-        for attempt in range(max_retries):
-            if file_manager.session_exists(session_id):
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Session found on attempt {attempt + 1}")
-                break
-            elif attempt < max_retries - 1:
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Session not found on attempt {attempt + 1}, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                retry_delay = min(retry_delay * 1.5, 1.0)  # Gradual increase, max 1s
-            else:
-                logger.warning(f"[{time.strftime('%H:%M:%S')}] Session not found after {max_retries} attempts")
+        from utils.file_manager import get_file_manager
         
-        if file_manager.session_exists(session_id):
-            logger.info(f"Session {session_id} exists, loading session data...")
-            # Load session from file-based structure
-            session_data = file_manager.load_session(session_id)
-            logger.info(f"Session data loaded: {session_data is not None}")
-            if session_data:
-                logger.info(f"Session data loaded with {len(session_data.keys())} keys")
-                logger.info(f"HTML content length: {len(session_data.get('current_codes', {}).get('html_export', ''))}")
-            else:
-                logger.warning(f"Session data is None for session {session_id}")
-            if session_data:
-                # Generate screenshot for session template
-                try:
+        # File manager for the configured storage backend
+        file_manager = get_file_manager()
+        
+        # Sessions are created synchronously before the phase transition responds, and legacy
+        # ui_codes_*.json files are converted at startup, so one lookup is authoritative
+        session_data = file_manager.load_session(session_id)
+        if session_data:
+            # Generate screenshot for session template, reusing the warm-up render if it matches
+            try:
+                html_content = session_data["current_codes"]["html_export"]
+                css_content = session_data["current_codes"]["globals_css"] + "\n" + session_data["current_codes"]["style_css"]
+                screenshot_base64 = await warmup_service.wait_for_screenshot(session_id, html_content, css_content)
+                if screenshot_base64:
+                    logger.info(f"Using warm-up screenshot for session {session_id}")
+                else:
                     screenshot_service = await get_screenshot_service()
-                    html_content = session_data["current_codes"]["html_export"]
-                    css_content = session_data["current_codes"]["globals_css"] + "\n" + session_data["current_codes"]["style_css"]
                     result = await screenshot_service.generate_screenshot(html_content, css_content, session_id)
                     screenshot_base64 = result["base64_image"] if result["success"] else ""
                     logger.info(f"Screenshot generated for session {session_id}")
-                except Exception as e:
-                    logger.error(f"Error generating screenshot for session {session_id}: {e}")
-                    screenshot_base64 = ""
-                
-                return {
-                    "success": True,
-                    "template_id": session_data["template_id"],
-                    "session_id": session_id,
-                    "ui_codes": {
-                        "current_codes": {
-                            "html_export": session_data["current_codes"]["html_export"],
-                            "globals_css": session_data["current_codes"]["globals_css"],
-                            "style_css": session_data["current_codes"]["style_css"]
-                        },
-                        "original_codes": session_data.get("original_codes", {}),
-                        "template_info": session_data.get("template_info", {}),
-                        "metadata": {
-                            "last_modified": session_data["last_updated"],
-                            "file_path": f"temp_ui_files/{session_id}/",
-                            "history_count": len(session_data.get("history", [])),
-                            "template_info": session_data.get("template_info", {})
-                        }
-                    },
-                    "screenshot_preview": screenshot_base64
-                }
-        
-        # Fallback: Check for old JSON format and migrate
-        import json
-        from pathlib import Path
-        
-        temp_dir = Path("temp_ui_files")
-        session_files = list(temp_dir.glob(f"ui_codes_{session_id}.json"))
-        
-        if session_files:
-            # Migrate from old JSON format to new file-based format
-            latest_file = max(session_files, key=lambda x: x.stat().st_mtime)
-            success = file_manager.migrate_from_json(session_id, str(latest_file))
+            except Exception as e:
+                logger.error(f"Error generating screenshot for session {session_id}: {e}")
+                screenshot_base64 = ""
             
-            if success:
-                # Retry loading the migrated session
-                session_data = file_manager.load_session(session_id)
-                if session_data:
-                    # Generate screenshot for session template
-                    try:
-                        screenshot_service = await get_screenshot_service()
-                        html_content = session_data["current_codes"]["html_export"]
-                        css_content = session_data["current_codes"]["globals_css"] + "\n" + session_data["current_codes"]["style_css"]
-                        result = await screenshot_service.generate_screenshot(html_content, css_content, session_id)
-                        screenshot_base64 = result["base64_image"] if result["success"] else ""
-                        logger.info(f"Screenshot generated for migrated session {session_id}")
-                    except Exception as e:
-                        logger.error(f"Error generating screenshot for migrated session {session_id}: {e}")
-                        screenshot_base64 = ""
-                    
-                    return {
-                        "success": True,
-                        "template_id": session_data["template_id"],
-                        "session_id": session_id,
-                        "ui_codes": {
-                            "current_codes": {
-                                "html_export": session_data["current_codes"]["html_export"],
-                                "globals_css": session_data["current_codes"]["globals_css"],
-                                "style_css": session_data["current_codes"]["style_css"]
-                            },
-                            "original_codes": session_data.get("original_codes", {}),
-                            "template_info": session_data.get("template_info", {}),
-                            "metadata": {
-                                "last_modified": session_data["last_updated"],
-                                "file_path": f"temp_ui_files/{session_id}/",
-                                "history_count": len(session_data.get("history", [])),
-                                "template_info": session_data.get("template_info", {})
-                            }
-                        },
-                        "screenshot_preview": screenshot_base64
+            return {
+                "success": True,
+                "template_id": session_data["template_id"],
+                "session_id": session_id,
+                "ui_codes": {
+                    "current_codes": {
+                        "html_export": session_data["current_codes"]["html_export"],
+                        "globals_css": session_data["current_codes"]["globals_css"],
+                        "style_css": session_data["current_codes"]["style_css"]
+                    },
+                    "original_codes": session_data.get("original_codes", {}),
+                    "template_info": session_data.get("template_info", {}),
+                    "metadata": {
+                        "last_modified": session_data["last_updated"],
+                        "file_path": f"temp_ui_files/{session_id}/",
+                        "history_count": len(session_data.get("history", [])),
+                        "template_info": session_data.get("template_info", {})
                     }
-        
-        # Return default if no session file exists
-        import time
-        logger.warning(f"[{time.strftime('%H:%M:%S')}] No session file found for session_id: {session_id}")
-        
-        # Check if this might be a phase transition scenario
-        from agents.flow_orchestrator import FlowOrchestrator
-        try:
-            orchestrator = FlowOrchestrator(session_id=session_id)
-            session_state = orchestrator.session_state
-            current_phase = session_state.get('current_phase', 'unknown')
-            logger.info(f"[{time.strftime('%H:%M:%S')}] Session state phase: {current_phase}")
-            
-            if current_phase in ['template_selection', 'editing']:
-                logger.warning(f"[{time.strftime('%H:%M:%S')}] This appears to be a phase transition scenario - session files may still be being created")
-                logger.warning(f"[{time.strftime('%H:%M:%S')}] Waiting additional time for files to be created...")
-                time.sleep(1.0)  # Wait an additional second
-                
-                # Try one more time after waiting
-                if file_manager.session_exists(session_id):
-                    logger.info(f"[{time.strftime('%H:%M:%S')}] Session found after additional wait - loading now")
-                    session_data = file_manager.load_session(session_id)
-                    if session_data:
-                        # Generate screenshot and return session data
-                        try:
-                            screenshot_service = await get_screenshot_service()
-                            html_content = session_data["current_codes"]["html_export"]
-                            css_content = session_data["current_codes"]["globals_css"] + "\n" + session_data["current_codes"]["style_css"]
-                            result = await screenshot_service.generate_screenshot(html_content, css_content, session_id)
-                            screenshot_base64 = result["base64_image"] if result["success"] else ""
-                            logger.info(f"Screenshot generated for delayed session {session_id}")
-                        except Exception as e:
-                            logger.error(f"Error generating screenshot for delayed session {session_id}: {e}")
-                            screenshot_base64 = ""
-                        
-                        return {
-                            "success": True,
-                            "template_id": session_data["template_id"],
-                            "session_id": session_id,
-                            "ui_codes": {
-                                "current_codes": {
-                                    "html_export": session_data["current_codes"]["html_export"],
-                                    "globals_css": session_data["current_codes"]["globals_css"],
-                                    "style_css": session_data["current_codes"]["style_css"]
-                                },
-                                "original_codes": session_data.get("original_codes", {}),
-                                "template_info": session_data.get("template_info", {}),
-                                "metadata": {
-                                    "last_modified": session_data["last_updated"],
-                                    "file_path": f"temp_ui_files/{session_id}/",
-                                    "history_count": len(session_data.get("history", [])),
-                                    "template_info": session_data.get("template_info", {})
-                                }
-                            },
-                            "screenshot_preview": screenshot_base64
-                        }
-        except Exception as e:
-            logger.error(f"[{time.strftime('%H:%M:%S')}] Error checking session state: {e}")
-        
-        logger.info(f"[{time.strftime('%H:%M:%S')}] Falling back to default template")
-        
-        # Additional debug: List all sessions to see what's available
-        try:
-            all_sessions = file_manager.list_sessions()
-            logger.info(f"[{time.strftime('%H:%M:%S')}] Available sessions count: {len(all_sessions)}")
-        except Exception as e:
-            logger.error(f"[{time.strftime('%H:%M:%S')}] Error listing sessions: {e}")
-        
+                },
+                "screenshot_preview": screenshot_base64
+            }
+    
+        logger.info(f"No UI code session found for {session_id}, falling back to default template")
         return await get_default_ui_codes()
         
     except Exception as e:
@@ -575,6 +536,8 @@ async def reset_session(session_id: str = None):
         # Create orchestrator to handle session reset
         orchestrator = FlowOrchestrator(session_id=session_id)
         result = orchestrator.reset_session()
+        if session_id:
+            warmup_service.invalidate(session_id)
         
         return {
             "success": True,
@@ -590,12 +553,10 @@ async def reset_session(session_id: str = None):
 async def reset_session_to_original(session_id: str):
     """Reset UI codes for a specific session to their original state"""
     try:
-        from utils.file_manager import UICodeFileManager
+        from utils.file_manager import get_file_manager
         
-        # Initialize file manager with absolute path
-        import os
-        base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-        file_manager = UICodeFileManager(base_dir=base_dir)
+        # File manager for the configured storage backend
+        file_manager = get_file_manager()
         
         # Check if session exists
         if not file_manager.session_exists(session_id):
@@ -614,8 +575,11 @@ async def reset_session_to_original(session_id: str):
             if session_data:
                 html_content = session_data["current_codes"]["html_export"]
                 css_content = session_data["current_codes"]["globals_css"] + "\n" + session_data["current_codes"]["style_css"]
-                result = await screenshot_service.generate_screenshot(html_content, css_content, session_id)
-                screenshot_base64 = result["base64_image"] if result["success"] else ""
+                # The original template is what the warm-up rendered
+                screenshot_base64 = warmup_service.get_cached_screenshot(session_id, html_content, css_content)
+                if not screenshot_base64:
+                    result = await screenshot_service.generate_screenshot(html_content, css_content, session_id)
+                    screenshot_base64 = result["base64_image"] if result["success"] else ""
                 logger.info(f"Screenshot regenerated after reset for session {session_id}")
             else:
                 screenshot_base64 = ""
@@ -690,7 +654,8 @@ async def ui_editor_chat(request: UIEditorChatRequest):
             response=result.get("response", "Processing your UI modification request..."),
             ui_modifications=result.get("ui_modifications"),
             session_id=session_id,
-            metadata=result.get("metadata", {"feature": "ui_editor_agent"})
+            metadata=result.get("metadata", {"feature": "ui_editor_agent"}),
+            variants=result.get("variants")
         )
         
     except Exception as e:
@@ -1,9 +1,6 @@
-import httpx
-from sqlmodel import Session, select
-from models import Template
-from db import engine, init_db
-
-API_URL = "http://localhost:8000/api/templates"
+from datetime import datetime
+from db import get_db
+from utils.category_normalizer import apply_category_key
 
 sample_templates = [
     {
@@ -29,38 +26,36 @@ sample_templates = [
 
 ]
 
-def post_samples():
-    with httpx.Client() as client:
-        for tpl in sample_templates:
-            resp = client.post(API_URL, json=tpl)
-            print(f"POST {tpl['name']}: {resp.status_code} {resp.json()}")
+def insert_samples():
+    # Scripts use the synchronous database handle
+    db = get_db()
+    for tpl in sample_templates:
+        document = apply_category_key(dict(tpl, created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+        result = db.templates.insert_one(document)
+        print(f"Inserted {tpl['name']}: {result.inserted_id}")
 
 def list_templates():
-    with httpx.Client() as client:
-        resp = client.get(API_URL)
-        print("\nAll templates:")
-        for tpl in resp.json():
-            print(tpl)
+    print("\nAll templates:")
+    for tpl in get_db().templates.find({}, {"name": 1, "category_key": 1, "tags": 1}):
+        print(tpl)
 
 def update_first_template_tag():
-    # Direct DB manipulation example
-    with Session(engine) as session:
-        template = session.exec(select(Template)).first()
-        if template:
-            template.tags = template.tags or []
-            template.tags.append("featured")
-            session.add(template)
-            session.commit()
-            print(f"Updated template {template.id} with new tag 'featured'")
-        else:
-            print("No templates found to update.")
+    db = get_db()
+    template = db.templates.find_one({}, {"_id": 1})
+    if template:
+        db.templates.update_one(
+            {"_id": template["_id"]},
+            {"$addToSet": {"tags": "featured"}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        print(f"Updated template {template['_id']} with new tag 'featured'")
+    else:
+        print("No templates found to update.")
 
 def main():
-    init_db()
-    post_samples()
+    insert_samples()
     list_templates()
     update_first_template_tag()
     list_templates()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
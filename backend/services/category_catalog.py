@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Category Catalog Service
+
+Process-wide cache of the template category list (canonical category_key
+values) and the tag vocabulary. Entries expire after a TTL and are dropped
+immediately when the template cache reports a write, so tools, agents and
+endpoints no longer run distinct() queries on every call.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import get_db, run_db
+from tools.template_cache import template_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryCatalog:
+    """TTL cache of distinct template categories and tags"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds or float(os.getenv("CATEGORY_CATALOG_TTL", "300"))
+        self._entries: Dict[str, Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        template_cache.add_invalidation_listener(self.invalidate)
+
+    def _cached(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                self.stats["hits"] += 1
+                return list(entry[1])
+            self.stats["misses"] += 1
+            return None
+
+    def _load(self, key: str, loader: Callable[[Any], List[str]], database=None) -> List[str]:
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        values = loader(database if database is not None else get_db())
+        with self._lock:
+            self._entries[key] = (time.time(), values)
+        return list(values)
+
+    def get_categories(self, database=None) -> List[str]:
+        """Canonical category keys present in the catalog"""
+        return self._load(
+            "categories",
+            lambda db: sorted(category for category in db.templates.distinct("category_key") if category),
+            database
+        )
+
+    def get_tags(self, database=None) -> List[str]:
+        """All tags used by templates"""
+        return self._load(
+            "tags",
+            lambda db: sorted(tag for tag in db.templates.distinct("tags") if tag),
+            database
+        )
+
+    async def get_categories_async(self) -> List[str]:
+        """Categories without blocking the event loop on a cache miss"""
+        cached = self._cached("categories")
+        if cached is not None:
+            return cached
+        return await run_db(self.get_categories)
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """Drop cached values; registered as a template cache listener"""
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "ttl_seconds": self.ttl_seconds, "cached": sorted(self._entries)}
+
+
+# Global instance
+category_catalog = CategoryCatalog()
+
+def get_category_catalog() -> CategoryCatalog:
+    """Get the category catalog instance"""
+    return category_catalog
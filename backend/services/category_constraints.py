@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Category Constraints Service
+
+Computes the tag vocabulary of a template category with a MongoDB aggregation
+($unwind/$group on tags) and classifies the tags into styles and features
+with patterns compiled once from keywords.yaml. Results are cached per
+category until the template catalog version changes, and for at most
+CATEGORY_CONSTRAINTS_TTL seconds in case a change is missed.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from config.keyword_manager import KeywordManager
+from db import get_db, run_db
+from tools.template_cache import template_cache
+from utils.category_normalizer import normalize_category
+
+logger = logging.getLogger(__name__)
+
+
+def _compile_keywords(keywords: List[str]) -> Optional[Pattern]:
+    keywords = [keyword.lower() for keyword in keywords or [] if keyword]
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)))
+
+
+class CategoryConstraintsService:
+    """Aggregated, classified and cached tag constraints per category"""
+
+    def __init__(self, keyword_manager: Optional[KeywordManager] = None, ttl_seconds: Optional[float] = None):
+        constraint_keywords = (keyword_manager or KeywordManager()).get_constraint_keywords()
+        self.style_pattern = _compile_keywords(constraint_keywords.get("styles", []))
+        self.feature_pattern = _compile_keywords(constraint_keywords.get("features", []))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("CATEGORY_CONSTRAINTS_TTL", "300"))
+        self._cache: Dict[str, Tuple[int, float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        template_cache.add_invalidation_listener(self.invalidate)
+
+    def build_pipeline(self, category_key: str) -> List[Dict[str, Any]]:
+        """Count templates and tag usage for one category in a single round trip"""
+        return [
+            {"$match": {"category_key": category_key}},
+            {"$facet": {
+                "templates": [{"$count": "count"}],
+                "tags": [
+                    # Legacy documents store tags as one comma-separated string; anything else has no tags
+                    {"$project": {"tags": {"$switch": {
+                        "branches": [
+                            {"case": {"$isArray": "$tags"}, "then": "$tags"},
+                            {"case": {"$eq": [{"$type": "$tags"}, "string"]}, "then": {"$split": ["$tags", ","]}},
+                        ],
+                        "default": []
+                    }}}},
+                    {"$unwind": "$tags"},
+                    # $toString fails on objects and arrays nested in the tag list
+                    {"$match": {"tags": {"$type": ["string", "number"]}}},
+                    {"$project": {"tag": {"$trim": {"input": {"$toString": "$tags"}}}}},
+                    {"$match": {"tag": {"$ne": ""}}},
+                    {"$group": {"_id": "$tag", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}},
+                ],
+            }},
+        ]
+
+    def classify_tags(self, tags: List[str]) -> Dict[str, List[str]]:
+        """Split tags into styles and features; style keywords take precedence"""
+        styles, features = [], []
+        for tag in tags:
+            tag_lower = tag.lower()
+            if self.style_pattern and self.style_pattern.search(tag_lower):
+                styles.append(tag)
+            elif self.feature_pattern and self.feature_pattern.search(tag_lower):
+                features.append(tag)
+        return {"styles": styles, "features": features}
+
+    def compute(self, category: str, database=None) -> Dict[str, Any]:
+        """Run the aggregation and classify the result"""
+        database = database if database is not None else get_db()
+        category_key = normalize_category(category) or ""
+        facets = next(iter(database.templates.aggregate(self.build_pipeline(category_key))), {})
+        templates = facets.get("templates") or [{}]
+        tag_counts = {entry["_id"]: entry["count"] for entry in facets.get("tags", [])}
+        tags = list(tag_counts)
+        return {
+            "success": True,
+            "category": category_key,
+            "templates_count": templates[0].get("count", 0),
+            "category_tags": tags,
+            "tag_counts": tag_counts,
+            **self.classify_tags(tags),
+        }
+
+    def get_constraints(self, category: str, database=None) -> Dict[str, Any]:
+        """Cached constraints for a category, recomputed after catalog changes"""
+        category_key = normalize_category(category) or ""
+        version = template_cache.catalog_version
+        cached = self._cached(category_key)
+        if cached is not None:
+            return cached
+
+        result = self.compute(category, database)
+        with self._lock:
+            self._cache[category_key] = (version, time.time(), result)
+        return result
+
+    async def get_constraints_async(self, category: str) -> Dict[str, Any]:
+        """Cached constraints without blocking the event loop on a miss"""
+        cached = self._cached(normalize_category(category) or "")
+        if cached is not None:
+            return cached
+        return await run_db(self.get_constraints, category)
+
+    def _cached(self, category_key: str) -> Optional[Dict[str, Any]]:
+        """Cached result if neither the catalog version nor the TTL has moved on"""
+        with self._lock:
+            cached = self._cache.get(category_key)
+            if cached is None:
+                return None
+            version, stored_at, result = cached
+            if version == template_cache.catalog_version and time.time() - stored_at <= self.ttl_seconds:
+                return result
+            del self._cache[category_key]
+            return None
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """Drop all cached constraints"""
+        with self._lock:
+            self._cache.clear()
+
+
+# Global instance
+category_constraints_service = CategoryConstraintsService()
+
+async def get_category_constraints_service() -> CategoryConstraintsService:
+    """Get the category constraints service instance"""
+    return category_constraints_service
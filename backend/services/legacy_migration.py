@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Legacy Session Migration Service
+
+Before sessions were stored as per-session folders (or SQLite rows), UI codes
+were written to temp_ui_files/ui_codes_{session_id}.json. This service scans
+for those files once at startup and converts them into the configured UI code
+store in parallel, so the request path never has to look for them. Progress is
+appended to temp_ui_files/legacy_migration.jsonl; files already migrated (or
+skipped because a current session exists) are only looked at again when they
+change, and even then a current session always wins over its legacy copy, so a
+changed file whose session exists is recorded as skipped. The legacy files
+themselves are left in place.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LEGACY_PREFIX = "ui_codes_"
+PROGRESS_NAME = "legacy_migration.jsonl"
+
+
+class LegacyMigrationService:
+    """Bulk, background conversion of legacy ui_codes_*.json sessions"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = Path(base_dir or os.path.join(os.getcwd(), "temp_ui_files"))
+        self.enabled = os.getenv("LEGACY_MIGRATION_ENABLED", "true").lower() == "true"
+        self.workers = max(1, int(os.getenv("LEGACY_MIGRATION_WORKERS", "4")))
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.progress: Dict[str, Any] = {
+            "found": 0,
+            "already_done": 0,
+            "migrated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    @property
+    def progress_path(self) -> Path:
+        return self.base_dir / PROGRESS_NAME
+
+    # ------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------
+
+    def find_legacy_files(self) -> List[Path]:
+        """Legacy session files in the UI code directory, in one listing"""
+        if not self.base_dir.exists():
+            return []
+        return sorted(
+            entry for entry in self.base_dir.iterdir()
+            if entry.is_file() and entry.name.startswith(LEGACY_PREFIX) and entry.suffix == ".json"
+        )
+
+    def _load_done(self) -> Dict[str, int]:
+        """File name -> mtime_ns of every file that no longer needs converting"""
+        done = {}
+        if not self.progress_path.exists():
+            return done
+        with open(self.progress_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("status") in ("migrated", "skipped"):
+                    done[entry["file"]] = entry.get("mtime_ns")
+        return done
+
+    def _record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.progress[entry["status"]] += 1
+            try:
+                with open(self.progress_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not record legacy migration progress: {e}")
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def migrate_all(self) -> Dict[str, Any]:
+        """Scan once and convert every pending legacy file; returns the progress counters"""
+        if not self._run_lock.acquire(blocking=False):
+            return {"success": False, "error": "A legacy migration is already running"}
+        try:
+            legacy_files = self.find_legacy_files()
+            done = self._load_done()
+            pending = [path for path in legacy_files if done.get(path.name) != path.stat().st_mtime_ns]
+
+            with self._lock:
+                self.progress.update({
+                    "found": len(legacy_files),
+                    "already_done": len(legacy_files) - len(pending),
+                    "migrated": 0,
+                    "skipped": 0,
+                    "failed": 0,
+                    "started_at": datetime.now().isoformat(),
+                    "finished_at": None,
+                })
+            if pending:
+                started = time.time()
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="legacy-migration") as executor:
+                    list(executor.map(self._migrate_file, pending))
+                logger.info(
+                    f"Legacy session migration: {self.progress['migrated']} migrated, {self.progress['skipped']} skipped, "
+                    f"{self.progress['failed']} failed in {time.time() - started:.2f}s"
+                )
+            self.progress["finished_at"] = datetime.now().isoformat()
+            return {"success": True, **self.progress}
+        except Exception as e:
+            logger.error(f"Legacy session migration failed: {e}")
+            return {"success": False, "error": str(e)}
+        finally:
+            self._run_lock.release()
+
+    def _migrate_file(self, path: Path):
+        from utils.file_manager import get_file_manager
+
+        session_id = path.stem[len(LEGACY_PREFIX):]
+        entry = {"file": path.name, "session_id": session_id, "timestamp": datetime.now().isoformat()}
+        try:
+            entry["mtime_ns"] = path.stat().st_mtime_ns
+            file_manager = get_file_manager(str(self.base_dir))
+            if not session_id:
+                entry.update(status="failed", error="empty session id")
+            elif file_manager.session_exists(session_id):
+                # A current session always wins over its legacy copy
+                entry["status"] = "skipped"
+            elif file_manager.migrate_from_json(session_id, str(path)):
+                entry["status"] = "migrated"
+            else:
+                entry.update(status="failed", error="migrate_from_json returned False")
+        except Exception as e:
+            entry.update(status="failed", error=str(e))
+        self._record(entry)
+
+    # ------------------------------------------------------------------
+    # Background run
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Run the migration once in the background without delaying startup"""
+        if not self.enabled or self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(loop.run_in_executor(None, self.migrate_all))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.progress,
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "running": self._run_lock.locked(),
+            "progress_file": str(self.progress_path),
+        }
+
+
+# Global instance
+legacy_migration_service = LegacyMigrationService()
+
+def get_legacy_migration_service() -> LegacyMigrationService:
+    """Get the legacy migration service instance"""
+    return legacy_migration_service
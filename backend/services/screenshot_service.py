@@ -9,7 +9,7 @@ import uuid
 import base64
 import asyncio
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -249,6 +249,28 @@ class Html2ImageScreenshotService:
                 "session_id": session_id
             }
 
+    async def generate_screenshot_in_thread(self, html_content: str, css_content: str, session_id: str) -> Dict[str, Any]:
+        """Generate a screenshot in a worker thread so Chrome rendering does not block the event loop"""
+        return await asyncio.to_thread(
+            asyncio.run, self.generate_screenshot(html_content, css_content, session_id)
+        )
+
+    async def generate_screenshots_batch(self, items: List[Dict[str, str]], session_id: str, max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Render several html/css pairs through a bounded pool, preserving input order"""
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("SCREENSHOT_POOL_SIZE", "3"))
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def render(item: Dict[str, str]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.generate_screenshot_in_thread(item.get("html", ""), item.get("css", ""), session_id)
+
+        results = await asyncio.gather(*(render(item) for item in items), return_exceptions=True)
+        return [
+            result if isinstance(result, dict) else {"success": False, "error": str(result), "session_id": session_id}
+            for result in results
+        ]
+
 # Global instance
 screenshot_service = Html2ImageScreenshotService()
 
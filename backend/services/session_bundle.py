@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Session Bundle Service
+
+Packs everything a session owns into one gzip-compressed tar archive: the
+current and original UI code, the modification (delta) history, the folded
+rationale, the conversation state, the logo and the latest screenshot.
+manifest.json is the first member and lists the SHA-256 and size of every
+other member, so an import validates the bundle in the same single
+sequential read that restores it. Bundles are storage-backend neutral: a
+session exported from the file backend imports into SQLite and vice versa.
+
+Layout:
+    manifest.json
+    session.json            conversation session state (if the store has it)
+    ui/<file>               UI code files, history.json and metadata.json
+    rationale.json
+    logo/<file>             logo image and logo_metadata.json
+    screenshot/<file>       most recent screenshot
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "session-bundle"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+MEMBER_PREFIXES = ("ui/", "logo/", "screenshot/")
+MEMBER_FILES = ("session.json", "rationale.json")
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+SESSION_DIRECTORIES = ("temp_ui_files", "temp_logos", "temp_previews")
+
+
+class SessionBundleError(Exception):
+    """Raised when a bundle cannot be exported or is rejected on import"""
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only sink that hands compressed output to a generator in chunks"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _is_safe_member(name: str) -> bool:
+    if name.startswith("/") or "\\" in name or ".." in name.split("/"):
+        return False
+    return name in MEMBER_FILES or (name.startswith(MEMBER_PREFIXES) and name.count("/") == 1 and not name.endswith("/"))
+
+
+class SessionBundleService:
+    """Exports sessions to, and restores them from, single-file bundles"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.getcwd())
+        self.max_bytes = int(float(os.getenv("SESSION_BUNDLE_MAX_MB", "100")) * 1024 * 1024)
+        self.compression_level = int(os.getenv("SESSION_BUNDLE_COMPRESSION_LEVEL", "6"))
+
+    def _check_session_id(self, session_id: Any) -> str:
+        """Session ids become path components; reject anything that could leave the session directories"""
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            raise SessionBundleError(f"Invalid session id: {session_id!r}")
+        root = self.root.resolve()
+        for directory in SESSION_DIRECTORIES:
+            if (root / directory / session_id).resolve().parent != root / directory:
+                raise SessionBundleError(f"Invalid session id: {session_id!r}")
+        return session_id
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def collect(self, session_id: str) -> Dict[str, bytes]:
+        """Snapshot of every member of a session's bundle"""
+        self._check_session_id(session_id)
+        from utils.file_manager import get_file_manager
+        from utils.rationale_manager import RationaleManager, rationale_log
+        from session_manager import session_manager
+
+        ui_files = get_file_manager(str(self.root / "temp_ui_files")).export_files(session_id)
+        if ui_files is None:
+            raise SessionBundleError(f"Session {session_id} has no UI code to export")
+
+        members = {f"ui/{name}": content for name, content in ui_files.items()}
+
+        session_state = session_manager.get_session(session_id)
+        if session_state is not None:
+            members["session.json"] = json.dumps(session_state, ensure_ascii=False, default=str).encode("utf-8")
+
+        rationale_log.flush(session_id)
+        rationale_dir = self.root / "temp_ui_files" / session_id
+        if (rationale_dir / "rationale.json").exists() or (rationale_dir / "rationale.log.jsonl").exists():
+            rationale = RationaleManager(session_id).load_rationale()
+            members["rationale.json"] = json.dumps(rationale, indent=2, ensure_ascii=False).encode("utf-8")
+
+        logo_dir = self.root / "temp_logos" / session_id
+        if logo_dir.is_dir():
+            for entry in sorted(logo_dir.iterdir()):
+                if entry.is_file():
+                    members[f"logo/{entry.name}"] = entry.read_bytes()
+
+        screenshots = sorted((self.root / "temp_previews" / session_id).glob("screenshot_*.png"), key=lambda p: p.stat().st_mtime)
+        if screenshots:
+            members[f"screenshot/{screenshots[-1].name}"] = screenshots[-1].read_bytes()
+
+        return members
+
+    def build_manifest(self, session_id: str, members: Dict[str, bytes]) -> Dict[str, Any]:
+        from utils.file_manager import get_file_manager
+
+        return {
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "session_id": session_id,
+            "exported_at": datetime.now().isoformat(),
+            "source_backend": type(get_file_manager(str(self.root / "temp_ui_files"))).__name__,
+            "files": {name: {"sha256": _sha256(content), "size": len(content)} for name, content in members.items()},
+        }
+
+    def iter_export(self, session_id: str) -> Iterator[bytes]:
+        """Stream a bundle as compressed chunks; the session is snapshotted before the first chunk"""
+        members = self.collect(session_id)
+        manifest = json.dumps(self.build_manifest(session_id, members), indent=2).encode("utf-8")
+        return self._stream(manifest, members)
+
+    def _stream(self, manifest: bytes, members: Dict[str, bytes]) -> Iterator[bytes]:
+        sink = _ChunkWriter()
+        mtime = time.time()
+        with gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=self.compression_level, mtime=int(mtime)) as compressed:
+            with tarfile.open(fileobj=compressed, mode="w|") as archive:
+                for name, content in [(MANIFEST_NAME, manifest)] + list(members.items()):
+                    info = tarfile.TarInfo(name)
+                    info.size = len(content)
+                    info.mtime = mtime
+                    archive.addfile(info, io.BytesIO(content))
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+
+    def export_to_file(self, session_id: str, path: str) -> Dict[str, Any]:
+        """Write a bundle to disk atomically"""
+        target = Path(path)
+        temp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in self.iter_export(session_id):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return {"success": True, "session_id": session_id, "path": str(target), "bytes": size}
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def import_bundle(self, stream: BinaryIO, session_id: Optional[str] = None, overwrite: bool = False) -> Dict[str, Any]:
+        """Validate and restore a bundle read sequentially from stream; session_id renames it"""
+        with tempfile.TemporaryDirectory(prefix="bundle_", dir=self._staging_root()) as staging:
+            manifest, staged = self._read_bundle(stream, Path(staging))
+            target_id = self._check_session_id(session_id or manifest.get("session_id"))
+            self._restore(target_id, manifest, staged, overwrite)
+
+        logger.info(f"Imported session bundle {manifest['session_id']} as {target_id} ({len(staged)} files)")
+        return {
+            "success": True,
+            "session_id": target_id,
+            "source_session_id": manifest["session_id"],
+            "files": sorted(staged),
+        }
+
+    def _staging_root(self) -> str:
+        staging_root = self.root / "temp_ui_files"
+        staging_root.mkdir(parents=True, exist_ok=True)
+        return str(staging_root)
+
+    def _read_bundle(self, stream: BinaryIO, staging: Path) -> Tuple[Dict[str, Any], Dict[str, Path]]:
+        """Extract members to staging while checking them against the manifest"""
+        manifest = None
+        staged: Dict[str, Path] = {}
+        total = 0
+        try:
+            with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+                for member in archive:
+                    if manifest is None:
+                        if member.name != MANIFEST_NAME or not member.isfile():
+                            raise SessionBundleError("Bundle must start with manifest.json")
+                        manifest = json.loads(archive.extractfile(member).read())
+                        if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version") != BUNDLE_VERSION:
+                            raise SessionBundleError(f"Unsupported bundle format {manifest.get('format')} v{manifest.get('version')}")
+                        continue
+
+                    expected = manifest["files"].get(member.name)
+                    if not member.isfile() or not _is_safe_member(member.name) or expected is None:
+                        raise SessionBundleError(f"Unexpected bundle member: {member.name}")
+                    total += member.size
+                    if member.size != expected["size"] or total > self.max_bytes:
+                        raise SessionBundleError(f"Bundle member {member.name} exceeds its declared or allowed size")
+
+                    content = archive.extractfile(member).read()
+                    if _sha256(content) != expected["sha256"]:
+                        raise SessionBundleError(f"Checksum mismatch for {member.name}")
+                    path = staging / member.name.replace("/", "__")
+                    path.write_bytes(content)
+                    staged[member.name] = path
+        except (tarfile.TarError, EOFError, OSError, json.JSONDecodeError) as e:
+            raise SessionBundleError(f"Invalid bundle: {e}")
+
+        if manifest is None:
+            raise SessionBundleError("Empty bundle")
+        missing = set(manifest["files"]) - set(staged)
+        if missing:
+            raise SessionBundleError(f"Bundle is missing files: {sorted(missing)}")
+        if "ui/metadata.json" not in staged:
+            raise SessionBundleError("Bundle has no UI session metadata")
+        return manifest, staged
+
+    def _restore(self, session_id: str, manifest: Dict[str, Any], staged: Dict[str, Path], overwrite: bool):
+        from utils.file_manager import get_file_manager
+        from utils.rationale_manager import rationale_log
+        from session_manager import session_manager
+
+        file_manager = get_file_manager(str(self.root / "temp_ui_files"))
+        if file_manager.session_exists(session_id) and not overwrite:
+            raise SessionBundleError(f"Session {session_id} already exists; pass overwrite to replace it")
+
+        ui_files = {name[len("ui/"):]: path.read_bytes() for name, path in staged.items() if name.startswith("ui/")}
+        if not file_manager.import_files(session_id, ui_files):
+            raise SessionBundleError(f"Could not restore UI code of session {session_id}")
+
+        session_dir = self.root / "temp_ui_files" / session_id
+        session_dir.mkdir(parents=True, exist_ok=True)
+        if "rationale.json" in staged:
+            # The bundled rationale is already folded; it replaces any local log
+            rationale_log.flush(session_id)
+            (session_dir / "rationale.log.jsonl").unlink(missing_ok=True)
+            rationale = json.loads(staged["rationale.json"].read_bytes())
+            rationale["session_id"] = session_id
+            (session_dir / "rationale.json").write_text(json.dumps(rationale, indent=2, ensure_ascii=False), encoding="utf-8")
+
+        for prefix, directory in (("logo/", "temp_logos"), ("screenshot/", "temp_previews")):
+            names = [name for name in staged if name.startswith(prefix)]
+            if not names:
+                continue
+            target_dir = self.root / directory / session_id
+            if prefix == "logo/" and target_dir.exists():
+                shutil.rmtree(target_dir)
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in names:
+                shutil.copyfile(staged[name], target_dir / name[len(prefix):])
+            if prefix == "logo/":
+                self._relink_logo_metadata(target_dir)
+
+        if "session.json" in staged:
+            state = json.loads(staged["session.json"].read_bytes())
+            session_manager.store.create(session_id, state)
+
+    def _relink_logo_metadata(self, logo_dir: Path):
+        """logo_metadata.json stores an absolute logo path; point it at the restored file"""
+        metadata_path = logo_dir / "logo_metadata.json"
+        if not metadata_path.exists():
+            return
+        metadata = json.loads(metadata_path.read_text())
+        metadata["session_id"] = logo_dir.name
+        if metadata.get("logo_filename"):
+            metadata["logo_path"] = str(logo_dir / metadata["logo_filename"])
+        metadata_path.write_text(json.dumps(metadata, indent=2))
+
+    def delete(self, session_id: str) -> bool:
+        """Remove everything a bundle of this session contains, e.g. after cold-storing it"""
+        from utils.file_manager import get_file_manager
+        from session_manager import session_manager
+
+        self._check_session_id(session_id)
+
+        deleted = get_file_manager(str(self.root / "temp_ui_files")).delete_session(session_id)
+        session_manager.delete_session(session_id)
+        for directory in ("temp_logos", "temp_previews"):
+            shutil.rmtree(self.root / directory / session_id, ignore_errors=True)
+        return deleted
+
+    def import_from_file(self, path: str, session_id: Optional[str] = None, overwrite: bool = False) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return self.import_bundle(f, session_id, overwrite)
+
+
+# Global instance
+session_bundle_service = SessionBundleService()
+
+def get_session_bundle_service() -> SessionBundleService:
+    """Get the session bundle service instance"""
+    return session_bundle_service
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Session Lifecycle Service
+
+Bounds the memory and disk used by sessions. A background sweeper
+periodically removes conversation sessions and UI code sessions that have
+been idle longer than SESSION_IDLE_TTL_SECONDS, deletes expired artefacts from
+the per-session directories (previews, reports, logos) and evicts the least
+recently modified entries of any directory that is over its byte quota.
+Deletions run in batches; with SESSION_SWEEP_DRY_RUN nothing is deleted and
+the sweep only reports what it would reclaim.
+"""
+
+import asyncio
+import fnmatch
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class ArtifactDirectory:
+    """A directory whose top-level entries (files or session folders) are swept"""
+    name: str
+    path: Path
+    quota_bytes: int
+    protected: Tuple[str, ...] = ()
+    delete: Optional[Callable[[Path], bool]] = field(default=None, repr=False)
+
+    def is_protected(self, entry: Path) -> bool:
+        return any(fnmatch.fnmatch(entry.name, pattern) for pattern in self.protected)
+
+
+def _entry_usage(entry: Path) -> Tuple[int, float]:
+    """Total bytes and most recent mtime of a file or directory tree"""
+    stat = entry.stat()
+    if not entry.is_dir():
+        return stat.st_size, stat.st_mtime
+    total, last_modified = 0, stat.st_mtime
+    for root, _, files in os.walk(entry):
+        for name in files:
+            try:
+                file_stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += file_stat.st_size
+            last_modified = max(last_modified, file_stat.st_mtime)
+    return total, last_modified
+
+
+def _remove_entry(entry: Path) -> bool:
+    if entry.is_dir():
+        shutil.rmtree(entry, ignore_errors=True)
+    else:
+        entry.unlink(missing_ok=True)
+    return not entry.exists()
+
+
+class SessionLifecycleManager:
+    """Idle-TTL expiry, disk quotas and a background sweeper for session state and artefacts"""
+
+    def __init__(self, directories: Optional[List[ArtifactDirectory]] = None):
+        self.idle_ttl_seconds = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "86400"))
+        self.sweep_interval_seconds = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "600"))
+        self.batch_size = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "200"))
+        self.batch_pause_seconds = float(os.getenv("SESSION_SWEEP_BATCH_PAUSE_MS", "50")) / 1000
+        self.dry_run = os.getenv("SESSION_SWEEP_DRY_RUN", "false").lower() == "true"
+        self.enabled = os.getenv("SESSION_SWEEPER_ENABLED", "true").lower() == "true"
+        self.directories = directories if directories is not None else self._default_directories()
+
+        self._sweep_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics: Dict[str, Any] = {
+            "sweeps": 0,
+            "sessions_expired": 0,
+            "ui_sessions_expired": 0,
+            "artifacts_expired": 0,
+            "quota_evictions": 0,
+            "bytes_reclaimed": 0,
+            "bytes_reclaimed_by_directory": {directory.name: 0 for directory in self.directories},
+            "last_sweep": None,
+        }
+
+    def _default_directories(self) -> List[ArtifactDirectory]:
+        """Directories the app writes per-session artefacts to, relative to the working directory"""
+        cwd = Path(os.getcwd())
+
+        def quota(env_name: str, default_mb: str) -> int:
+            return int(float(os.getenv(env_name, default_mb)) * MB)
+
+        return [
+            ArtifactDirectory("temp_ui_files", cwd / "temp_ui_files", quota("TEMP_UI_FILES_QUOTA_MB", "1024"),
+                              protected=("ui_codes.db*", "ui_codes_*.json", "legacy_migration.jsonl"), delete=self._delete_ui_session_entry),
+            ArtifactDirectory("temp_previews", cwd / "temp_previews", quota("TEMP_PREVIEWS_QUOTA_MB", "1024")),
+            ArtifactDirectory("reports", cwd / "reports", quota("REPORTS_QUOTA_MB", "512")),
+            ArtifactDirectory("temp_logos", cwd / "temp_logos", quota("TEMP_LOGOS_QUOTA_MB", "256")),
+        ]
+
+    def _delete_ui_session_entry(self, entry: Path) -> bool:
+        """Session folders go through the file manager so its buffers and indexes stay consistent"""
+        from utils.file_manager import get_file_manager
+
+        file_manager = get_file_manager(str(entry.parent))
+        if entry.is_dir() and file_manager.session_exists(entry.name):
+            file_manager.delete_session(entry.name)
+            return not entry.exists()
+        return _remove_entry(entry)
+
+    # ------------------------------------------------------------------
+    # Sweeping
+    # ------------------------------------------------------------------
+
+    def sweep(self, dry_run: Optional[bool] = None) -> Dict[str, Any]:
+        """Run one sweep; returns what was (or with dry_run would be) removed"""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        if not self._sweep_lock.acquire(blocking=False):
+            return {"success": False, "error": "A sweep is already running"}
+        try:
+            started = time.time()
+            idle_since = started - self.idle_ttl_seconds
+            report = {
+                "dry_run": dry_run,
+                "started_at": datetime.fromtimestamp(started).isoformat(),
+                "sessions_expired": self._expire_conversation_sessions(dry_run),
+                "ui_sessions_expired": 0,
+                "directories": {},
+            }
+
+            ui_expired, ui_bytes = self._expire_ui_sessions(idle_since, dry_run)
+            report["ui_sessions_expired"] = len(ui_expired)
+            report["ui_session_bytes_reclaimed"] = ui_bytes
+            for directory in self.directories:
+                # In a dry run the idle UI sessions are still on disk; do not count them twice
+                skip = set(ui_expired) if dry_run and directory.name == "temp_ui_files" else set()
+                report["directories"][directory.name] = self._sweep_directory(directory, idle_since, dry_run, skip)
+
+            report["bytes_reclaimed"] = ui_bytes + sum(result["bytes_reclaimed"] for result in report["directories"].values())
+            report["duration_seconds"] = round(time.time() - started, 3)
+            self._record(report)
+            logger.info(
+                f"Session sweep{' (dry run)' if dry_run else ''}: {report['sessions_expired']} sessions, "
+                f"{len(ui_expired)} UI sessions, {report['bytes_reclaimed']} bytes"
+            )
+            return {"success": True, **report}
+        except Exception as e:
+            logger.error(f"Session sweep failed: {e}")
+            return {"success": False, "error": str(e)}
+        finally:
+            self._sweep_lock.release()
+
+    def _expire_conversation_sessions(self, dry_run: bool) -> int:
+        from session_manager import session_manager
+
+        if dry_run:
+            return len(session_manager.expire_idle_sessions(self.idle_ttl_seconds, dry_run=True))
+
+        expired_total = 0
+        while True:
+            expired = session_manager.expire_idle_sessions(self.idle_ttl_seconds, self.batch_size)
+            expired_total += len(expired)
+            if len(expired) < self.batch_size:
+                return expired_total
+            time.sleep(self.batch_pause_seconds)
+
+    def _expire_ui_sessions(self, idle_since: float, dry_run: bool) -> Tuple[List[str], int]:
+        """Expire idle UI code sessions through the configured storage backend"""
+        from utils.file_manager import get_file_manager
+
+        # Warm-up results are LRU-bounded in memory, so they are left to age out
+        file_manager = get_file_manager()
+        idle_sessions = file_manager.list_idle_sessions(idle_since)
+        reclaimed = 0
+        for start in range(0, len(idle_sessions), self.batch_size):
+            for session_id in idle_sessions[start:start + self.batch_size]:
+                session_dir = file_manager.get_session_dir(session_id)
+                size = _entry_usage(session_dir)[0] if session_dir.exists() else 0
+                if dry_run or file_manager.delete_session(session_id):
+                    reclaimed += size
+            if not dry_run:
+                time.sleep(self.batch_pause_seconds)
+        return idle_sessions, reclaimed
+
+    def _sweep_directory(self, directory: ArtifactDirectory, idle_since: float, dry_run: bool, skip: set) -> Dict[str, Any]:
+        """Delete expired entries, then evict the oldest until the directory fits its quota"""
+        result = {"entries": 0, "bytes_used": 0, "expired": 0, "quota_evictions": 0, "bytes_reclaimed": 0}
+        if not directory.path.exists():
+            return result
+
+        entries = []
+        for entry in directory.path.iterdir():
+            if directory.is_protected(entry) or entry.name in skip:
+                continue
+            try:
+                size, last_modified = _entry_usage(entry)
+            except FileNotFoundError:
+                continue
+            entries.append((last_modified, size, entry))
+        entries.sort(key=lambda item: item[0])
+        result["entries"] = len(entries)
+        result["bytes_used"] = sum(size for _, size, _ in entries)
+
+        expired = [item for item in entries if item[0] < idle_since]
+        remaining = entries[len(expired):]
+        bytes_left = result["bytes_used"] - sum(size for _, size, _ in expired)
+        evicted = []
+        if directory.quota_bytes > 0:
+            for item in remaining:
+                if bytes_left <= directory.quota_bytes:
+                    break
+                evicted.append(item)
+                bytes_left -= item[1]
+
+        delete = directory.delete or _remove_entry
+        for reason, items in (("expired", expired), ("quota_evictions", evicted)):
+            for start in range(0, len(items), self.batch_size):
+                for _, size, entry in items[start:start + self.batch_size]:
+                    if dry_run or delete(entry):
+                        result[reason] += 1
+                        result["bytes_reclaimed"] += size
+                if not dry_run:
+                    time.sleep(self.batch_pause_seconds)
+        return result
+
+    def _record(self, report: Dict[str, Any]):
+        self.metrics["last_sweep"] = report
+        if report["dry_run"]:
+            return
+        self.metrics["sweeps"] += 1
+        self.metrics["sessions_expired"] += report["sessions_expired"]
+        self.metrics["ui_sessions_expired"] += report["ui_sessions_expired"]
+        self.metrics["bytes_reclaimed"] += report["bytes_reclaimed"]
+        by_directory = self.metrics["bytes_reclaimed_by_directory"]
+        by_directory["temp_ui_files"] = by_directory.get("temp_ui_files", 0) + report["ui_session_bytes_reclaimed"]
+        for name, result in report["directories"].items():
+            self.metrics["artifacts_expired"] += result["expired"]
+            self.metrics["quota_evictions"] += result["quota_evictions"]
+            by_directory[name] = by_directory.get(name, 0) + result["bytes_reclaimed"]
+
+    # ------------------------------------------------------------------
+    # Background sweeper
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Start the periodic sweeper on the running event loop"""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Session sweeper started (every {self.sweep_interval_seconds}s, idle TTL {self.idle_ttl_seconds}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sweep)
+            await asyncio.sleep(self.sweep_interval_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Sweeper configuration and cumulative metrics"""
+        from session_manager import session_manager
+
+        store = session_manager.store
+        return {
+            **self.metrics,
+            "running": self._task is not None and not self._task.done(),
+            "dry_run": self.dry_run,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "sweep_interval_seconds": self.sweep_interval_seconds,
+            "quotas_bytes": {directory.name: directory.quota_bytes for directory in self.directories},
+            "session_store": store.backend_name,
+            "in_memory_sessions": len(store.session_ids()) if store.backend_name == "memory" else None,
+            "lru_evictions": getattr(store, "evictions", None),
+        }
+
+
+# Global instance
+session_lifecycle = SessionLifecycleManager()
+
+def get_session_lifecycle() -> SessionLifecycleManager:
+    """Get the session lifecycle manager instance"""
+    return session_lifecycle
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Store
+
+Content-addressed store of downscaled template previews. Thumbnails are
+rendered once at ingest time with the screenshot service, compressed to WebP
+(JPEG when Pillow lacks WebP support) and written to disk under the template's
+content hash, so recommendation cards can show an image without rendering.
+"""
+
+import base64
+import io
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+CONTENT_HASH_PATTERN = re.compile(r"^[0-9a-f]{16,64}$")
+THUMBNAIL_URL_PREFIX = "/api/templates/thumbnails"
+
+
+class ThumbnailStore:
+    """Disk blob store of template thumbnails keyed by content hash"""
+
+    def __init__(self, root: Optional[str] = None, width: Optional[int] = None, quality: Optional[int] = None):
+        self.root = Path(root or os.getenv("THUMBNAIL_DIR", Path(__file__).resolve().parent.parent / "thumbnails"))
+        self.width = width or int(os.getenv("THUMBNAIL_WIDTH", "480"))
+        self.quality = quality or int(os.getenv("THUMBNAIL_QUALITY", "80"))
+        self.image_format = "WEBP" if features.check("webp") else "JPEG"
+        self.extension = ".webp" if self.image_format == "WEBP" else ".jpg"
+        self.media_type = "image/webp" if self.image_format == "WEBP" else "image/jpeg"
+
+    def is_valid_hash(self, content_hash: str) -> bool:
+        return bool(CONTENT_HASH_PATTERN.match(content_hash or ""))
+
+    def path_for(self, content_hash: str) -> Path:
+        """Blob path, sharded by the first two hash characters"""
+        return self.root / content_hash[:2] / f"{content_hash}{self.extension}"
+
+    def url_for(self, content_hash: str) -> str:
+        return f"{THUMBNAIL_URL_PREFIX}/{content_hash}"
+
+    def exists(self, content_hash: str) -> bool:
+        return self.is_valid_hash(content_hash) and self.path_for(content_hash).exists()
+
+    def save_image(self, content_hash: str, image_bytes: bytes) -> str:
+        """Downscale and compress a rendered screenshot; returns the thumbnail URL"""
+        if not self.is_valid_hash(content_hash):
+            raise ValueError(f"Invalid content hash: {content_hash}")
+
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = image.convert("RGB")
+            if image.width > self.width:
+                height = max(1, round(image.height * self.width / image.width))
+                image = image.resize((self.width, height), Image.LANCZOS)
+
+            path = self.path_for(content_hash)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(path.suffix + ".tmp")
+            image.save(temp_path, format=self.image_format, quality=self.quality, optimize=True)
+            os.replace(temp_path, path)
+
+        logger.info(f"Stored thumbnail {path.name} ({path.stat().st_size} bytes)")
+        return self.url_for(content_hash)
+
+    async def generate_batch(self, items: List[Dict[str, Any]], max_concurrency: Optional[int] = None) -> Dict[str, str]:
+        """Render {content_hash, html, css} items in parallel; returns content_hash -> URL for stored thumbnails"""
+        from services.screenshot_service import get_screenshot_service
+
+        pending = [item for item in items if not self.exists(item["content_hash"])]
+        urls = {item["content_hash"]: self.url_for(item["content_hash"]) for item in items if self.exists(item["content_hash"])}
+        if not pending:
+            return urls
+
+        screenshot_service = await get_screenshot_service()
+        results = await screenshot_service.generate_screenshots_batch(
+            [{"html": item["html"], "css": item["css"]} for item in pending],
+            session_id="thumbnails",
+            max_concurrency=max_concurrency
+        )
+
+        for item, result in zip(pending, results):
+            if not result.get("success"):
+                logger.warning(f"Thumbnail render failed for {item['content_hash']}: {result.get('error')}")
+                continue
+            try:
+                urls[item["content_hash"]] = self.save_image(item["content_hash"], base64.b64decode(result["base64_image"]))
+            except Exception as e:
+                logger.error(f"Failed to store thumbnail {item['content_hash']}: {e}")
+            finally:
+                # The full-size render is no longer needed
+                for key in ("screenshot_path", "html_file_path"):
+                    if result.get(key):
+                        Path(result[key]).unlink(missing_ok=True)
+        return urls
+
+
+# Global instance
+thumbnail_store = ThumbnailStore()
+
+def get_thumbnail_store() -> ThumbnailStore:
+    """Get the thumbnail store instance"""
+    return thumbnail_store
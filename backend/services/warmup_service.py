@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Session Warm-up Service
+
+Precomputes the expensive artefacts of a freshly selected template in the
+background so the editor page and the first edit do not have to pay for them:
+the preview screenshot, a CSS/DOM index of the template and the default
+editing suggestions.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _DOMIndexParser(HTMLParser):
+    """Collects tag, class and id usage from an HTML document"""
+
+    def __init__(self):
+        super().__init__()
+        self.tags: Dict[str, int] = {}
+        self.classes: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.text_nodes: List[Dict[str, str]] = []
+        self._stack: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        self.tags[tag] = self.tags.get(tag, 0) + 1
+        selector = tag
+        for name, value in attrs:
+            if name == "class" and value:
+                class_names = value.split()
+                for class_name in class_names:
+                    self.classes[class_name] = self.classes.get(class_name, 0) + 1
+                selector = f"{tag}." + ".".join(class_names)
+            elif name == "id" and value:
+                self.ids.append(value)
+                selector = f"{tag}#{value}"
+        self._stack.append(selector)
+
+    def handle_endtag(self, tag):
+        if self._stack:
+            self._stack.pop()
+
+    def handle_data(self, data):
+        text = data.strip()
+        if text and self._stack:
+            self.text_nodes.append({"selector": self._stack[-1], "text": text[:120]})
+
+
+def build_code_index(html_content: str, css_content: str) -> Dict[str, Any]:
+    """Build a lightweight CSS selector / DOM index for a template"""
+    parser = _DOMIndexParser()
+    try:
+        parser.feed(html_content or "")
+    except Exception as e:
+        logger.warning(f"DOM index parsing stopped early: {e}")
+
+    css_without_comments = re.sub(r"/\*.*?\*/", "", css_content or "", flags=re.DOTALL)
+    selectors = []
+    for match in re.finditer(r"([^{}@;]+)\{", css_without_comments):
+        for selector in match.group(1).split(","):
+            selector = selector.strip()
+            if selector and not selector.startswith(("from", "to")) and not selector.endswith("%"):
+                selectors.append(selector)
+
+    return {
+        "tags": parser.tags,
+        "classes": parser.classes,
+        "ids": parser.ids,
+        "text_nodes": parser.text_nodes[:200],
+        "css_selectors": selectors,
+        "css_variables": sorted(set(re.findall(r"(--[\w-]+)\s*:", css_without_comments))),
+    }
+
+
+def compute_code_hash(html_content: str, css_content: str) -> str:
+    """Hash the rendered code so cached artefacts can be matched to it"""
+    digest = hashlib.sha256()
+    digest.update((html_content or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((css_content or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SessionWarmupService:
+    """Runs and caches background warm-up work for editing sessions"""
+
+    def __init__(self, max_sessions: int = 100):
+        self.max_sessions = max_sessions
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._steps: List[Callable[[str, Dict[str, Any], Dict[str, Any]], Any]] = []
+
+    def register_step(self, step: Callable[[str, Dict[str, Any], Dict[str, Any]], Any]):
+        """Register an extra warm-up step: step(session_id, ui_codes, result)"""
+        self._steps.append(step)
+
+    def schedule(self, session_id: str, ui_codes: Dict[str, str],
+                 suggestion_builder: Optional[Callable[[Dict[str, Any]], List[str]]] = None) -> Optional[asyncio.Task]:
+        """Start warming a session in the background; returns the task"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"No running event loop, skipping warm-up for session {session_id}")
+            return None
+
+        previous = self._tasks.get(session_id)
+        if previous and not previous.done():
+            previous.cancel()
+
+        task = loop.create_task(self.warm_session(session_id, ui_codes, suggestion_builder))
+        self._tasks[session_id] = task
+
+        def _forget(finished: asyncio.Task):
+            if self._tasks.get(session_id) is finished:
+                self._tasks.pop(session_id, None)
+
+        task.add_done_callback(_forget)
+        return task
+
+    async def warm_session(self, session_id: str, ui_codes: Dict[str, str],
+                           suggestion_builder: Optional[Callable[[Dict[str, Any]], List[str]]] = None) -> Dict[str, Any]:
+        """Precompute screenshot, code index and editing suggestions for a session"""
+        started = time.time()
+        html_content = ui_codes.get("html_export", "")
+        css_content = ui_codes.get("globals_css", "") + "\n" + ui_codes.get("style_css", "")
+        code_hash = compute_code_hash(html_content, css_content)
+
+        result: Dict[str, Any] = {
+            "session_id": session_id,
+            "code_hash": code_hash,
+            "started_at": datetime.now().isoformat(),
+            "steps": {},
+        }
+
+        # CPU-bound steps run off the event loop
+        try:
+            step_start = time.time()
+            result["code_index"] = await asyncio.to_thread(build_code_index, html_content, css_content)
+            result["steps"]["code_index"] = round(time.time() - step_start, 3)
+        except Exception as e:
+            logger.error(f"Warm-up code index failed for session {session_id}: {e}")
+
+        if suggestion_builder:
+            try:
+                step_start = time.time()
+                result["editing_suggestions"] = suggestion_builder(ui_codes)
+                result["steps"]["editing_suggestions"] = round(time.time() - step_start, 3)
+            except Exception as e:
+                logger.error(f"Warm-up editing suggestions failed for session {session_id}: {e}")
+
+        # Store what we have so far so readers do not wait on the screenshot
+        self._store(session_id, result)
+
+        try:
+            step_start = time.time()
+            screenshot = await self._render_screenshot(html_content, css_content, session_id)
+            if screenshot.get("success"):
+                result["screenshot"] = {
+                    "base64_image": screenshot.get("base64_image", ""),
+                    "screenshot_path": screenshot.get("screenshot_path"),
+                }
+            result["steps"]["screenshot"] = round(time.time() - step_start, 3)
+        except Exception as e:
+            logger.error(f"Warm-up screenshot failed for session {session_id}: {e}")
+
+        for step in self._steps:
+            step_name = getattr(step, "__name__", "step")
+            try:
+                step_start = time.time()
+                outcome = step(session_id, ui_codes, result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+                result["steps"][step_name] = round(time.time() - step_start, 3)
+            except Exception as e:
+                logger.error(f"Warm-up step {step_name} failed for session {session_id}: {e}")
+
+        result["completed_at"] = datetime.now().isoformat()
+        result["duration"] = round(time.time() - started, 3)
+        self._store(session_id, result)
+        logger.info(f"Warm-up finished for session {session_id} in {result['duration']}s: {result['steps']}")
+        return result
+
+    async def _render_screenshot(self, html_content: str, css_content: str, session_id: str) -> Dict[str, Any]:
+        """Render the preview screenshot without blocking the event loop"""
+        from services.screenshot_service import get_screenshot_service
+        screenshot_service = await get_screenshot_service()
+        return await screenshot_service.generate_screenshot_in_thread(html_content, css_content, session_id)
+
+    def _store(self, session_id: str, result: Dict[str, Any]):
+        self._results[session_id] = result
+        self._results.move_to_end(session_id)
+        while len(self._results) > self.max_sessions:
+            self._results.popitem(last=False)
+
+    def get_warm_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get the warm-up result for a session, if any"""
+        return self._results.get(session_id)
+
+    def get_cached_screenshot(self, session_id: str, html_content: str, css_content: str) -> Optional[str]:
+        """Get the warm screenshot if it was rendered from exactly this code"""
+        state = self._results.get(session_id)
+        if not state or "screenshot" not in state:
+            return None
+        if state.get("code_hash") != compute_code_hash(html_content, css_content):
+            return None
+        return state["screenshot"].get("base64_image") or None
+
+    async def wait_for_screenshot(self, session_id: str, html_content: str, css_content: str,
+                                  timeout: float = 15.0) -> Optional[str]:
+        """Wait for an in-flight warm-up instead of rendering the same screenshot twice"""
+        task = self._tasks.get(session_id)
+        if task and not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Warm-up for session {session_id} still running after {timeout}s")
+            except asyncio.CancelledError:
+                # schedule() cancels a warm-up it replaces; only our own cancellation propagates
+                if not task.cancelled():
+                    raise
+                logger.info(f"Warm-up for session {session_id} was superseded, not waiting for it")
+            except Exception as e:
+                logger.error(f"Warm-up for session {session_id} failed: {e}")
+        return self.get_cached_screenshot(session_id, html_content, css_content)
+
+    def get_cached_suggestions(self, session_id: str, html_content: str, css_content: str) -> Optional[List[str]]:
+        """Get precomputed editing suggestions if they were built from exactly this code"""
+        state = self._results.get(session_id)
+        if not state:
+            return None
+        if state.get("code_hash") != compute_code_hash(html_content, css_content):
+            return None
+        return state.get("editing_suggestions")
+
+    def is_warming(self, session_id: str) -> bool:
+        task = self._tasks.get(session_id)
+        return bool(task and not task.done())
+
+    def invalidate(self, session_id: str):
+        """Drop warm-up results for a session (e.g. on reset or delete)"""
+        task = self._tasks.pop(session_id, None)
+        if task and not task.done():
+            task.cancel()
+        self._results.pop(session_id, None)
+
+
+# Global instance
+warmup_service = SessionWarmupService()
+
+async def get_warmup_service() -> SessionWarmupService:
+    """Get the warm-up service instance"""
+    return warmup_service
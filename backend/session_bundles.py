@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Session bundle export/import
+
+Exports sessions to single-file .tar.gz bundles (code, modification history,
+rationale, logo, latest screenshot and a manifest of content hashes) and
+restores them, e.g. to move sessions between nodes or to cold-store idle ones.
+Run from the backend directory so the session folders resolve as in the app.
+Conversation state is included when SESSION_STORE_BACKEND is shared (redis or
+sqlite); the in-process memory store is not visible to this script.
+
+Usage:
+    python session_bundles.py export SESSION_ID [-o bundle.tar.gz]
+    python session_bundles.py export --all [--idle-days 7] [--out-dir bundles] [--delete]
+    python session_bundles.py import bundle.tar.gz [...] [--session-id NEW_ID] [--overwrite]
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from services.session_bundle import SessionBundleError, session_bundle_service
+from utils.file_manager import get_file_manager
+
+
+def export_sessions(args) -> int:
+    file_manager = get_file_manager()
+    if args.all:
+        idle_since = time.time() - args.idle_days * 86400 if args.idle_days else time.time() + 1
+        session_ids = file_manager.list_idle_sessions(idle_since)
+    else:
+        session_ids = args.session_ids
+    if not session_ids:
+        print("No sessions to export")
+        return 0
+
+    single_output = args.output if len(session_ids) == 1 else None
+    if not single_output:
+        os.makedirs(args.out_dir, exist_ok=True)
+    failed = 0
+    for session_id in session_ids:
+        path = single_output or os.path.join(args.out_dir, f"session_{session_id}.tar.gz")
+        try:
+            result = session_bundle_service.export_to_file(session_id, path)
+            print(f"  exported {session_id} -> {result['path']} ({result['bytes']} bytes)")
+            if args.delete:
+                session_bundle_service.delete(session_id)
+        except (SessionBundleError, OSError) as e:
+            failed += 1
+            print(f"  failed {session_id}: {e}")
+    print(f"Done: {len(session_ids) - failed} exported, {failed} failed")
+    return 1 if failed else 0
+
+
+def import_sessions(args) -> int:
+    if args.session_id and len(args.bundles) > 1:
+        print("--session-id can only be used with a single bundle")
+        return 2
+    failed = 0
+    for path in args.bundles:
+        try:
+            result = session_bundle_service.import_from_file(path, args.session_id, args.overwrite)
+            print(f"  imported {path} -> {result['session_id']} ({len(result['files'])} files)")
+        except (SessionBundleError, OSError) as e:
+            failed += 1
+            print(f"  failed {path}: {e}")
+    print(f"Done: {len(args.bundles) - failed} imported, {failed} failed")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export and import single-file session bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write sessions to bundles")
+    export_parser.add_argument("session_ids", nargs="*", help="Sessions to export")
+    export_parser.add_argument("--all", action="store_true", help="Export every UI code session (see --idle-days)")
+    export_parser.add_argument("--idle-days", type=float, default=0, help="With --all, only sessions idle this long")
+    export_parser.add_argument("-o", "--output", help="Bundle path when exporting one session")
+    export_parser.add_argument("--out-dir", default="session_bundles", help="Directory for bundles")
+    export_parser.add_argument("--delete", action="store_true", help="Delete each session after it was exported (cold storage)")
+    export_parser.set_defaults(handler=export_sessions)
+
+    import_parser = commands.add_parser("import", help="Restore sessions from bundles")
+    import_parser.add_argument("bundles", nargs="+", help="Bundle files")
+    import_parser.add_argument("--session-id", help="Import a single bundle under a new session ID")
+    import_parser.add_argument("--overwrite", action="store_true", help="Replace sessions that already exist")
+    import_parser.set_defaults(handler=import_sessions)
+
+    args = parser.parse_args(argv)
+    if args.command == "export" and not args.all and not args.session_ids:
+        parser.error("export needs SESSION_ID arguments or --all")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
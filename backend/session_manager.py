@@ -1,21 +1,26 @@
 """
-Simple Session Manager for storing session state globally
+Session Manager for storing session state across workers
+
+State lives in a pluggable SessionStore (see session_store.py) selected with
+SESSION_STORE_BACKEND, so sessions survive across uvicorn workers and nodes.
 """
 
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from session_store import SessionStore, create_session_store
+
 class SessionManager:
-    """Simple in-memory session manager"""
-    
-    def __init__(self):
-        self.sessions = {}
-    
+    """Session manager backed by a shared session store"""
+
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.store = store or create_session_store()
+
     def create_session(self) -> str:
         """Create a new session and return session ID"""
         session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
+        self.store.create(session_id, {
             "current_phase": "initial",
             "conversation_history": [],
             "requirements": {},
@@ -25,52 +30,71 @@ class SessionManager:
             "modifications": [],
             "report": None,
             "created_at": datetime.now().isoformat()
-        }
+        })
         return session_id
-    
+
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session by ID"""
-        return self.sessions.get(session_id)
-    
+        loaded = self.store.load(session_id)
+        return loaded[0] if loaded else None
+
+    def load_session(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Get (session, version) for optimistic updates"""
+        return self.store.load(session_id)
+
+    def save_fields(self, session_id: str, fields: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        """Write changed top-level fields; raises SessionVersionConflict if the version moved"""
+        return self.store.update_fields(session_id, fields, expected_version)
+
+    def append_history(self, session_id: str, entries: List[Dict[str, Any]]) -> bool:
+        """Append conversation history entries without rewriting the session"""
+        return self.store.append(session_id, "conversation_history", entries)
+
+    def trim_history(self, session_id: str, folded: List[Dict[str, Any]], fields: Dict[str, Any],
+                     expected_fields: Dict[str, Any]) -> int:
+        """Drop the folded oldest history entries and set fields; raises SessionTrimConflict if either changed"""
+        return self.store.trim_front(session_id, "conversation_history", folded, fields, expected_fields)
+
     def update_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
         """Update session with new data"""
-        if session_id in self.sessions:
-            self.sessions[session_id].update(updates)
+        try:
+            self.store.update_fields(session_id, updates)
             return True
-        return False
-    
+        except KeyError:
+            return False
+
     def set_selected_template(self, session_id: str, template: Dict[str, Any]) -> bool:
         """Set selected template for a session"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["selected_template"] = template
-            self.sessions[session_id]["current_phase"] = "template_selection"
-            return True
-        return False
-    
+        return self.update_session(session_id, {
+            "selected_template": template,
+            "current_phase": "template_selection"
+        })
+
     def get_selected_template(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get selected template for a session"""
         session = self.get_session(session_id)
         return session.get("selected_template") if session else None
-    
+
     def get_phase_status(self, session_id: str) -> Dict[str, Any]:
         """Get current phase status for frontend awareness"""
         session = self.get_session(session_id)
         if not session:
             return {"error": "Session not found"}
-        
+
         return {
             "current_phase": session.get("current_phase"),
             "phase_transition_completed": session.get("phase_transition_completed", False),
-            "can_edit": session.get("current_phase") == "editing" and 
+            "can_edit": session.get("current_phase") == "editing" and
                        session.get("phase_transition_completed", False)
         }
-    
+
     def delete_session(self, session_id: str) -> bool:
         """Delete a session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            return True
-        return False
+        return self.store.delete(session_id)
+
+    def expire_idle_sessions(self, max_idle_seconds: float, limit: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        """Remove sessions idle for longer than max_idle_seconds; returns their IDs"""
+        return self.store.expire_idle(max_idle_seconds, limit, dry_run)
 
 # Global session manager instance
-session_manager = SessionManager() 
\ No newline at end of file
+session_manager = SessionManager()
@@ -0,0 +1,532 @@
+"""
+Session Store - Shared storage backends for conversation sessions
+
+A session is a set of top-level fields plus a version number. Field updates
+are optimistic: a writer passes the version it loaded and gets a
+SessionVersionConflict if another worker saved in between. List fields such as
+conversation_history are stored item by item so messages can be appended
+without rewriting the rest of the state; appends do not bump the version.
+trim_front drops a prefix of a list field (e.g. after summarising it) without
+touching items appended concurrently. It is conditional on that prefix and on
+the fields it sets, not on the session version, so saves of unrelated fields
+while a summary is written do not make it fail.
+
+Backends (SESSION_STORE_BACKEND):
+    memory  - per-process dict (default, single worker only), LRU-capped at SESSION_MAX_IN_MEMORY
+    redis   - shared across workers and nodes (REDIS_URL), keys expire after SESSION_IDLE_TTL_SECONDS
+    sqlite  - shared across workers on one host (SESSION_SQLITE_PATH)
+
+Idle sessions are removed by the lifecycle sweeper through expire_idle().
+"""
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LIST_FIELDS = ("conversation_history",)
+
+
+class SessionVersionConflict(Exception):
+    """Raised when a session was saved by someone else since it was loaded"""
+
+    def __init__(self, session_id: str, expected_version: int, actual_version: int):
+        super().__init__(f"Session {session_id} is at version {actual_version}, expected {expected_version}")
+        self.session_id = session_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+
+class SessionTrimConflict(Exception):
+    """Raised when the prefix or fields trim_front expected were changed meanwhile"""
+
+    def __init__(self, session_id: str, field: str):
+        super().__init__(f"Session {session_id} changed {field} or the trimmed fields since they were read")
+        self.session_id = session_id
+        self.field = field
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _same(actual: List[Any], expected: List[Any]) -> bool:
+    """Compare values in their stored (JSON) form"""
+    return len(actual) == len(expected) and all(_dumps(a) == _dumps(b) for a, b in zip(actual, expected))
+
+
+class SessionStore(ABC):
+    """Interface implemented by every session backend"""
+
+    backend_name = "base"
+
+    @abstractmethod
+    def create(self, session_id: str, state: Dict[str, Any]) -> int:
+        """Store a new session and return its version"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Return (state, version), or None if the session does not exist"""
+
+    @abstractmethod
+    def update_fields(self, session_id: str, fields: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        """Set top-level fields and return the new version; raises KeyError for unknown sessions"""
+
+    @abstractmethod
+    def append(self, session_id: str, field: str, items: List[Any]) -> bool:
+        """Append items to a list field without touching the rest of the session"""
+
+    @abstractmethod
+    def trim_front(self, session_id: str, field: str, expected_head: List[Any], fields: Dict[str, Any],
+                   expected_fields: Dict[str, Any]) -> int:
+        """
+        Drop expected_head from the front of a list field and set fields in one step; returns the new version.
+        Raises SessionTrimConflict unless the list still starts with expected_head and every expected_fields
+        entry still has that value (a missing field counts as None).
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns False if it did not exist"""
+
+    @abstractmethod
+    def session_ids(self) -> List[str]:
+        """IDs of every stored session"""
+
+    @abstractmethod
+    def expire_idle(self, max_idle_seconds: float, limit: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        """Delete (or with dry_run only list) sessions untouched for max_idle_seconds, oldest first"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store; states are copied so callers never share references"""
+
+    backend_name = "memory"
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("SESSION_MAX_IN_MEMORY", "1000"))
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _touch(self, session_id: str, entry: Dict[str, Any]):
+        entry["touched_at"] = time.time()
+        self._sessions.move_to_end(session_id)
+
+    def create(self, session_id: str, state: Dict[str, Any]) -> int:
+        with self._lock:
+            self._sessions[session_id] = {"state": copy.deepcopy(state), "version": 1, "touched_at": time.time()}
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Evicted least recently used session {evicted_id}")
+        return 1
+
+    def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._touch(session_id, entry)
+            return copy.deepcopy(entry["state"]), entry["version"]
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                raise KeyError(session_id)
+            if expected_version is not None and entry["version"] != expected_version:
+                raise SessionVersionConflict(session_id, expected_version, entry["version"])
+            entry["state"].update(copy.deepcopy(fields))
+            entry["version"] += 1
+            self._touch(session_id, entry)
+            return entry["version"]
+
+    def append(self, session_id: str, field: str, items: List[Any]) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return False
+            entry["state"].setdefault(field, []).extend(copy.deepcopy(items))
+            self._touch(session_id, entry)
+            return True
+
+    def trim_front(self, session_id: str, field: str, expected_head: List[Any], fields: Dict[str, Any],
+                   expected_fields: Dict[str, Any]) -> int:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                raise KeyError(session_id)
+            state = entry["state"]
+            count = len(expected_head)
+            if not _same(state.get(field, [])[:count], expected_head) or not _same(
+                [state.get(name) for name in expected_fields], list(expected_fields.values())
+            ):
+                raise SessionTrimConflict(session_id, field)
+            del state.setdefault(field, [])[:count]
+            entry["state"].update(copy.deepcopy(fields))
+            entry["version"] += 1
+            return entry["version"]
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def expire_idle(self, max_idle_seconds: float, limit: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            # Entries are kept in least-recently-used order
+            expired = []
+            for session_id, entry in self._sessions.items():
+                if entry["touched_at"] >= cutoff or (limit is not None and len(expired) >= limit):
+                    break
+                expired.append(session_id)
+            if not dry_run:
+                for session_id in expired:
+                    del self._sessions[session_id]
+            return expired
+
+
+class RedisSessionStore(SessionStore):
+    """Redis hash per session (one JSON value per field) plus a Redis list per list field"""
+
+    backend_name = "redis"
+    VERSION_FIELD = "__version__"
+
+    def __init__(self, url: Optional[str] = None, prefix: Optional[str] = None):
+        import redis
+
+        self._redis = redis
+        self.client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+        self.prefix = prefix or os.getenv("SESSION_REDIS_PREFIX", "session:")
+        self.ttl_seconds = int(float(os.getenv("SESSION_IDLE_TTL_SECONDS", "86400")))
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _list_key(self, session_id: str, field: str) -> str:
+        return f"{self.prefix}{session_id}:{field}"
+
+    def _queue_expire(self, pipe, session_id: str):
+        """Refresh the idle TTL of every key of a session"""
+        if self.ttl_seconds > 0:
+            for key in [self._key(session_id)] + [self._list_key(session_id, name) for name in LIST_FIELDS]:
+                pipe.expire(key, self.ttl_seconds)
+
+    def _queue_fields(self, pipe, session_id: str, fields: Dict[str, Any]):
+        scalar_fields = {name: _dumps(value) for name, value in fields.items() if name not in LIST_FIELDS}
+        if scalar_fields:
+            pipe.hset(self._key(session_id), mapping=scalar_fields)
+        for name in LIST_FIELDS:
+            if name in fields:
+                pipe.delete(self._list_key(session_id, name))
+                if fields[name]:
+                    pipe.rpush(self._list_key(session_id, name), *[_dumps(item) for item in fields[name]])
+
+    def create(self, session_id: str, state: Dict[str, Any]) -> int:
+        with self.client.pipeline() as pipe:
+            pipe.delete(self._key(session_id), *[self._list_key(session_id, name) for name in LIST_FIELDS])
+            pipe.hset(self._key(session_id), self.VERSION_FIELD, 1)
+            self._queue_fields(pipe, session_id, state)
+            self._queue_expire(pipe, session_id)
+            pipe.execute()
+        return 1
+
+    def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._key(session_id))
+            for name in LIST_FIELDS:
+                pipe.lrange(self._list_key(session_id, name), 0, -1)
+            self._queue_expire(pipe, session_id)
+            raw, *lists = pipe.execute()[:1 + len(LIST_FIELDS)]
+        if not raw:
+            return None
+        version = int(raw.pop(self.VERSION_FIELD, 1))
+        state = {name: json.loads(value) for name, value in raw.items()}
+        for name, items in zip(LIST_FIELDS, lists):
+            state[name] = [json.loads(item) for item in items]
+        return state, version
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        key = self._key(session_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    current = pipe.hget(key, self.VERSION_FIELD)
+                    if current is None:
+                        raise KeyError(session_id)
+                    if expected_version is not None and int(current) != expected_version:
+                        raise SessionVersionConflict(session_id, expected_version, int(current))
+                    pipe.multi()
+                    self._queue_fields(pipe, session_id, fields)
+                    self._queue_expire(pipe, session_id)
+                    pipe.hincrby(key, self.VERSION_FIELD, 1)
+                    return int(pipe.execute()[-1])
+                except self._redis.WatchError:
+                    if expected_version is not None:
+                        actual = self.client.hget(key, self.VERSION_FIELD)
+                        raise SessionVersionConflict(session_id, expected_version, int(actual or 0))
+
+    def append(self, session_id: str, field: str, items: List[Any]) -> bool:
+        if not self.client.exists(self._key(session_id)):
+            return False
+        if items:
+            with self.client.pipeline() as pipe:
+                pipe.rpush(self._list_key(session_id, field), *[_dumps(item) for item in items])
+                self._queue_expire(pipe, session_id)
+                pipe.execute()
+        return True
+
+    def trim_front(self, session_id: str, field: str, expected_head: List[Any], fields: Dict[str, Any],
+                   expected_fields: Dict[str, Any]) -> int:
+        key = self._key(session_id)
+        with self.client.pipeline() as pipe:
+            list_key = self._list_key(session_id, field)
+            count = len(expected_head)
+            try:
+                # Appends only RPUSH, leaving the prefix intact; replacing the list also bumps the hash
+                pipe.watch(key)
+                if not pipe.exists(key):
+                    raise KeyError(session_id)
+                head = [json.loads(item) for item in pipe.lrange(list_key, 0, count - 1)] if count else []
+                current = [pipe.hget(key, name) for name in expected_fields]
+                current = [json.loads(value) if value is not None else None for value in current]
+                if not _same(head, expected_head) or not _same(current, list(expected_fields.values())):
+                    raise SessionTrimConflict(session_id, field)
+                pipe.multi()
+                pipe.ltrim(list_key, count, -1)
+                self._queue_fields(pipe, session_id, fields)
+                pipe.hincrby(key, self.VERSION_FIELD, 1)
+                return int(pipe.execute()[-1])
+            except self._redis.WatchError:
+                raise SessionTrimConflict(session_id, field)
+
+    def delete(self, session_id: str) -> bool:
+        return bool(self.client.delete(self._key(session_id), *[self._list_key(session_id, name) for name in LIST_FIELDS]))
+
+    def session_ids(self) -> List[str]:
+        ids = []
+        for key in self.client.scan_iter(match=f"{self.prefix}*", count=500):
+            session_id = key[len(self.prefix):]
+            if ":" not in session_id:
+                ids.append(session_id)
+        return ids
+
+    def expire_idle(self, max_idle_seconds: float, limit: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        """Redis expires idle sessions itself through the key TTL"""
+        return []
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) store with one row per field and one row per list item"""
+
+    backend_name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS session_fields (
+            session_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (session_id, field)
+        );
+        CREATE TABLE IF NOT EXISTS session_list_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_session_list_items ON session_list_items (session_id, field, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db")
+        self.path = path or os.getenv("SESSION_SQLITE_PATH", default_path)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _write_fields(self, connection: sqlite3.Connection, session_id: str, fields: Dict[str, Any]):
+        connection.executemany(
+            "INSERT INTO session_fields (session_id, field, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id, field) DO UPDATE SET value = excluded.value",
+            [(session_id, name, _dumps(value)) for name, value in fields.items() if name not in LIST_FIELDS]
+        )
+        for name in LIST_FIELDS:
+            if name in fields:
+                connection.execute("DELETE FROM session_list_items WHERE session_id = ? AND field = ?", (session_id, name))
+                connection.executemany(
+                    "INSERT INTO session_list_items (session_id, field, value) VALUES (?, ?, ?)",
+                    [(session_id, name, _dumps(item)) for item in fields[name] or []]
+                )
+
+    def create(self, session_id: str, state: Dict[str, Any]) -> int:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for table in ("sessions", "session_fields", "session_list_items"):
+                connection.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            connection.execute("INSERT INTO sessions (session_id, version, updated_at) VALUES (?, 1, ?)", (session_id, time.time()))
+            self._write_fields(connection, session_id, state)
+        return 1
+
+    def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            row = connection.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            state = {
+                name: json.loads(value)
+                for name, value in connection.execute("SELECT field, value FROM session_fields WHERE session_id = ?", (session_id,))
+            }
+            for name in LIST_FIELDS:
+                state[name] = [
+                    json.loads(value)
+                    for (value,) in connection.execute(
+                        "SELECT value FROM session_list_items WHERE session_id = ? AND field = ? ORDER BY id", (session_id, name)
+                    )
+                ]
+        return state, row[0]
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            if expected_version is not None and row[0] != expected_version:
+                raise SessionVersionConflict(session_id, expected_version, row[0])
+            self._write_fields(connection, session_id, fields)
+            connection.execute(
+                "UPDATE sessions SET version = version + 1, updated_at = ? WHERE session_id = ?", (time.time(), session_id)
+            )
+        return row[0] + 1
+
+    def append(self, session_id: str, field: str, items: List[Any]) -> bool:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            touched = connection.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id)).rowcount
+            if not touched:
+                return False
+            connection.executemany(
+                "INSERT INTO session_list_items (session_id, field, value) VALUES (?, ?, ?)",
+                [(session_id, field, _dumps(item)) for item in items]
+            )
+        return True
+
+    def trim_front(self, session_id: str, field: str, expected_head: List[Any], fields: Dict[str, Any],
+                   expected_fields: Dict[str, Any]) -> int:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            count = len(expected_head)
+            head = [
+                json.loads(value) for (value,) in connection.execute(
+                    "SELECT value FROM session_list_items WHERE session_id = ? AND field = ? ORDER BY id LIMIT ?",
+                    (session_id, field, count)
+                )
+            ]
+            current = []
+            for name in expected_fields:
+                value = connection.execute(
+                    "SELECT value FROM session_fields WHERE session_id = ? AND field = ?", (session_id, name)
+                ).fetchone()
+                current.append(json.loads(value[0]) if value else None)
+            if not _same(head, expected_head) or not _same(current, list(expected_fields.values())):
+                raise SessionTrimConflict(session_id, field)
+            connection.execute(
+                "DELETE FROM session_list_items WHERE id IN "
+                "(SELECT id FROM session_list_items WHERE session_id = ? AND field = ? ORDER BY id LIMIT ?)",
+                (session_id, field, count)
+            )
+            self._write_fields(connection, session_id, fields)
+            connection.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?", (session_id,))
+        return row[0] + 1
+
+    def delete(self, session_id: str) -> bool:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            deleted = self._delete_rows(connection, [session_id])
+        return bool(deleted)
+
+    def _delete_rows(self, connection: sqlite3.Connection, session_ids: List[str]) -> int:
+        rows = [(session_id,) for session_id in session_ids]
+        connection.executemany("DELETE FROM session_fields WHERE session_id = ?", rows)
+        connection.executemany("DELETE FROM session_list_items WHERE session_id = ?", rows)
+        return connection.executemany("DELETE FROM sessions WHERE session_id = ?", rows).rowcount
+
+    def session_ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT session_id FROM sessions")]
+
+    def expire_idle(self, max_idle_seconds: float, limit: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            expired = [
+                row[0] for row in connection.execute(
+                    "SELECT session_id FROM sessions WHERE updated_at < ? ORDER BY updated_at LIMIT ?",
+                    (time.time() - max_idle_seconds, -1 if limit is None else limit)
+                )
+            ]
+            if expired and not dry_run:
+                self._delete_rows(connection, expired)
+        return expired
+
+
+SESSION_STORE_BACKENDS = {
+    "memory": MemorySessionStore,
+    "redis": RedisSessionStore,
+    "sqlite": SQLiteSessionStore,
+}
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Build the store named by SESSION_STORE_BACKEND, falling back to memory if it is unavailable"""
+    backend = (backend or os.getenv("SESSION_STORE_BACKEND", "memory")).lower()
+    store_class = SESSION_STORE_BACKENDS.get(backend)
+    if store_class is None:
+        logger.warning(f"Unknown SESSION_STORE_BACKEND '{backend}', using memory")
+        return MemorySessionStore()
+    try:
+        store = store_class()
+        logger.info(f"Using {store.backend_name} session store")
+        return store
+    except Exception as e:
+        logger.error(f"Could not initialise {backend} session store, using memory: {e}")
+        return MemorySessionStore()
@@ -30,12 +30,12 @@ async def test_screenshot_service_from_session(session_id: str):
     """
     try:
         # Import the file manager to load session data
-        from utils.file_manager import UICodeFileManager
+        from utils.file_manager import get_file_manager
         import shutil
         import os
         
         # Initialize file manager and load session
-        file_manager = UICodeFileManager()
+        file_manager = get_file_manager()
         
         if not file_manager.session_exists(session_id):
             return {
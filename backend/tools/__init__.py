@@ -4,11 +4,20 @@ Tools package for LLM function calling capabilities
 
 from .mongodb_tools import MongoDBTools
 from .tool_utility import ToolUtility
+from .template_cache import TemplateCache, template_cache, get_template_cache
+from .async_tools import AsyncToolProxy, get_async_mongodb_tools, get_async_database_tools, get_async_ui_preview_tools
 from .tool_definitions import get_tools_for_agent, get_agent_tool_names, get_all_available_tools
 
 __all__ = [
     'MongoDBTools', 
     'ToolUtility', 
+    'TemplateCache',
+    'template_cache',
+    'get_template_cache',
+    'AsyncToolProxy',
+    'get_async_mongodb_tools',
+    'get_async_database_tools',
+    'get_async_ui_preview_tools',
     'get_tools_for_agent', 
     'get_agent_tool_names', 
     'get_all_available_tools'
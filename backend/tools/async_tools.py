@@ -0,0 +1,46 @@
+"""
+Async Tools - Awaitable access to the database tools from async handlers
+
+The tools use the shared synchronous MongoClient. AsyncToolProxy keeps their
+interfaces and runs each call on the bounded database executor, so FastAPI
+handlers and the orchestrator can await them without blocking the event loop.
+"""
+
+import functools
+from typing import Any
+
+from db import run_db
+from .mongodb_tools import MongoDBTools
+from .database_tools import DatabaseTools
+from .ui_preview_tools import UIPreviewTools
+
+
+class AsyncToolProxy:
+    """Exposes a tool's public methods as coroutines run on the database executor"""
+
+    def __init__(self, tool: Any):
+        self._tool = tool
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._tool, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args, **kwargs):
+            return await run_db(attribute, *args, **kwargs)
+
+        return call
+
+
+def get_async_mongodb_tools() -> AsyncToolProxy:
+    """Awaitable MongoDBTools"""
+    return AsyncToolProxy(MongoDBTools())
+
+def get_async_database_tools() -> AsyncToolProxy:
+    """Awaitable DatabaseTools"""
+    return AsyncToolProxy(DatabaseTools())
+
+def get_async_ui_preview_tools() -> AsyncToolProxy:
+    """Awaitable UIPreviewTools"""
+    return AsyncToolProxy(UIPreviewTools())
@@ -4,7 +4,8 @@ Database Tools - Functions for LLM to interact with MongoDB
 
 import logging
 from typing import Dict, List, Any, Optional
-from db import get_db
+from db import get_db, TEMPLATE_LISTING_PROJECTION
+from utils.category_normalizer import normalize_category
 
 class DatabaseTools:
     """Tools for database operations that can be called by LLM"""
@@ -16,33 +17,10 @@ class DatabaseTools:
     def get_templates_by_category(self, category: str, limit: int = 10) -> Dict[str, Any]:
         """Get templates for a specific category"""
         try:
-            # Normalize category name
-            category_mapping = {
-                'About': 'about',
-                'sign-up': 'signup',
-                'Sign-up': 'signup',
-                'Signup': 'signup',
-                'Login': 'login',
-                'Profile': 'profile',
-                'Landing': 'landing'
-            }
-            
-            normalized_category = category_mapping.get(category, category.lower())
-            
-            # Find templates in this category
-            possible_categories = [normalized_category]
-            for original, normalized in category_mapping.items():
-                if normalized == normalized_category:
-                    possible_categories.append(original)
-                elif original == category:
-                    possible_categories.append(normalized)
-            
-            templates = list(self.db.templates.find({
-                "$or": [
-                    {"category": {"$in": possible_categories}},
-                    {"metadata.category": {"$in": possible_categories}}
-                ]
-            }).limit(limit))
+            templates = list(self.db.templates.find(
+                {"category_key": normalize_category(category)},
+                TEMPLATE_LISTING_PROJECTION
+            ).limit(limit))
             
             # Convert ObjectId to string for JSON serialization
             for template in templates:
@@ -145,33 +123,9 @@ class DatabaseTools:
             
             # Add category filter if provided
             if category:
-                category_mapping = {
-                    'About': 'about',
-                    'sign-up': 'signup',
-                    'Sign-up': 'signup',
-                    'Signup': 'signup',
-                    'Login': 'login',
-                    'Profile': 'profile',
-                    'Landing': 'landing'
-                }
-                
-                normalized_category = category_mapping.get(category, category.lower())
-                possible_categories = [normalized_category]
-                
-                for original, normalized in category_mapping.items():
-                    if normalized == normalized_category:
-                        possible_categories.append(original)
-                    elif original == category:
-                        possible_categories.append(normalized)
-                
-                search_filter["$and"] = [{
-                    "$or": [
-                        {"category": {"$in": possible_categories}},
-                        {"metadata.category": {"$in": possible_categories}}
-                    ]
-                }]
+                search_filter["category_key"] = normalize_category(category)
             
-            templates = list(self.db.templates.find(search_filter).limit(limit))
+            templates = list(self.db.templates.find(search_filter, TEMPLATE_LISTING_PROJECTION).limit(limit))
             
             # Convert ObjectId to string for JSON serialization
             for template in templates:
@@ -229,17 +183,9 @@ class DatabaseTools:
     def get_available_categories(self) -> Dict[str, Any]:
         """Get all available template categories"""
         try:
-            # Get distinct categories
-            categories = self.db.templates.distinct("category")
-            
-            # Also check metadata.category
-            metadata_categories = self.db.templates.distinct("metadata.category")
-            
-            # Combine and deduplicate
-            all_categories = list(set(categories + metadata_categories))
-            
-            # Filter out None/empty values
-            all_categories = [cat for cat in all_categories if cat]
+            from services.category_catalog import category_catalog
+            # Canonical categories, one per spelling family
+            all_categories = category_catalog.get_categories(self.db)
             
             return {
                 "success": True,
@@ -4,7 +4,9 @@ MongoDB Tools - Functions for agents to interact with MongoDB database
 
 import logging
 from typing import Dict, List, Any, Optional
-from db import get_db
+from db import get_db, TEMPLATE_LISTING_PROJECTION
+from utils.category_normalizer import normalize_category
+from .template_cache import template_cache
 
 class MongoDBTools:
     """MongoDB tool functions that can be called by agents"""
@@ -16,33 +18,10 @@ class MongoDBTools:
     def get_templates_by_category(self, category: str, limit: int = 10) -> Dict[str, Any]:
         """Get templates filtered by category with metadata and tags"""
         try:
-            # Normalize category name
-            category_mapping = {
-                'About': 'about',
-                'sign-up': 'signup',
-                'Sign-up': 'signup',
-                'Signup': 'signup',
-                'Login': 'login',
-                'Profile': 'profile',
-                'Landing': 'landing'
-            }
-            
-            normalized_category = category_mapping.get(category, category.lower())
-            
-            # Find templates in this category
-            possible_categories = [normalized_category]
-            for original, normalized in category_mapping.items():
-                if normalized == normalized_category:
-                    possible_categories.append(original)
-                elif original == category:
-                    possible_categories.append(normalized)
-            
-            templates = list(self.db.templates.find({
-                "$or": [
-                    {"category": {"$in": possible_categories}},
-                    {"metadata.category": {"$in": possible_categories}}
-                ]
-            }).limit(limit))
+            templates = list(self.db.templates.find(
+                {"category_key": normalize_category(category)},
+                TEMPLATE_LISTING_PROJECTION
+            ).limit(limit))
             
             if not templates:
                 return {
@@ -62,7 +41,8 @@ class MongoDBTools:
                     "category": template.get('metadata', {}).get('category', template.get('category', 'unknown')),
                     "description": template.get('metadata', {}).get('description', ''),
                     "tags": template.get('tags', []),
-                    "figma_url": template.get('metadata', {}).get('figma_url', '')
+                    "figma_url": template.get('metadata', {}).get('figma_url', ''),
+                    "thumbnail_url": template.get('thumbnail_url')
                 }
                 extracted_templates.append(extracted_template)
             
@@ -84,9 +64,7 @@ class MongoDBTools:
     def get_template_metadata(self, template_id: str) -> Dict[str, Any]:
         """Get specific template's metadata and tags"""
         try:
-            from bson import ObjectId
-            
-            template = self.db.templates.find_one({"_id": ObjectId(template_id)})
+            template = template_cache.get_template(template_id, self.db)
             
             if not template:
                 return {
@@ -129,33 +107,9 @@ class MongoDBTools:
             
             # Add category filter if provided
             if category:
-                category_mapping = {
-                    'About': 'about',
-                    'sign-up': 'signup',
-                    'Sign-up': 'signup',
-                    'Signup': 'signup',
-                    'Login': 'login',
-                    'Profile': 'profile',
-                    'Landing': 'landing'
-                }
-                
-                normalized_category = category_mapping.get(category, category.lower())
-                possible_categories = [normalized_category]
-                
-                for original, normalized in category_mapping.items():
-                    if normalized == normalized_category:
-                        possible_categories.append(original)
-                    elif original == category:
-                        possible_categories.append(normalized)
-                
-                search_filter["$and"] = [{
-                    "$or": [
-                        {"category": {"$in": possible_categories}},
-                        {"metadata.category": {"$in": possible_categories}}
-                    ]
-                }]
-            
-            templates = list(self.db.templates.find(search_filter).limit(limit))
+                search_filter["category_key"] = normalize_category(category)
+            
+            templates = list(self.db.templates.find(search_filter, TEMPLATE_LISTING_PROJECTION).limit(limit))
             
             if not templates:
                 return {
@@ -176,7 +130,8 @@ class MongoDBTools:
                     "category": template.get('metadata', {}).get('category', template.get('category', 'unknown')),
                     "description": template.get('metadata', {}).get('description', ''),
                     "tags": template.get('tags', []),
-                    "figma_url": template.get('metadata', {}).get('figma_url', '')
+                    "figma_url": template.get('metadata', {}).get('figma_url', ''),
+                    "thumbnail_url": template.get('thumbnail_url')
                 }
                 extracted_templates.append(extracted_template)
             
@@ -199,17 +154,9 @@ class MongoDBTools:
     def get_available_categories(self) -> Dict[str, Any]:
         """Get all available template categories"""
         try:
-            # Get distinct categories
-            categories = self.db.templates.distinct("category")
-            
-            # Also check metadata.category
-            metadata_categories = self.db.templates.distinct("metadata.category")
-            
-            # Combine and deduplicate
-            all_categories = list(set(categories + metadata_categories))
-            
-            # Filter out None/empty values
-            all_categories = [cat for cat in all_categories if cat]
+            from services.category_catalog import category_catalog
+            # Canonical categories, one per spelling family
+            all_categories = category_catalog.get_categories(self.db)
             
             return {
                 "success": True,
@@ -228,9 +175,7 @@ class MongoDBTools:
     def _get_available_categories(self) -> List[str]:
         """Helper method to get available categories as a list"""
         try:
-            categories = self.db.templates.distinct("category")
-            metadata_categories = self.db.templates.distinct("metadata.category")
-            all_categories = list(set(categories + metadata_categories))
-            return [cat for cat in all_categories if cat]
+            from services.category_catalog import category_catalog
+            return category_catalog.get_categories(self.db)
         except:
             return ["landing", "login", "signup", "profile", "about"] 
\ No newline at end of file
@@ -16,7 +16,7 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER
 import logging
 
-from utils.file_manager import UICodeFileManager
+from utils.file_manager import get_file_manager
 
 logger = logging.getLogger(__name__)
 
@@ -45,8 +45,7 @@ class ReportGenerator:
         return pdf_filepath
 
     def _load_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
-        base_dir = os.path.join(os.getcwd(), "temp_ui_files")
-        fm = UICodeFileManager(base_dir=base_dir)
+        fm = get_file_manager()
         return fm.load_session(session_id)
 
     def _ensure_latest_screenshot(self, session_id: str) -> Optional[str]:
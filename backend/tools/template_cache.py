@@ -0,0 +1,244 @@
+"""
+Template Cache - Process-level cache for full template documents
+
+Template documents carry large html_export / CSS strings and the same few
+templates are fetched over and over across sessions. This cache keeps them in
+memory, bounded by an approximate byte budget with LRU eviction. Entries are
+invalidated from a MongoDB change stream, or by polling the version fields
+(updated_at / version) when change streams are not available (e.g. a
+standalone mongod that is not part of a replica set).
+"""
+
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Server error codes meaning "change streams are not supported here"
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573, 40324, 136}
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a template document in bytes"""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key)) + _estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_size(item) for item in value)
+    return 16
+
+
+class TemplateCache:
+    """Byte-bounded LRU cache of template documents with change invalidation"""
+
+    def __init__(self, max_bytes: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.max_bytes = max_bytes or int(os.getenv("TEMPLATE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.poll_interval = poll_interval or float(os.getenv("TEMPLATE_CACHE_POLL_SECONDS", "30"))
+        self.enabled = os.getenv("TEMPLATE_CACHE_ENABLED", "true").lower() != "false"
+
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._mode = "idle"
+
+        self.catalog_version = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_template(self, template_id: str, db=None) -> Optional[Dict[str, Any]]:
+        """Get a full template document, reading through to MongoDB on a miss"""
+        key = str(template_id)
+        if self.enabled:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+            if entry is not None:
+                # Callers edit nested fields (template_info, codes); never hand out the cached objects
+                return copy.deepcopy(entry[0])
+
+        database = db if db is not None else get_db()
+        # An invalidation landing during the read means the document may already be stale
+        version = self.catalog_version
+        template = database.templates.find_one({"_id": ObjectId(template_id)})
+        if template is None:
+            return None
+
+        if self.enabled:
+            self._ensure_watcher(database)
+            self._store(key, template, version)
+        return copy.deepcopy(template)
+
+    def _store(self, key: str, template: Dict[str, Any], version: Optional[int] = None):
+        size = _estimate_size(template)
+        if size > self.max_bytes:
+            logger.info(f"Template {key} ({size} bytes) exceeds cache budget, not caching")
+            return
+
+        with self._lock:
+            if version is not None and version != self.catalog_version:
+                logger.debug(f"Templates changed while {key} was read, not caching")
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= previous[1]
+            self._entries[key] = (template, size)
+            self._current_bytes += size
+
+            while self._current_bytes > self.max_bytes and self._entries:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self.stats["evictions"] += 1
+                logger.debug(f"Evicted template {evicted_key} from cache ({evicted_size} bytes)")
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """Drop one template (or everything when template_id is None) and bump the catalog version"""
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+                self._current_bytes = 0
+            else:
+                entry = self._entries.pop(str(template_id), None)
+                if entry is not None:
+                    self._current_bytes -= entry[1]
+            self.catalog_version += 1
+            self.stats["invalidations"] += 1
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(template_id)
+            except Exception as e:
+                logger.error(f"Template cache listener failed: {e}")
+
+    def add_invalidation_listener(self, listener: Callable[[Optional[str]], None]):
+        """Register a callback fired with the template id (or None) whenever templates change"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def start_watcher(self, db=None):
+        """Start following template changes now, rather than on the first read"""
+        if self.enabled:
+            self._ensure_watcher(db if db is not None else get_db())
+
+    def _ensure_watcher(self, database):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop_event.clear()
+            self._watcher = threading.Thread(
+                target=self._watch_loop, args=(database,), name="template-cache-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def stop(self):
+        """Stop the background watcher"""
+        self._stop_event.set()
+
+    def _watch_loop(self, database):
+        """Follow the change stream, falling back to version polling"""
+        while not self._stop_event.is_set():
+            if self._mode != "polling":
+                try:
+                    self._mode = "change_stream"
+                    self._follow_change_stream(database)
+                except OperationFailure as e:
+                    if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                        logger.info("Change streams unavailable, polling template versions instead")
+                        self._mode = "polling"
+                    else:
+                        logger.warning(f"Template change stream failed: {e}")
+                        self.invalidate()
+                        self._stop_event.wait(self.poll_interval)
+                except PyMongoError as e:
+                    # Events may have been missed while disconnected
+                    logger.warning(f"Template change stream interrupted: {e}")
+                    self.invalidate()
+                    self._stop_event.wait(self.poll_interval)
+            else:
+                self._poll_versions(database)
+
+    def _follow_change_stream(self, database):
+        with database.templates.watch() as stream:
+            while not self._stop_event.is_set():
+                change = stream.try_next()
+                if change is None:
+                    self._stop_event.wait(1.0)
+                    continue
+                operation = change.get("operationType")
+                if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                    self.invalidate()
+                else:
+                    document_id = change.get("documentKey", {}).get("_id")
+                    self.invalidate(str(document_id) if document_id is not None else None)
+
+    def _poll_versions(self, database):
+        """Compare (updated_at, version) signatures of all templates on an interval"""
+        signatures: Dict[str, Any] = {}
+        while not self._stop_event.is_set():
+            try:
+                current = {
+                    str(doc["_id"]): (doc.get("updated_at"), doc.get("version"))
+                    for doc in database.templates.find({}, {"_id": 1, "updated_at": 1, "version": 1})
+                }
+                if signatures:
+                    changed = [
+                        template_id for template_id, signature in current.items()
+                        if signatures.get(template_id) != signature
+                    ]
+                    removed = [template_id for template_id in signatures if template_id not in current]
+                    for template_id in changed + removed:
+                        self.invalidate(template_id)
+                signatures = current
+            except PyMongoError as e:
+                logger.warning(f"Template version poll failed: {e}")
+                self.invalidate()
+                signatures = {}
+            self._stop_event.wait(self.poll_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "catalog_version": self.catalog_version,
+                "invalidation_mode": self._mode,
+            }
+
+
+# Global instance
+template_cache = TemplateCache()
+
+def get_template_cache() -> TemplateCache:
+    """Get the template cache instance"""
+    return template_cache
@@ -7,7 +7,7 @@ import base64
 import json
 from typing import Dict, List, Any, Optional
 from db import get_db
-from bson import ObjectId
+from .template_cache import template_cache
 
 class UIPreviewTools:
     """UI Preview tool functions that can be called by agents"""
@@ -20,7 +20,7 @@ class UIPreviewTools:
         """Generate a complete UI preview from template code"""
         try:
             # Get template from database
-            template = self.db.templates.find_one({"_id": ObjectId(template_id)})
+            template = template_cache.get_template(template_id, self.db)
             
             if not template:
                 return {
@@ -165,7 +165,7 @@ class UIPreviewTools:
     def get_template_code(self, template_id: str) -> Dict[str, Any]:
         """Get raw template code files"""
         try:
-            template = self.db.templates.find_one({"_id": ObjectId(template_id)})
+            template = template_cache.get_template(template_id, self.db)
             
             if not template:
                 return {
@@ -193,7 +193,7 @@ class UIPreviewTools:
     def validate_template_code(self, template_id: str) -> Dict[str, Any]:
         """Validate that template has all required code files"""
         try:
-            template = self.db.templates.find_one({"_id": ObjectId(template_id)})
+            template = template_cache.get_template(template_id, self.db)
             
             if not template:
                 return {
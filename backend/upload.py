@@ -2,6 +2,7 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from datetime import datetime
+from utils.category_normalizer import apply_category_key
 
 load_dotenv()
 
@@ -45,6 +46,8 @@ templates = [
 ]
 
 if __name__ == "__main__":
+    for template in templates:
+        apply_category_key(template)
     result = db.templates.insert_many(templates)
     print(f"Inserted {len(result.inserted_ids)} templates.")
     for _id in result.inserted_ids:
@@ -0,0 +1,97 @@
+"""
+Category Normalizer - Single source of truth for template category names
+
+Templates were uploaded with inconsistent category spellings ("sign-up",
+"Signup", "About me", ...) in either `category` or `metadata.category`.
+Every template document gets a canonical `category_key` written on insert
+and update so queries can match one indexed field with equality.
+"""
+
+import logging
+import re
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower-cased, separator-collapsed spelling -> canonical key
+CATEGORY_ALIASES = {
+    "signup": "signup",
+    "sign up": "signup",
+    "register": "signup",
+    "registration": "signup",
+    "login": "login",
+    "log in": "login",
+    "signin": "login",
+    "sign in": "login",
+    "profile": "profile",
+    "about": "about",
+    "about me": "about",
+    "about us": "about",
+    "landing": "landing",
+    "landing page": "landing",
+    "home": "landing",
+}
+
+
+def normalize_category(category: Optional[str]) -> Optional[str]:
+    """Map any spelling of a category to its canonical key"""
+    if not category or not isinstance(category, str):
+        return None
+    collapsed = re.sub(r"[\s_-]+", " ", category.strip().lower())
+    if not collapsed:
+        return None
+    if collapsed in CATEGORY_ALIASES:
+        return CATEGORY_ALIASES[collapsed]
+    return CATEGORY_ALIASES.get(collapsed.replace(" ", ""), collapsed.replace(" ", "-"))
+
+
+def compute_category_key(template: Dict[str, Any]) -> Optional[str]:
+    """Compute the canonical key of a template document (metadata.category wins)"""
+    metadata = template.get("metadata") or {}
+    return normalize_category(metadata.get("category")) or normalize_category(template.get("category"))
+
+
+def apply_category_key(template: Dict[str, Any]) -> Dict[str, Any]:
+    """Set category_key on a template document in place and return it"""
+    template["category_key"] = compute_category_key(template)
+    return template
+
+
+def touches_category(updates: Dict[str, Any]) -> bool:
+    """Whether a $set payload can change the category_key of a template"""
+    return any(field in updates for field in ("category", "metadata", "metadata.category"))
+
+
+def category_key_for_update(updates: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Derive category_key from a $set payload applied to the current category fields"""
+    current = current or {}
+    merged = {"category": current.get("category"), "metadata": dict(current.get("metadata") or {})}
+    if "category" in updates:
+        merged["category"] = updates["category"]
+    if "metadata" in updates:
+        merged["metadata"] = dict(updates["metadata"] or {})
+    if "metadata.category" in updates:
+        merged["metadata"]["category"] = updates["metadata.category"]
+    return compute_category_key(merged)
+
+
+def backfill_category_keys(database, batch_size: int = 500) -> int:
+    """One-time migration: set category_key on templates that do not have it yet"""
+    from pymongo import UpdateOne
+
+    updated = 0
+    batch = []
+    cursor = database.templates.find(
+        {"category_key": {"$exists": False}},
+        {"category": 1, "metadata.category": 1}
+    )
+    for template in cursor:
+        batch.append(UpdateOne({"_id": template["_id"]}, {"$set": {"category_key": compute_category_key(template)}}))
+        if len(batch) >= batch_size:
+            updated += database.templates.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += database.templates.bulk_write(batch, ordered=False).modified_count
+    if updated:
+        logger.info(f"Backfilled category_key on {updated} templates")
+    return updated
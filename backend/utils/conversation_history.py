@@ -0,0 +1,218 @@
+"""
+Conversation History - Bounded per-session history with a rolling summary
+
+Sessions keep their most recent CONVERSATION_WINDOW_MESSAGES messages verbatim
+in conversation_history. Once the list grows CONVERSATION_SUMMARY_BATCH
+messages past the window, a background worker folds the oldest ones into
+conversation_summary (incrementally: previous summary + the new messages) and
+trims them from the store, so neither the request path nor per-session memory
+grows with the length of the conversation. Agents read history through
+get_history_slice / format_for_prompt, which fit the summary and the newest
+messages into a token budget.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.prompt_compressor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELD = "conversation_summary"
+SUMMARIZED_COUNT_FIELD = "summarized_message_count"
+
+
+class ConversationHistoryManager:
+    """Windows conversation history and summarises older turns off the request path"""
+
+    def __init__(self):
+        self.window_messages = int(os.getenv("CONVERSATION_WINDOW_MESSAGES", "20"))
+        self.summary_batch = int(os.getenv("CONVERSATION_SUMMARY_BATCH", "10"))
+        self.summary_max_chars = int(os.getenv("CONVERSATION_SUMMARY_MAX_CHARS", "4000"))
+        self.prompt_tokens = int(os.getenv("CONVERSATION_PROMPT_TOKENS", "800"))
+        mode = os.getenv("CONVERSATION_SUMMARY_MODE", "llm" if os.getenv("ANTHROPIC_API_KEY") else "extractive")
+        self.summary_mode = mode.lower()
+        self.model = os.getenv("CONVERSATION_SUMMARY_MODEL", "claude-3-5-haiku-20241022")
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._client = None
+        self.stats = {"compactions": 0, "messages_summarized": 0, "conflicts": 0, "llm_failures": 0}
+
+    # ------------------------------------------------------------------
+    # Windowing
+    # ------------------------------------------------------------------
+
+    def needs_compaction(self, history_length: int) -> bool:
+        return self.window_messages > 0 and history_length >= self.window_messages + self.summary_batch
+
+    def maybe_schedule(self, session_id: str, history_length: int):
+        """Queue a background compaction once the history is a full batch past the window"""
+        if not self.needs_compaction(history_length):
+            return
+        with self._lock:
+            if session_id in self._scheduled:
+                return
+            self._scheduled.add(session_id)
+        self._executor.submit(self._run_compaction, session_id)
+
+    def _run_compaction(self, session_id: str):
+        try:
+            self.compact(session_id)
+        except Exception as e:
+            logger.error(f"History compaction failed for session {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._scheduled.discard(session_id)
+
+    def compact(self, session_id: str) -> int:
+        """Fold the messages older than the window into the summary; returns how many were folded"""
+        from session_manager import session_manager
+        from session_store import SessionTrimConflict
+
+        loaded = session_manager.load_session(session_id)
+        if not loaded:
+            return 0
+        state = loaded[0]
+        history = state.get("conversation_history", [])
+        overflow = len(history) - self.window_messages
+        if overflow <= 0:
+            return 0
+
+        folded = history[:overflow]
+        summary = self._summarize(state.get(SUMMARY_FIELD, ""), folded)
+        try:
+            # Conditional on the folded prefix and the summary fields only: the request that
+            # scheduled this keeps saving other fields meanwhile, and appended messages are kept
+            session_manager.trim_history(session_id, folded, {
+                SUMMARY_FIELD: summary,
+                SUMMARIZED_COUNT_FIELD: state.get(SUMMARIZED_COUNT_FIELD, 0) + overflow,
+            }, {
+                SUMMARY_FIELD: state.get(SUMMARY_FIELD),
+                SUMMARIZED_COUNT_FIELD: state.get(SUMMARIZED_COUNT_FIELD),
+            })
+        except SessionTrimConflict:
+            # History was replaced or summarised by someone else; the next message schedules another attempt
+            self.stats["conflicts"] += 1
+            return 0
+        except KeyError:
+            return 0
+
+        self.stats["compactions"] += 1
+        self.stats["messages_summarized"] += overflow
+        logger.info(f"Summarised {overflow} older messages of session {session_id}")
+        return overflow
+
+    # ------------------------------------------------------------------
+    # Summarisation
+    # ------------------------------------------------------------------
+
+    def _summarize(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        if self.summary_mode == "llm":
+            try:
+                return self._summarize_with_llm(previous_summary, messages)
+            except Exception as e:
+                self.stats["llm_failures"] += 1
+                logger.warning(f"LLM history summary failed, using extractive summary: {e}")
+        return self._summarize_extractive(previous_summary, messages)
+
+    def _summarize_with_llm(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        if self._client is None:
+            from anthropic import Anthropic
+            self._client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+        prompt = f"""Update the running summary of a conversation between a user and a UI mockup assistant.
+
+CURRENT SUMMARY:
+{previous_summary or "(none)"}
+
+NEW MESSAGES:
+{self._render_messages(messages)}
+
+Keep every decision, requirement, selected template and requested change; drop greetings and repetition.
+Respond with ONLY the updated summary, at most {self.summary_max_chars} characters."""
+
+        response = self._client.messages.create(
+            model=self.model,
+            max_tokens=max(256, self.summary_max_chars // 3),
+            messages=[{"role": "user", "content": prompt}]
+        )
+        text = "".join(block.text for block in response.content if getattr(block, "text", None)).strip()
+        if not text:
+            raise ValueError("empty summary")
+        return text[-self.summary_max_chars:]
+
+    def _summarize_extractive(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        """First line of each message, oldest lines dropped once the summary is full"""
+        lines = [line for line in (previous_summary or "").splitlines() if line.strip()]
+        for message in messages:
+            first_line = str(message.get("content", "")).strip().split("\n", 1)[0][:200]
+            if first_line:
+                lines.append(f"- {message.get('role', 'user')}: {first_line}")
+        while lines and len("\n".join(lines)) > self.summary_max_chars:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    # ------------------------------------------------------------------
+    # Token-budgeted slices for agents
+    # ------------------------------------------------------------------
+
+    def get_history_slice(self, session_state: Dict[str, Any], max_tokens: Optional[int] = None,
+                          skip_latest: int = 0) -> List[Dict[str, Any]]:
+        """Newest messages that fit max_tokens, preceded by the summary when it still fits"""
+        max_tokens = self.prompt_tokens if max_tokens is None else max_tokens
+        history = session_state.get("conversation_history", [])
+        if skip_latest:
+            history = history[:-skip_latest]
+
+        selected, used = [], 0
+        for message in reversed(history):
+            cost = estimate_tokens(str(message.get("content", ""))) + 4
+            if used + cost > max_tokens:
+                break
+            selected.append(message)
+            used += cost
+        selected.reverse()
+
+        summary = session_state.get(SUMMARY_FIELD)
+        older_dropped = len(selected) < len(history)
+        if summary and not older_dropped and used + estimate_tokens(summary) <= max_tokens:
+            selected.insert(0, {
+                "role": "summary",
+                "content": summary,
+                "timestamp": session_state.get("created_at", datetime.now().isoformat())
+            })
+        return selected
+
+    def format_for_prompt(self, session_state: Dict[str, Any], max_tokens: Optional[int] = None, skip_latest: int = 0) -> str:
+        """History slice rendered as plain text for an LLM prompt"""
+        return self._render_messages(self.get_history_slice(session_state, max_tokens, skip_latest))
+
+    def _render_messages(self, messages: List[Dict[str, Any]]) -> str:
+        return "\n".join(
+            f"[Earlier conversation summary]\n{message['content']}" if message.get("role") == "summary"
+            else f"{message.get('role', 'user').upper()}: {message.get('content', '')}"
+            for message in messages
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "window_messages": self.window_messages,
+            "summary_batch": self.summary_batch,
+            "summary_mode": self.summary_mode,
+            "pending": len(self._scheduled),
+        }
+
+
+# Global instance
+conversation_history = ConversationHistoryManager()
+
+def get_conversation_history_manager() -> ConversationHistoryManager:
+    """Get the conversation history manager instance"""
+    return conversation_history
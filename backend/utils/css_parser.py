@@ -0,0 +1,211 @@
+"""
+Minimal CSS parser used by the prompt compressor and the dead-CSS pruner.
+
+It only understands the structure the tools need: top-level statements,
+style rules and at-rules, with nested rule lists for grouping at-rules such
+as @media and @supports. Rule bodies are kept verbatim, and every node records
+its [start, end) span in the source so callers can edit the original text
+instead of re-serializing it.
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+# At-rules whose block contains further style rules
+GROUPING_AT_RULES = ("@media", "@supports", "@document", "@layer", "@container", "@-moz-document")
+
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+
+def strip_comments(css: str) -> str:
+    """Remove /* ... */ comments"""
+    return COMMENT_PATTERN.sub("", css or "")
+
+
+def _blank_comments(css: str) -> str:
+    """Replace comments with spaces (keeping newlines) so offsets still match the source"""
+    return COMMENT_PATTERN.sub(lambda match: re.sub(r"[^\n]", " ", match.group(0)), css or "")
+
+
+def _find_block_end(css: str, start: int, limit: int) -> int:
+    """Return the index of the '}' closing the block opened just before start"""
+    depth = 1
+    index = start
+    quote = None
+    while index < limit:
+        char = css[index]
+        if quote:
+            if char == "\\":
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    return limit
+
+
+def parse_css(css: str) -> List[Dict[str, Any]]:
+    """Parse CSS into a list of nodes.
+
+    Node types:
+      {"type": "statement", "text": "@import url(x.css)"}
+      {"type": "rule", "selector": ".a, .b", "body": "color: red;"}
+      {"type": "at_rule", "prelude": "@font-face", "body": "..."}
+      {"type": "group", "prelude": "@media (max-width: 600px)", "children": [...]}
+
+    Every node also has "start" and "end" offsets into css; groups add
+    "body_start" and "body_end" for the text between their braces.
+    """
+    css = _blank_comments(css)
+    return _parse_range(css, 0, len(css))
+
+
+def _span_start(css: str, start: int, end: int) -> int:
+    while start < end and css[start].isspace():
+        start += 1
+    return start
+
+
+def _parse_range(css: str, start: int, limit: int) -> List[Dict[str, Any]]:
+    nodes: List[Dict[str, Any]] = []
+    index = start
+    quote = None
+    prelude_start = start
+
+    while index < limit:
+        char = css[index]
+        if quote:
+            if char == "\\":
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == ";":
+            text = css[prelude_start:index].strip()
+            if text:
+                nodes.append({"type": "statement", "text": text,
+                              "start": _span_start(css, prelude_start, index), "end": index + 1})
+            prelude_start = index + 1
+        elif char == "{":
+            prelude = css[prelude_start:index].strip()
+            end = _find_block_end(css, index + 1, limit)
+            body = css[index + 1:end]
+            span = {"start": _span_start(css, prelude_start, index), "end": min(end + 1, limit)}
+            if prelude.lower().startswith(GROUPING_AT_RULES):
+                nodes.append({"type": "group", "prelude": prelude, "children": _parse_range(css, index + 1, end),
+                              "body_start": index + 1, "body_end": end, **span})
+            elif prelude.startswith("@"):
+                nodes.append({"type": "at_rule", "prelude": prelude, "body": body.strip(), **span})
+            elif prelude:
+                nodes.append({"type": "rule", "selector": prelude, "body": body.strip(), **span})
+            index = end
+            prelude_start = end + 1
+        elif char == "}":
+            # Stray closing brace, skip it
+            prelude_start = index + 1
+        index += 1
+
+    trailing = css[prelude_start:limit].strip()
+    if trailing:
+        trailing_start = _span_start(css, prelude_start, limit)
+        nodes.append({"type": "statement", "text": trailing, "start": trailing_start,
+                      "end": trailing_start + len(trailing)})
+    return nodes
+
+
+def extend_to_line_end(css: str, end: int) -> int:
+    """Extend a span end over trailing spaces and one newline, so removing it leaves no blank line"""
+    while end < len(css) and css[end] in " \t":
+        end += 1
+    if end < len(css) and css[end] == "\n":
+        end += 1
+    return end
+
+
+def apply_edits(css: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply (start, end, replacement) edits; edits at the same position keep their list order"""
+    ordered = sorted(enumerate(edits), key=lambda item: (item[1][0], item[1][1], item[0]), reverse=True)
+    for _, (start, end, text) in ordered:
+        css = css[:start] + text + css[end:]
+    return css
+
+
+def split_declarations(body: str) -> List[Tuple[str, str]]:
+    """Split a declaration block into (property, value) pairs"""
+    declarations = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, char in enumerate(body + ";"):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif char == ";" and depth == 0:
+            declaration = body[start:index].strip()
+            start = index + 1
+            if not declaration:
+                continue
+            if ":" in declaration:
+                prop, value = declaration.split(":", 1)
+                declarations.append((prop.strip(), value.strip()))
+            else:
+                declarations.append((declaration, ""))
+    return declarations
+
+
+def join_declarations(declarations: List[Tuple[str, str]], minify: bool = True) -> str:
+    """Turn (property, value) pairs back into a declaration block"""
+    if minify:
+        return ";".join(f"{prop}:{value}" if value else prop for prop, value in declarations)
+    return "\n".join(f"  {prop}: {value};" if value else f"  {prop};" for prop, value in declarations)
+
+
+def serialize_css(nodes: List[Dict[str, Any]], minify: bool = True) -> str:
+    """Serialize parsed nodes back into CSS"""
+    parts = []
+    for node in nodes:
+        node_type = node["type"]
+        if node_type == "statement":
+            parts.append(f"{node['text']};")
+        elif node_type == "rule":
+            body = join_declarations(split_declarations(node["body"]), minify)
+            if minify:
+                parts.append(f"{_collapse(node['selector'])}{{{body}}}")
+            else:
+                parts.append(f"{_collapse(node['selector'])} {{\n{body}\n}}")
+        elif node_type == "at_rule":
+            if minify:
+                parts.append(f"{_collapse(node['prelude'])}{{{_collapse(node['body'])}}}")
+            else:
+                parts.append(f"{_collapse(node['prelude'])} {{\n  {node['body']}\n}}")
+        elif node_type == "group":
+            inner = serialize_css(node["children"], minify)
+            if minify:
+                parts.append(f"{_collapse(node['prelude'])}{{{inner}}}")
+            else:
+                indented = "\n".join(f"  {line}" if line else line for line in inner.split("\n"))
+                parts.append(f"{_collapse(node['prelude'])} {{\n{indented}\n}}")
+    return "\n".join(parts) if minify else "\n\n".join(parts)
+
+
+def _collapse(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def format_css(css: str) -> str:
+    """Pretty-print CSS (one declaration per line)"""
+    return serialize_css(parse_css(css), minify=False) + "\n"
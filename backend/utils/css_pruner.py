@@ -0,0 +1,412 @@
+"""
+CSS Pruner - Removes style rules whose selectors cannot match the session HTML
+
+Exported templates ship stylesheets with many selectors that match nothing in
+index.html. The analysis is deliberately conservative: a compound selector is
+considered matching when a single element carries all of its tag, id, class
+and attribute requirements, combinators and pseudo-classes are ignored, and
+anything the analyzer does not understand is kept. Class names that appear in
+string literals of scripts or inline event handlers are treated as present on
+every element, since scripts may toggle them at runtime. Unused rules are cut
+out of the original text, so comments and formatting of the kept rules stay as
+they were. Each run of set-aside rules is preceded by a marker comment naming
+the rule it followed, so restore() can put rules back at their original
+position (and cascade order) once the HTML starts using them.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .css_parser import apply_edits, extend_to_line_end, parse_css, serialize_css
+
+logger = logging.getLogger(__name__)
+
+# Selectors that apply to the document shell the screenshot service adds
+ALWAYS_KEEP_TAGS = {"html", "body", ":root"}
+
+PSEUDO_PATTERN = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+COMBINATOR_PATTERN = re.compile(r"\s*[>+~]\s*|\s+")
+STRING_LITERAL_PATTERN = re.compile(r"""(["'`])((?:(?!\1)[^\\\n]|\\.)*)\1""")
+IDENTIFIER_PATTERN = re.compile(r"-?[_a-zA-Z][\w-]*")
+# /* set-aside-after: {"groups": ["@media (...)", ...], "after": "<selector>" | ""} */
+ANCHOR_PATTERN = re.compile(r"/\* set-aside-after: (\{.*?\}) \*/\n?")
+COMPOUND_PATTERN = re.compile(r"(?P<kind>[.#]?)(?P<name>-?[_a-zA-Z][\w-]*)|\[(?P<attr>[^\]=~|^$*\s]+)[^\]]*\]")
+
+
+class _ElementCollector(HTMLParser):
+    """Collects (tag, id, classes, attribute names) for every element"""
+
+    def __init__(self):
+        super().__init__()
+        self.elements: List[Tuple[str, Optional[str], Set[str], Set[str]]] = []
+        self.script_classes: Set[str] = set()
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        element_id = None
+        classes: Set[str] = set()
+        attribute_names: Set[str] = set()
+        for name, value in attrs:
+            attribute_names.add(name)
+            if name == "id" and value:
+                element_id = value
+            elif name == "class" and value:
+                classes.update(value.split())
+            elif name.startswith("on") and value:
+                self._collect_script_classes(value)
+        self.elements.append((tag.lower(), element_id, classes, attribute_names))
+        if tag.lower() == "script":
+            self._in_script = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self._in_script = False
+
+    def handle_endtag(self, tag):
+        if tag.lower() == "script":
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._in_script:
+            self._collect_script_classes(data)
+
+    def _collect_script_classes(self, code: str):
+        for match in STRING_LITERAL_PATTERN.finditer(code):
+            self.script_classes.update(IDENTIFIER_PATTERN.findall(match.group(2)))
+
+
+class CSSPruner:
+    """Computes which CSS rules match a document and sets the rest aside"""
+
+    def __init__(self, max_cache_entries: int = 128):
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.template_stats: Dict[str, Dict[str, Any]] = {}
+
+    def prune(self, html_content: str, css_content: str, template_id: Optional[str] = None) -> Dict[str, Any]:
+        """Split css_content into rules used by html_content and unused rules.
+
+        Returns {"css", "removed_css", "stats"}; results are cached per content hash.
+        """
+        cache_key = hashlib.sha256(f"{html_content}\0{css_content}".encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                result = {**cached, "stats": {**cached["stats"], "cache_hit": True}}
+                if template_id:
+                    self.template_stats[template_id] = result["stats"]
+                return result
+
+        result = self._prune(html_content or "", css_content or "")
+
+        with self._lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+            if template_id:
+                self.template_stats[template_id] = result["stats"]
+        return result
+
+    def _prune(self, html_content: str, css_content: str) -> Dict[str, Any]:
+        if not css_content.strip():
+            return {"css": css_content, "removed_css": "", "stats": self._stats(css_content, css_content, 0, 0)}
+
+        collector = _ElementCollector()
+        try:
+            collector.feed(html_content)
+        except Exception as e:
+            logger.warning(f"HTML parsing failed, keeping all CSS: {e}")
+            return {"css": css_content, "removed_css": "", "stats": self._stats(css_content, css_content, 0, 0)}
+
+        try:
+            nodes = parse_css(css_content)
+        except Exception as e:
+            logger.warning(f"CSS parsing failed, keeping all CSS: {e}")
+            return {"css": css_content, "removed_css": "", "stats": self._stats(css_content, css_content, 0, 0)}
+
+        elements = collector.elements
+        if collector.script_classes:
+            elements = [(tag, element_id, classes | collector.script_classes, attributes)
+                        for tag, element_id, classes, attributes in elements]
+
+        counters = {"total": 0, "removed": 0}
+        spans: List[Tuple[int, int]] = []
+        chunks: List[str] = []
+        self._partition(nodes, elements, counters, spans, chunks, [])
+        kept_css = apply_edits(css_content, [(*_line_span(css_content, start, end), "") for start, end in spans])
+        removed_css = "\n".join(chunks)
+        return {
+            "css": kept_css,
+            "removed_css": removed_css,
+            "stats": self._stats(css_content, kept_css, counters["total"], counters["removed"]),
+        }
+
+    def restore(self, html_content: str, css_content: str, set_aside_css: str) -> Tuple[str, int]:
+        """Put set-aside rules that now match html_content back into css_content.
+
+        Rules go back after the rule they originally followed (appended when it is gone,
+        or for set-aside text without markers). Rules whose selector, within the same
+        @-group, is already in css_content are skipped, so an edited copy is never
+        overridden. Returns (css, rules restored).
+        """
+        if not set_aside_css or not set_aside_css.strip():
+            return css_content, 0
+        css_content = css_content or ""
+        try:
+            current = parse_css(css_content)
+            present = self._selectors(current, "")
+            edits: List[Tuple[int, int, str]] = []
+            count = 0
+            for anchor, chunk in self._split_chunks(set_aside_css):
+                matching = self.prune(html_content, chunk)
+                if matching["stats"]["rules_total"] == matching["stats"]["rules_removed"]:
+                    continue
+                restored = self._missing(parse_css(matching["css"]), present, "")
+                for node in restored:
+                    count += len(node["children"]) if node["type"] == "group" else 1
+                    edits.append(self._insertion(css_content, current, node, anchor))
+        except Exception as e:
+            logger.warning(f"Could not restore set-aside CSS rules: {e}")
+            return css_content, 0
+        if not count:
+            return css_content, 0
+        return apply_edits(css_content, edits), count
+
+    def _split_chunks(self, set_aside_css: str) -> List[Tuple[Optional[Dict[str, Any]], str]]:
+        """(anchor, css) runs of set-aside text; text before the first marker has no anchor"""
+        chunks = []
+        position = 0
+        anchor = None
+        for match in ANCHOR_PATTERN.finditer(set_aside_css):
+            chunks.append((anchor, set_aside_css[position:match.start()]))
+            try:
+                anchor = json.loads(match.group(1))
+            except json.JSONDecodeError:
+                anchor = None
+            position = match.end()
+        chunks.append((anchor, set_aside_css[position:]))
+        return [(anchor, chunk) for anchor, chunk in chunks if chunk.strip()]
+
+    def _insertion(self, css: str, current: List[Dict[str, Any]], node: Dict[str, Any],
+                   anchor: Optional[Dict[str, Any]]) -> Tuple[int, int, str]:
+        """Edit inserting node after its anchor rule, or at the end of the deepest surviving @-group"""
+        groups = anchor.get("groups", []) if anchor else []
+        level, level_start, level_end = current, 0, len(css)
+        depth = 0
+        for prelude in groups:
+            group = next((candidate for candidate in level if candidate["type"] == "group"
+                          and _collapse(candidate["prelude"]) == prelude), None)
+            if group is None:
+                break
+            level, level_start, level_end = group["children"], group["body_start"], group["body_end"]
+            depth += 1
+        # The set-aside chunk is wrapped in its group path; drop the wrappers that already exist
+        nodes = [node]
+        for _ in range(depth):
+            nodes = nodes[0]["children"]
+        after = anchor.get("after") if anchor and depth == len(groups) else None
+        return self._insert_at(css, level, level_start, level_end, after, serialize_css(nodes, minify=False), depth)
+
+    def _insert_at(self, css: str, level: List[Dict[str, Any]], level_start: int, level_end: int,
+                   after: Optional[str], text: str, depth: int) -> Tuple[int, int, str]:
+        indent = "  " * depth
+        text = "\n".join(f"{indent}{line}" if line else line for line in text.split("\n"))
+        if after == "" and level:
+            # It was the first rule of its level
+            position = level[0]["start"]
+            line_start = _line_start(css, position)
+            lead = css[line_start:position] if line_start < position or position == 0 or css[position - 1] == "\n" else " "
+            return (position, position, f"{text.lstrip()}\n\n{lead}")
+        target = next((node for node in level if after is not None and _node_name(node) == after), None)
+        if target is not None:
+            return (target["end"], target["end"], f"\n\n{indent}{text.lstrip()}")
+        # Anchor gone or unknown: append at the end of the level
+        if depth:
+            body = css[level_start:level_end]
+            position = level_start + len(body.rstrip())
+            return (position, position, f"\n{text}")
+        separator = "" if not css or css.endswith("\n") else "\n"
+        return (level_end, level_end, f"{separator}{text}\n")
+
+    def _selectors(self, nodes: List[Dict[str, Any]], context: str) -> Set[Tuple[str, str]]:
+        selectors: Set[Tuple[str, str]] = set()
+        for node in nodes:
+            if node["type"] == "rule":
+                selectors.add((context, " ".join(node["selector"].split())))
+            elif node["type"] == "group":
+                selectors |= self._selectors(node["children"], " ".join(node["prelude"].split()))
+        return selectors
+
+    def _missing(self, nodes: List[Dict[str, Any]], present: Set[Tuple[str, str]], context: str) -> List[Dict[str, Any]]:
+        missing = []
+        for node in nodes:
+            if node["type"] == "rule" and (context, " ".join(node["selector"].split())) not in present:
+                missing.append(node)
+            elif node["type"] == "group":
+                children = self._missing(node["children"], present, " ".join(node["prelude"].split()))
+                if children:
+                    missing.append({**node, "children": children})
+        return missing
+
+    def _partition(self, nodes: List[Dict[str, Any]], elements, counters, spans: List[Tuple[int, int]],
+                   chunks: List[str], groups: List[str]) -> bool:
+        """Record spans of unused rules and their set-aside chunks; returns whether anything was kept"""
+        previous = ""
+        run: List[Dict[str, Any]] = []
+        run_anchor = ""
+        kept_any = False
+
+        def close_run():
+            if not run:
+                return
+            marker = json.dumps({"groups": groups, "after": run_anchor}, ensure_ascii=False)
+            wrapped = list(run)
+            for prelude in reversed(groups):
+                wrapped = [{"type": "group", "prelude": prelude, "children": wrapped}]
+            chunks.append(f"/* set-aside-after: {marker} */\n{serialize_css(wrapped, minify=False)}\n")
+            run.clear()
+
+        for node in nodes:
+            if node["type"] == "rule":
+                counters["total"] += 1
+                keep = self._rule_matches(node["selector"], elements)
+                if not keep:
+                    counters["removed"] += 1
+            elif node["type"] == "group":
+                child_spans: List[Tuple[int, int]] = []
+                child_chunks: List[str] = []
+                keep = self._partition(node["children"], elements, counters, child_spans, child_chunks,
+                                       groups + [_collapse(node["prelude"])])
+                if keep:
+                    spans.extend(child_spans)
+                    close_run()
+                    chunks.extend(child_chunks)
+                elif not node["children"]:
+                    keep = True
+            else:
+                # @import, @font-face, @keyframes, ... are always kept
+                keep = True
+
+            if keep:
+                close_run()
+                previous = _node_name(node)
+                kept_any = True
+            else:
+                if not run:
+                    run_anchor = previous
+                run.append(node)
+                spans.append((node["start"], node["end"]))
+        close_run()
+        return kept_any
+
+    def _rule_matches(self, selector_list: str, elements) -> bool:
+        return any(self._selector_matches(selector.strip(), elements) for selector in selector_list.split(","))
+
+    def _selector_matches(self, selector: str, elements) -> bool:
+        if not selector:
+            return False
+        stripped = PSEUDO_PATTERN.sub("", selector).strip()
+        if not stripped or "*" in stripped or "\\" in stripped or "|" in stripped:
+            return True
+        for compound in COMBINATOR_PATTERN.split(stripped):
+            if not compound:
+                continue
+            if not self._compound_matches(compound, elements):
+                return False
+        return True
+
+    def _compound_matches(self, compound: str, elements) -> bool:
+        tag = None
+        element_id = None
+        classes: Set[str] = set()
+        attributes: Set[str] = set()
+        consumed = 0
+        for match in COMPOUND_PATTERN.finditer(compound):
+            if match.start() != consumed:
+                return True  # Unknown syntax, keep the rule
+            consumed = match.end()
+            if match.group("attr"):
+                attributes.add(match.group("attr").lower())
+            elif match.group("kind") == ".":
+                classes.add(match.group("name"))
+            elif match.group("kind") == "#":
+                element_id = match.group("name")
+            else:
+                tag = match.group("name").lower()
+        if consumed != len(compound):
+            return True
+
+        if tag in ALWAYS_KEEP_TAGS and not (classes or element_id or attributes):
+            return True
+
+        for element_tag, element_element_id, element_classes, element_attributes in elements:
+            if tag and element_tag != tag:
+                continue
+            if element_id and element_element_id != element_id:
+                continue
+            if not classes.issubset(element_classes):
+                continue
+            if not attributes.issubset(element_attributes):
+                continue
+            return True
+        return False
+
+    def _stats(self, original_css: str, kept_css: str, total_rules: int, removed_rules: int) -> Dict[str, Any]:
+        original_bytes = len(original_css.encode("utf-8"))
+        pruned_bytes = len(kept_css.encode("utf-8"))
+        return {
+            "original_bytes": original_bytes,
+            "pruned_bytes": pruned_bytes,
+            "bytes_removed": original_bytes - pruned_bytes,
+            "rules_total": total_rules,
+            "rules_removed": removed_rules,
+            "cache_hit": False,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-template pruning stats collected so far"""
+        with self._lock:
+            return {
+                "templates": dict(self.template_stats),
+                "total_bytes_removed": sum(stats.get("bytes_removed", 0) for stats in self.template_stats.values()),
+                "cache_entries": len(self._cache),
+            }
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _line_start(css: str, start: int) -> int:
+    """Move a span start back over the indentation of its line"""
+    line_start = css.rfind("\n", 0, start) + 1
+    return line_start if not css[line_start:start].strip() else start
+
+
+def _line_span(css: str, start: int, end: int) -> Tuple[int, int]:
+    """Widen a removed node's span to whole lines, taking the blank line after it when one precedes it"""
+    start = _line_start(css, start)
+    end = extend_to_line_end(css, end)
+    next_line_end = css.find("\n", end)
+    if (start == 0 or css[max(0, start - 2):start] == "\n\n") and next_line_end != -1 and not css[end:next_line_end].strip():
+        end = next_line_end + 1
+    elif end == len(css) and css[max(0, start - 2):start] == "\n\n":
+        start -= 1
+    return start, end
+
+
+def _node_name(node: Dict[str, Any]) -> str:
+    """Selector, prelude or statement text identifying a node within its level"""
+    return _collapse(node.get("selector") or node.get("prelude") or node.get("text") or "")
+
+
+# Global instance
+css_pruner = CSSPruner()
@@ -1,15 +1,36 @@
 #!/usr/bin/env python3
 """
 File Manager for UI Codes - Replaces JSON-based storage with file-based storage
+
+Files are replaced atomically (temp file + rename) so concurrent readers never
+see partial content, and unchanged files are not rewritten. With
+UI_CODE_WRITE_BEHIND_MS > 0, rapid successive saves of a session are
+coalesced in memory and flushed once; reads through the manager flush first.
+Loaded sessions are kept in a bounded LRU (UI_CODE_CACHE_SIZE) and served from
+memory while the session's file stats (or SQLite version) are unchanged.
 """
 
+import atexit
+import copy
+import hashlib
 import os
 import json
+import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 import logging
 
+# Files of a session in the file backend; bundles use the same names for every backend
+SESSION_FILES = (
+    "index.html", "style.css", "globals.css",
+    "original_index.html", "original_style.css", "original_globals.css",
+    "pruned_rules.css", "history.json", "metadata.json",
+)
+
+
 class UICodeFileManager:
     """Manages UI codes using individual files instead of JSON"""
     
@@ -19,24 +40,44 @@ class UICodeFileManager:
         
         # Ensure base directory exists
         self.base_dir.mkdir(exist_ok=True)
+        
+        # Content hash + stat of files we wrote, to skip rewriting identical content (LRU-bounded)
+        self.file_hash_cache_size = int(os.getenv("UI_CODE_HASH_CACHE_SIZE", "4096"))
+        self._file_hashes: "OrderedDict[str, tuple]" = OrderedDict()
+        self._file_hashes_lock = threading.Lock()
+        
+        # Write-behind buffer: session_id -> latest codes and queued history entries
+        self.write_behind_seconds = float(os.getenv("UI_CODE_WRITE_BEHIND_MS", "0")) / 1000
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        if self.write_behind_seconds > 0:
+            atexit.register(self.flush)
+        
+        # Read-through cache: session_id -> (validator, parsed session data)
+        self.session_cache_size = int(os.getenv("UI_CODE_CACHE_SIZE", "64"))
+        self._session_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
     
     def get_session_dir(self, session_id: str) -> Path:
         """Get the directory for a specific session"""
         return self.base_dir / session_id
     
     def session_exists(self, session_id: str) -> bool:
-        """Check if a session directory exists"""
+        """Check if a session exists; metadata.json is written last, so its presence means the session is complete"""
         session_dir = self.get_session_dir(session_id)
-        exists = session_dir.exists() and session_dir.is_dir()
-        self.logger.info(f"Session {session_id} exists: {exists} (path: {session_dir})")
-        self.logger.info(f"Base directory: {self.base_dir}")
-        self.logger.info(f"Base directory exists: {self.base_dir.exists()}")
+        exists = (session_dir / "metadata.json").exists()
+        self.logger.debug("Session %s exists: %s (path: %s)", session_id, exists, session_dir)
         return exists
     
     def create_session(self, session_id: str, template_data: Dict[str, Any]) -> bool:
         """Create a new session directory and write initial files"""
         try:
             self.logger.info(f"Creating session {session_id} with template data: {list(template_data.keys())}")
+            self._discard_pending(session_id)
+            self._invalidate_cached_session(session_id)
+            self._forget_file_hashes(session_id)
             session_dir = self.get_session_dir(session_id)
             session_dir.mkdir(parents=True, exist_ok=True)
             self.logger.info(f"Session directory created: {session_dir}")
@@ -49,6 +90,15 @@ class UICodeFileManager:
             # Clean HTML content - remove external CSS links since CSS will be embedded
             html_content = self._clean_html_content(html_content)
             
+            # Set aside CSS rules that match nothing in this template's HTML
+            css_pruning = None
+            if os.getenv("CSS_PRUNING_ENABLED", "true").lower() == "true":
+                style_css, globals_css, css_pruning, pruned_rules = self._prune_unused_css(
+                    html_content, style_css, globals_css, template_data.get("template_id", "")
+                )
+                if pruned_rules:
+                    self._write_file(session_dir / "pruned_rules.css", pruned_rules)
+            
             # Write files with proper extensions
             self._write_file(session_dir / "index.html", html_content)
             self._write_file(session_dir / "style.css", style_css)
@@ -59,18 +109,6 @@ class UICodeFileManager:
             self._write_file(session_dir / "original_style.css", style_css)
             self._write_file(session_dir / "original_globals.css", globals_css)
             
-            # Create metadata
-            metadata = {
-                "session_id": session_id,
-                "template_id": template_data.get("template_id", ""),
-                "template_name": template_data.get("name", ""),
-                "template_category": template_data.get("category", ""),
-                "created_at": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat(),
-                "version": "1.0"
-            }
-            self._write_json_file(session_dir / "metadata.json", metadata)
-            
             # Create empty history
             history = {
                 "modifications": [],
@@ -79,6 +117,10 @@ class UICodeFileManager:
             }
             self._write_json_file(session_dir / "history.json", history)
             
+            # Create metadata last so the session only becomes visible once complete
+            metadata = self._build_metadata(session_id, template_data, css_pruning)
+            self._write_json_file(session_dir / "metadata.json", metadata)
+            
             self.logger.info(f"Session {session_id} created successfully")
             return True
             
@@ -86,16 +128,82 @@ class UICodeFileManager:
             self.logger.error(f"Error creating session {session_id}: {e}")
             return False
     
+    def _build_metadata(self, session_id: str, template_data: Dict[str, Any], css_pruning: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Initial metadata of a session"""
+        metadata = {
+            "session_id": session_id,
+            "template_id": template_data.get("template_id", ""),
+            "template_name": template_data.get("name", ""),
+            "template_category": template_data.get("category", ""),
+            "created_at": datetime.now().isoformat(),
+            "last_updated": datetime.now().isoformat(),
+            "version": "1.0"
+        }
+        if css_pruning:
+            metadata["css_pruning"] = css_pruning
+        return metadata
+    
+    def _prune_unused_css(self, html_content: str, style_css: str, globals_css: str, template_id: str):
+        """Strip unused rules from both stylesheets; returns the removed rules so they can be kept"""
+        from .css_pruner import css_pruner
+        try:
+            style_result = css_pruner.prune(html_content, style_css, f"{template_id}:style.css" if template_id else None)
+            globals_result = css_pruner.prune(html_content, globals_css, f"{template_id}:globals.css" if template_id else None)
+            
+            removed_sections = []
+            if style_result["removed_css"]:
+                removed_sections.append(f"/* Unused rules from style.css */\n{style_result['removed_css']}")
+            if globals_result["removed_css"]:
+                removed_sections.append(f"/* Unused rules from globals.css */\n{globals_result['removed_css']}")
+            
+            stats = {
+                "style_css": style_result["stats"],
+                "globals_css": globals_result["stats"],
+                "bytes_removed": style_result["stats"]["bytes_removed"] + globals_result["stats"]["bytes_removed"],
+                "rules_removed": style_result["stats"]["rules_removed"] + globals_result["stats"]["rules_removed"]
+            }
+            self.logger.info(f"CSS pruning removed {stats['rules_removed']} rules ({stats['bytes_removed']} bytes) for template {template_id}")
+            
+            # Only swap in the pruned output when something was actually removed
+            pruned_style = style_result["css"] if style_result["stats"]["rules_removed"] else style_css
+            pruned_globals = globals_result["css"] if globals_result["stats"]["rules_removed"] else globals_css
+            return pruned_style, pruned_globals, stats, "\n".join(removed_sections)
+        except Exception as e:
+            self.logger.error(f"CSS pruning failed, keeping original stylesheets: {e}")
+            return style_css, globals_css, None, ""
+
+    def _restore_pruned_rules(self, html_content: str, style_css: str, globals_css: str, pruned_rules: Optional[str]) -> tuple:
+        """Put set-aside rules back into the stylesheets once the HTML (or its scripts) uses them again"""
+        if not pruned_rules:
+            return style_css, globals_css
+        from .css_pruner import css_pruner
+        try:
+            sections = dict(re.findall(r"/\* Unused rules from (style|globals)\.css \*/\n(.*?)(?=\n/\* Unused rules from |\Z)", pruned_rules, re.S))
+            style_css, style_restored = css_pruner.restore(html_content, style_css, sections.get("style", ""))
+            globals_css, globals_restored = css_pruner.restore(html_content, globals_css, sections.get("globals", ""))
+            if style_restored or globals_restored:
+                self.logger.info(f"Restored {style_restored + globals_restored} set-aside CSS rules now used by the HTML")
+        except Exception as e:
+            self.logger.warning(f"Could not restore set-aside CSS rules: {e}")
+        return style_css, globals_css
+    
     def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Load session data from individual files"""
         try:
-            self.logger.info(f"Loading session {session_id}...")
+            self.logger.debug("Loading session %s...", session_id)
+            self.flush(session_id)
             session_dir = self.get_session_dir(session_id)
-            self.logger.info(f"Session directory: {session_dir}")
+            self.logger.debug("Session directory: %s", session_dir)
             if not session_dir.exists():
                 self.logger.warning(f"Session directory does not exist: {session_dir}")
                 return None
             
+            # Stat before reading, so a write racing this load makes the next load miss
+            validator = self._session_validator(session_dir)
+            cached = self._get_cached_session(session_id, validator)
+            if cached is not None:
+                return cached
+            
             # Load individual files
             html_content = self._read_file(session_dir / "index.html")
             style_css = self._read_file(session_dir / "style.css")
@@ -103,71 +211,198 @@ class UICodeFileManager:
             metadata = self._read_json_file(session_dir / "metadata.json", {})
             history = self._read_json_file(session_dir / "history.json", {})
             
-            # Validate that we have valid content
-            self.logger.info(f"Validating content for session {session_id}...")
-            html_valid = self._is_valid_code(html_content)
-            style_valid = self._is_valid_code(style_css)
-            self.logger.info(f"HTML valid: {html_valid}, Style valid: {style_valid}")
-            self.logger.info(f"HTML length: {len(html_content)}, Style length: {len(style_css)}")
-            
-            if not html_valid or not style_valid:
-                self.logger.warning(f"Session {session_id} has insufficient content")
-                return None
-            
-            # Construct the same structure as the old JSON format
-            session_data = {
-                "template_id": metadata.get("template_id", ""),
-                "session_id": session_id,
-                "last_updated": metadata.get("last_updated", ""),
-                "current_codes": {
-                    "html_export": html_content,
-                    "style_css": style_css,
-                    "globals_css": globals_css
-                },
-                "original_codes": {
-                    "html_export": html_content,
-                    "style_css": style_css,
-                    "globals_css": globals_css
-                },
-                "template_info": {
-                    "name": metadata.get("template_name", ""),
-                    "category": metadata.get("template_category", ""),
-                    "id": metadata.get("template_id", "")
-                },
-                "history": history.get("modifications", []),
-                "metadata": metadata
-            }
-            
+            session_data = self._build_session_data(session_id, html_content, style_css, globals_css, metadata, history.get("modifications", []))
+            self._cache_session(session_id, validator, session_data)
             return session_data
             
         except Exception as e:
             self.logger.error(f"Error loading session {session_id}: {e}")
             return None
     
+    def _session_validator(self, session_dir: Path) -> tuple:
+        """(mtime_ns, size) of every file load_session reads; files are replaced atomically, so any write changes it"""
+        validator = []
+        for name in ("index.html", "style.css", "globals.css", "metadata.json", "history.json"):
+            try:
+                stat = (session_dir / name).stat()
+                validator.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                validator.append(None)
+        return tuple(validator)
+    
+    def _get_cached_session(self, session_id: str, validator: Any) -> Optional[Dict[str, Any]]:
+        """Get a copy of a cached session if it is still current, or None"""
+        if self.session_cache_size <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._session_cache.get(session_id)
+            if entry is None or entry[0] != validator:
+                self.cache_stats["misses"] += 1
+                return None
+            self._session_cache.move_to_end(session_id)
+            self.cache_stats["hits"] += 1
+            # Callers modify the returned dict, so never hand out the cached one
+            return copy.deepcopy(entry[1])
+    
+    def _cache_session(self, session_id: str, validator: Any, session_data: Optional[Dict[str, Any]]) -> None:
+        if self.session_cache_size <= 0 or session_data is None:
+            return
+        with self._cache_lock:
+            self._session_cache[session_id] = (validator, copy.deepcopy(session_data))
+            self._session_cache.move_to_end(session_id)
+            while len(self._session_cache) > self.session_cache_size:
+                self._session_cache.popitem(last=False)
+                self.cache_stats["evictions"] += 1
+    
+    def _invalidate_cached_session(self, session_id: str) -> None:
+        """Drop a session from the cache after a write through this manager (mtimes can be coarse)"""
+        with self._cache_lock:
+            if self._session_cache.pop(session_id, None) is not None:
+                self.cache_stats["invalidations"] += 1
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the loaded-session cache"""
+        with self._cache_lock:
+            lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
+            return {
+                **self.cache_stats,
+                "hit_rate": self.cache_stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._session_cache),
+                "max_entries": self.session_cache_size,
+                "file_hashes": len(self._file_hashes),
+                "backend": type(self).__name__,
+            }
+    
+    def _build_session_data(self, session_id: str, html_content: str, style_css: str, globals_css: str,
+                            metadata: Dict[str, Any], modifications: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Validate loaded codes and construct the same structure as the old JSON format"""
+        self.logger.debug("Validating content for session %s...", session_id)
+        html_valid = self._is_valid_code(html_content)
+        style_valid = self._is_valid_code(style_css)
+        self.logger.debug("HTML valid: %s, Style valid: %s", html_valid, style_valid)
+        self.logger.debug("HTML length: %s, Style length: %s", len(html_content), len(style_css))
+        
+        if not html_valid or not style_valid:
+            self.logger.warning(f"Session {session_id} has insufficient content")
+            return None
+        
+        return {
+            "template_id": metadata.get("template_id", ""),
+            "session_id": session_id,
+            "last_updated": metadata.get("last_updated", ""),
+            "current_codes": {
+                "html_export": html_content,
+                "style_css": style_css,
+                "globals_css": globals_css
+            },
+            "original_codes": {
+                "html_export": html_content,
+                "style_css": style_css,
+                "globals_css": globals_css
+            },
+            "template_info": {
+                "name": metadata.get("template_name", ""),
+                "category": metadata.get("template_category", ""),
+                "id": metadata.get("template_id", "")
+            },
+            "history": modifications,
+            "metadata": metadata
+        }
+    
+    def _prepare_modified_codes(self, modified_template: Dict[str, Any]) -> Optional[tuple]:
+        """Clean and validate modified codes; returns (html, style_css, globals_css) or None"""
+        html_content = self._clean_html_content(modified_template.get("html_export", ""))
+        style_css = modified_template.get("style_css", "")
+        globals_css = modified_template.get("globals_css", "")
+        
+        if not self._is_valid_code(html_content):
+            self.logger.error("Modified template contains invalid HTML content - refusing to save")
+            return None
+        
+        if not self._is_valid_code(style_css):
+            self.logger.error("Modified template contains invalid CSS content - refusing to save")
+            return None
+        
+        return html_content, style_css, globals_css
+    
+    def _make_history_entry(self, modification_metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """History entry for a saved modification"""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "user_request": modification_metadata.get("user_request", "UI modification") if modification_metadata else "UI modification",
+            "modification_type": modification_metadata.get("modification_type", "general") if modification_metadata else "general",
+            "changes_applied": modification_metadata.get("changes_applied", ["UI modifications applied"]) if modification_metadata else ["UI modifications applied"],
+            "success": True
+        }
+    
+    def _make_reset_entry(self) -> Dict[str, Any]:
+        """History entry for a reset to the original template"""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "modification": "Reset to original template state",
+            "modification_type": "reset",
+            "changes_applied": ["Restored all files to original state"]
+        }
+    
     def save_session(self, session_id: str, modified_template: Dict[str, Any], modification_metadata: Optional[Dict[str, Any]] = None) -> bool:
-        """Save modified template data to individual files"""
+        """Save modified template data, buffered when write-behind is enabled"""
         try:
-            session_dir = self.get_session_dir(session_id)
-            if not session_dir.exists():
-                self.logger.error(f"Session directory not found: {session_dir}")
+            if not self.session_exists(session_id):
+                self.logger.error(f"Session not found: {session_id}")
                 return False
             
-            # Extract content from modified template
-            html_content = modified_template.get("html_export", "")
-            style_css = modified_template.get("style_css", "")
-            globals_css = modified_template.get("globals_css", "")
-            
-            # Clean HTML content - remove external CSS links
-            html_content = self._clean_html_content(html_content)
-            
-            # Validate content before saving
-            if not self._is_valid_code(html_content):
-                self.logger.error("Modified template contains invalid HTML content - refusing to save")
+            # Clean and validate content before saving
+            codes = self._prepare_modified_codes(modified_template)
+            if not codes:
                 return False
             
-            if not self._is_valid_code(style_css):
-                self.logger.error("Modified template contains invalid CSS content - refusing to save")
-                return False
+            history_entry = self._make_history_entry(modification_metadata)
+            if self.write_behind_seconds > 0:
+                self._buffer_save(session_id, codes, history_entry)
+                return True
+            return self._persist_save(session_id, codes, [history_entry])
+            
+        except Exception as e:
+            self.logger.error(f"Error saving session {session_id}: {e}")
+            return False
+    
+    def _buffer_save(self, session_id: str, codes: tuple, history_entry: Dict[str, Any]) -> None:
+        """Keep only the latest codes of a session and flush them once the write-behind delay passes"""
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+            if pending is None:
+                pending = self._pending[session_id] = {"history": []}
+                timer = threading.Timer(self.write_behind_seconds, self.flush, args=(session_id,))
+                timer.daemon = True
+                timer.start()
+            pending["codes"] = codes
+            pending["history"].append(history_entry)
+    
+    def _discard_pending(self, session_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(session_id, None)
+    
+    def flush(self, session_id: Optional[str] = None) -> bool:
+        """Write buffered saves (of one session, or all) to storage"""
+        with self._flush_lock:
+            with self._pending_lock:
+                session_ids = [session_id] if session_id else list(self._pending)
+                batches = [(sid, self._pending.pop(sid)) for sid in session_ids if sid in self._pending]
+            success = True
+            for sid, pending in batches:
+                if len(pending["history"]) > 1:
+                    self.logger.info(f"Coalesced {len(pending['history'])} saves of session {sid} into one write")
+                success = self._persist_save(sid, pending["codes"], pending["history"]) and success
+            return success
+    
+    def _persist_save(self, session_id: str, codes: tuple, history_entries: List[Dict[str, Any]]) -> bool:
+        """Write codes, metadata and history entries of a save to the session files"""
+        try:
+            session_dir = self.get_session_dir(session_id)
+            html_content, style_css, globals_css = codes
+            pruned_path = session_dir / "pruned_rules.css"
+            if pruned_path.exists():
+                style_css, globals_css = self._restore_pruned_rules(html_content, style_css, globals_css, self._read_file(pruned_path))
             
             # Write individual files
             self._write_file(session_dir / "index.html", html_content)
@@ -184,19 +419,12 @@ class UICodeFileManager:
             if "modifications" not in history:
                 history["modifications"] = []
             
-            history_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "user_request": modification_metadata.get("user_request", "UI modification") if modification_metadata else "UI modification",
-                "modification_type": modification_metadata.get("modification_type", "general") if modification_metadata else "general",
-                "changes_applied": modification_metadata.get("changes_applied", ["UI modifications applied"]) if modification_metadata else ["UI modifications applied"],
-                "success": True
-            }
-            
-            history["modifications"].append(history_entry)
+            history["modifications"].extend(history_entries)
             history["total_modifications"] = len(history["modifications"])
-            history["last_modification"] = history_entry["timestamp"]
+            history["last_modification"] = history_entries[-1]["timestamp"]
             
             self._write_json_file(session_dir / "history.json", history)
+            self._invalidate_cached_session(session_id)
             
             self.logger.info(f"Session {session_id} saved successfully")
             return True
@@ -208,6 +436,9 @@ class UICodeFileManager:
     def delete_session(self, session_id: str) -> bool:
         """Delete a session directory and all its files"""
         try:
+            self._discard_pending(session_id)
+            self._invalidate_cached_session(session_id)
+            self._forget_file_hashes(session_id)
             session_dir = self.get_session_dir(session_id)
             if session_dir.exists():
                 import shutil
@@ -221,6 +452,7 @@ class UICodeFileManager:
     def reset_to_original(self, session_id: str) -> bool:
         """Reset session files to their original state"""
         try:
+            self.flush(session_id)
             session_dir = self.get_session_dir(session_id)
             if not session_dir.exists():
                 self.logger.error(f"Session directory does not exist: {session_id}")
@@ -240,9 +472,15 @@ class UICodeFileManager:
                     return False
             
             # Restore original files to current files
-            self._write_file(session_dir / "index.html", self._read_file(session_dir / "original_index.html"))
-            self._write_file(session_dir / "style.css", self._read_file(session_dir / "original_style.css"))
-            self._write_file(session_dir / "globals.css", self._read_file(session_dir / "original_globals.css"))
+            html_content = self._read_file(session_dir / "original_index.html")
+            style_css = self._read_file(session_dir / "original_style.css")
+            globals_css = self._read_file(session_dir / "original_globals.css")
+            pruned_path = session_dir / "pruned_rules.css"
+            if pruned_path.exists():
+                style_css, globals_css = self._restore_pruned_rules(html_content, style_css, globals_css, self._read_file(pruned_path))
+            self._write_file(session_dir / "index.html", html_content)
+            self._write_file(session_dir / "style.css", style_css)
+            self._write_file(session_dir / "globals.css", globals_css)
             
             # Update metadata
             metadata = self._read_json_file(session_dir / "metadata.json", {})
@@ -255,16 +493,12 @@ class UICodeFileManager:
             if "modifications" not in history:
                 history["modifications"] = []
             
-            history["modifications"].append({
-                "timestamp": datetime.now().isoformat(),
-                "modification": "Reset to original template state",
-                "modification_type": "reset",
-                "changes_applied": ["Restored all files to original state"]
-            })
+            history["modifications"].append(self._make_reset_entry())
             history["total_modifications"] = len(history["modifications"])
             history["last_modification"] = datetime.now().isoformat()
             
             self._write_json_file(session_dir / "history.json", history)
+            self._invalidate_cached_session(session_id)
             
             self.logger.info(f"Successfully reset session {session_id} to original state")
             return True
@@ -273,6 +507,42 @@ class UICodeFileManager:
             self.logger.error(f"Error resetting session {session_id} to original: {e}")
             return False
     
+    def export_files(self, session_id: str) -> Optional[Dict[str, bytes]]:
+        """Raw content of a session's files, keyed by SESSION_FILES names (used by session bundles)"""
+        self.flush(session_id)
+        if not self.session_exists(session_id):
+            return None
+        session_dir = self.get_session_dir(session_id)
+        return {name: (session_dir / name).read_bytes() for name in SESSION_FILES if (session_dir / name).exists()}
+    
+    def import_files(self, session_id: str, files: Dict[str, bytes]) -> bool:
+        """Restore files produced by export_files, replacing the session if it exists"""
+        try:
+            self._discard_pending(session_id)
+            self._invalidate_cached_session(session_id)
+            self._forget_file_hashes(session_id)
+            session_dir = self.get_session_dir(session_id)
+            session_dir.mkdir(parents=True, exist_ok=True)
+            (session_dir / "metadata.json").unlink(missing_ok=True)
+            for name in SESSION_FILES:
+                if name != "metadata.json" and name in files:
+                    self._write_file(session_dir / name, files[name].decode('utf-8'))
+            
+            # Metadata last, as in create_session
+            metadata = json.loads(files["metadata.json"])
+            metadata["session_id"] = session_id
+            self._write_json_file(session_dir / "metadata.json", metadata)
+            self._invalidate_cached_session(session_id)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error importing session {session_id}: {e}")
+            return False
+    
+    def _import_history(self, session_id: str, history: Dict[str, Any]) -> None:
+        """Replace a session's history with migrated entries"""
+        self._write_json_file(self.get_session_dir(session_id) / "history.json", history)
+        self._invalidate_cached_session(session_id)
+    
     def list_sessions(self) -> List[str]:
         """List all session IDs"""
         try:
@@ -285,9 +555,24 @@ class UICodeFileManager:
             self.logger.error(f"Error listing sessions: {e}")
             return []
     
+    def list_idle_sessions(self, idle_since: float, limit: Optional[int] = None) -> List[str]:
+        """Session IDs whose last write is older than the idle_since timestamp, oldest first"""
+        idle = []
+        for item in self.base_dir.iterdir():
+            metadata_file = item / "metadata.json"
+            if not item.is_dir() or not metadata_file.exists():
+                continue
+            # Atomic writes rename into the directory, so its mtime tracks the last save
+            last_write = max(item.stat().st_mtime, metadata_file.stat().st_mtime)
+            if last_write < idle_since:
+                idle.append((last_write, item.name))
+        idle.sort()
+        return [session_id for _, session_id in idle[:limit]]
+    
     def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get basic session information"""
         try:
+            self.flush(session_id)
             session_dir = self.get_session_dir(session_id)
             metadata_file = session_dir / "metadata.json"
             
@@ -300,9 +585,52 @@ class UICodeFileManager:
             self.logger.error(f"Error getting session info for {session_id}: {e}")
             return None
     
-    def _write_file(self, file_path: Path, content: str) -> None:
-        """Write content to a file"""
-        file_path.write_text(content, encoding='utf-8')
+    def _write_file(self, file_path: Path, content: str) -> bool:
+        """Atomically replace a file's content; returns False when it was already identical"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        key = str(file_path)
+        
+        try:
+            stat = file_path.stat()
+            with self._file_hashes_lock:
+                cached = self._file_hashes.get(key)
+            if cached and cached[1:] == (stat.st_mtime_ns, stat.st_size):
+                unchanged = cached[0] == digest
+            else:
+                # Written by someone else (or before this process started)
+                unchanged = stat.st_size == len(data) and hashlib.sha256(file_path.read_bytes()).hexdigest() == digest
+            if unchanged:
+                self._remember_file_hash(key, (digest, stat.st_mtime_ns, stat.st_size))
+                return False
+        except FileNotFoundError:
+            pass
+        
+        temp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, file_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        stat = file_path.stat()
+        self._remember_file_hash(key, (digest, stat.st_mtime_ns, stat.st_size))
+        return True
+    
+    def _remember_file_hash(self, key: str, entry: tuple) -> None:
+        with self._file_hashes_lock:
+            self._file_hashes[key] = entry
+            self._file_hashes.move_to_end(key)
+            while len(self._file_hashes) > self.file_hash_cache_size:
+                self._file_hashes.popitem(last=False)
+    
+    def _forget_file_hashes(self, session_id: str) -> None:
+        """Drop the remembered hashes of a session's files once they are deleted or replaced"""
+        prefix = str(self.get_session_dir(session_id)) + os.sep
+        with self._file_hashes_lock:
+            for key in [key for key in self._file_hashes if key.startswith(prefix)]:
+                del self._file_hashes[key]
     
     def _read_file(self, file_path: Path) -> str:
         """Read content from a file"""
@@ -310,10 +638,9 @@ class UICodeFileManager:
             return file_path.read_text(encoding='utf-8')
         return ""
     
-    def _write_json_file(self, file_path: Path, data: Any) -> None:
-        """Write JSON data to a file"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def _write_json_file(self, file_path: Path, data: Any) -> bool:
+        """Atomically write JSON data to a file"""
+        return self._write_file(file_path, json.dumps(data, indent=2, ensure_ascii=False))
     
     def _read_json_file(self, file_path: Path, default: Any = None) -> Any:
         """Read JSON data from a file"""
@@ -406,7 +733,6 @@ class UICodeFileManager:
                 # Copy history if it exists
                 history_data = json_data.get("history", [])
                 if history_data:
-                    session_dir = self.get_session_dir(session_id)
                     # Ensure history is in the correct format
                     if isinstance(history_data, list):
                         history = {
@@ -417,7 +743,7 @@ class UICodeFileManager:
                     else:
                         history = history_data
                     
-                    self._write_json_file(session_dir / "history.json", history)
+                    self._import_history(session_id, history)
                 
                 self.logger.info(f"Successfully migrated session {session_id} from JSON")
                 return True
@@ -426,4 +752,24 @@ class UICodeFileManager:
                 
         except Exception as e:
             self.logger.error(f"Error migrating session {session_id} from JSON: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+
+_file_managers: Dict[str, UICodeFileManager] = {}
+_file_managers_lock = threading.Lock()
+
+
+def get_file_manager(base_dir: Optional[str] = None) -> UICodeFileManager:
+    """Get the UI code store selected by UI_CODE_STORAGE_BACKEND (files or sqlite)"""
+    base_dir = base_dir or os.path.join(os.getcwd(), "temp_ui_files")
+    backend = os.getenv("UI_CODE_STORAGE_BACKEND", "files").lower()
+    key = f"{backend}:{base_dir}"
+    # Migration workers and request threads may ask for the same store at once; build it only once
+    with _file_managers_lock:
+        if key not in _file_managers:
+            if backend == "sqlite":
+                from .sqlite_file_manager import SQLiteUICodeFileManager
+                _file_managers[key] = SQLiteUICodeFileManager(base_dir=base_dir)
+            else:
+                _file_managers[key] = UICodeFileManager(base_dir=base_dir)
+        return _file_managers[key]
@@ -0,0 +1,182 @@
+"""
+Logging configuration - structured, sampled, non-blocking logging
+
+configure_logging() installs a single QueueHandler on the root logger; a
+QueueListener thread formats records and writes them to stdout, so request
+handlers never block on log I/O. Records carry the correlation id of the
+request being served (set by the middleware in main.py) and, where bound,
+the session id.
+
+Environment:
+    LOG_LEVEL              root level (default INFO)
+    LOG_LEVELS             per-module levels, e.g. "agents=DEBUG,utils.file_manager=WARNING"
+    LOG_FORMAT             json | text (default text)
+    LOG_DEBUG_SAMPLE_RATE  fraction of DEBUG records kept (default 1.0)
+    LOG_RATE_LIMIT         DEBUG/INFO records per second per call site (default 20, 0 = unlimited)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+correlation_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_session_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def set_correlation_id(correlation_id: Optional[str]) -> contextvars.Token:
+    return correlation_id_var.set(correlation_id)
+
+
+def reset_correlation_id(token: contextvars.Token):
+    correlation_id_var.reset(token)
+
+
+def bind_session_id(session_id: Optional[str]):
+    """Tag the current request's records with a session id"""
+    session_id_var.set(session_id)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request context onto records in the thread that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Samples DEBUG records and rate-limits DEBUG/INFO per call site; WARNING and above always pass"""
+
+    def __init__(self, debug_sample_rate: float = 1.0, rate_limit: float = 0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+        self.rate_limit = rate_limit
+        self._windows: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0 and random.random() >= self.debug_sample_rate:
+            return False
+        if self.rate_limit <= 0:
+            return True
+
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(site)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                self._windows[site] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.rate_limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("correlation_id", "session_id", "suppressed"):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text with the correlation id when there is one"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(context)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = [value for value in (getattr(record, "correlation_id", None), getattr(record, "session_id", None)) if value]
+        record.context = f" [{' '.join(context)}]" if context else ""
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{message} (+{suppressed} similar suppressed)" if suppressed else message
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level and hasattr(logging, level.strip().upper()):
+            levels[name.strip()] = getattr(logging, level.strip().upper())
+    return levels
+
+
+def configure_logging(force: bool = False):
+    """Route all logging through a queue to a background writer; safe to call more than once"""
+    global _listener, _queue_handler
+    if _listener is not None and not force:
+        return
+    shutdown_logging()
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Filters run in the logging thread, before the record crosses the queue
+    _queue_handler.addFilter(ContextFilter())
+    _queue_handler.addFilter(SamplingFilter(
+        float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0")),
+        float(os.getenv("LOG_RATE_LIMIT", "20"))
+    ))
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
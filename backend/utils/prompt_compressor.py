@@ -0,0 +1,252 @@
+"""
+Prompt Compressor - Reversible compression of HTML/CSS embedded in LLM prompts
+
+Template exports carry indentation, comments, repeated declarations, base64
+data URIs and very long attribute values (SVG paths, srcsets) that cost
+tokens without helping the model. A PromptCompressor instance compresses the
+code for one LLM call and can expand the model's output back to the real
+values afterwards. Edited stylesheets are spliced back into the original text
+rule by rule, so comments and formatting outside the rules the model changed
+survive. Only exact repeats (same property and value) are deduplicated;
+vendor-prefixed variants are distinct properties and are always sent.
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from .css_parser import apply_edits, extend_to_line_end, parse_css, serialize_css, split_declarations, format_css
+
+# Raised when the prompt CSS does not line up with the original rule for rule
+class _SpliceMismatch(Exception):
+    pass
+
+logger = logging.getLogger(__name__)
+
+DATA_URI_PATTERN = re.compile(r"data:[\w.+-]+/[\w.+-]+(?:;[\w=.+-]+)*,[A-Za-z0-9+/=%._~:-]+")
+HTML_COMMENT_PATTERN = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+HTML_ATTRIBUTE_PATTERN = re.compile(r"(\s[\w:-]+=)(\"[^\"]*\"|'[^']*')")
+PRESERVED_HTML_BLOCKS = re.compile(r"<(pre|textarea)\b.*?</\1>", re.DOTALL | re.IGNORECASE)
+PLACEHOLDER_PATTERN = re.compile(r"__(?:URI|VAL|KEEP)_\d+__")
+
+# Characters per token used for estimates; close enough for Claude on code
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for a piece of text"""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def is_compression_enabled() -> bool:
+    """Check whether prompt compression is switched on"""
+    return os.getenv("PROMPT_COMPRESSION_ENABLED", "true").lower() == "true"
+
+
+class PromptCompressor:
+    """Compresses code for one LLM call and expands the placeholders it introduced"""
+
+    def __init__(self, long_value_threshold: int = None):
+        self.long_value_threshold = long_value_threshold or int(os.getenv("PROMPT_COMPRESSION_LONG_VALUE", "160"))
+        self.placeholders: Dict[str, str] = {}
+        self._reverse: Dict[str, str] = {}
+        self.stats = {"original_chars": 0, "compressed_chars": 0, "duplicate_declarations": 0}
+        self._counters = {"URI": 0, "VAL": 0, "KEEP": 0}
+
+    def _placeholder(self, kind: str, value: str) -> str:
+        # Identical values share a placeholder
+        existing = self._reverse.get(value)
+        if existing:
+            return existing
+        self._counters[kind] += 1
+        token = f"__{kind}_{self._counters[kind]}__"
+        self.placeholders[token] = value
+        self._reverse[value] = token
+        return token
+
+    def _replace_data_uris(self, text: str) -> str:
+        return DATA_URI_PATTERN.sub(lambda match: self._placeholder("URI", match.group(0)), text)
+
+    def _shorten_value(self, value: str) -> str:
+        if len(value) > self.long_value_threshold and not PLACEHOLDER_PATTERN.fullmatch(value):
+            return self._placeholder("VAL", value)
+        return value
+
+    def compress_css(self, css: str) -> str:
+        """Minify CSS, dedupe repeated declarations and replace long values"""
+        if not css:
+            return css or ""
+        try:
+            text = self._replace_data_uris(css)
+            nodes = parse_css(text)
+            self._compress_nodes(nodes)
+            compressed = serialize_css(nodes, minify=True)
+        except Exception as e:
+            logger.warning(f"CSS compression failed, sending original: {e}")
+            compressed = css
+        self._record(css, compressed)
+        return compressed
+
+    def _compress_nodes(self, nodes: List[Dict[str, Any]]):
+        for node in nodes:
+            if node["type"] == "group":
+                self._compress_nodes(node["children"])
+            elif node["type"] == "rule":
+                declarations = split_declarations(node["body"])
+                deduped: List[Tuple[str, str]] = []
+                seen = set()
+                # Walk backwards so the winning (last) declaration is kept
+                for prop, value in reversed(declarations):
+                    key = (prop.lower(), value)
+                    if key in seen:
+                        self.stats["duplicate_declarations"] += 1
+                        continue
+                    seen.add(key)
+                    deduped.append((prop, self._shorten_value(value)))
+                deduped.reverse()
+                node["body"] = ";".join(f"{prop}:{value}" if value else prop for prop, value in deduped)
+
+    def compress_html(self, html: str) -> str:
+        """Strip comments and indentation, replace data URIs and long attribute values"""
+        if not html:
+            return html or ""
+        try:
+            # Whitespace inside <pre>/<textarea> is significant
+            text = PRESERVED_HTML_BLOCKS.sub(lambda match: self._placeholder("KEEP", match.group(0)), html)
+            text = HTML_COMMENT_PATTERN.sub("", text)
+            text = self._replace_data_uris(text)
+
+            def shorten_attribute(match):
+                quote = match.group(2)[0]
+                value = match.group(2)[1:-1]
+                return f"{match.group(1)}{quote}{self._shorten_value(value)}{quote}"
+
+            text = HTML_ATTRIBUTE_PATTERN.sub(shorten_attribute, text)
+            text = re.sub(r"[ \t]*\n\s*", "\n", text)
+            text = re.sub(r"[ \t]{2,}", " ", text).strip()
+        except Exception as e:
+            logger.warning(f"HTML compression failed, sending original: {e}")
+            text = html
+        self._record(html, text)
+        return text
+
+    def _record(self, original: str, compressed: str):
+        self.stats["original_chars"] += len(original)
+        self.stats["compressed_chars"] += len(compressed)
+
+    def expand(self, text: str) -> str:
+        """Replace placeholders in model output with the original values"""
+        if not text or not self.placeholders:
+            return text
+        # KEEP placeholders can contain URI/VAL placeholders, so expand until stable
+        for _ in range(3):
+            expanded = PLACEHOLDER_PATTERN.sub(lambda match: self.placeholders.get(match.group(0), match.group(0)), text)
+            if expanded == text:
+                break
+            text = expanded
+        return text
+
+    def expand_css(self, css: str) -> str:
+        """Expand placeholders and restore readable formatting for edited CSS"""
+        expanded = self.expand(css)
+        try:
+            return format_css(expanded)
+        except Exception:
+            return expanded
+
+    def splice_css(self, original: str, prompt_css: str, edited_css: str) -> str:
+        """Apply the model's edits to the original stylesheet, rewriting only the rules it changed.
+
+        prompt_css is what compress_css(original) returned; rules are matched by selector
+        (or prelude) and occurrence. Falls back to expand_css when the structures do not line up.
+        """
+        try:
+            original_nodes = parse_css(original)
+            edits: List[Tuple[int, int, str]] = []
+            self._splice_level(original, original_nodes, parse_css(prompt_css), parse_css(edited_css), 0, len(original), edits)
+        except Exception as e:
+            logger.warning(f"Could not splice CSS edits into the original, re-formatting instead: {e}")
+            return self.expand_css(edited_css)
+        return apply_edits(original, edits)
+
+    def _splice_level(self, source: str, original_nodes, prompt_nodes, edited_nodes, level_start: int, level_end: int, edits):
+        if len(original_nodes) != len(prompt_nodes):
+            raise _SpliceMismatch("prompt CSS does not match the original")
+        prompt_keys = _node_keys(prompt_nodes)
+        positions = {key: index for index, key in enumerate(prompt_keys)}
+        edited_by_key = dict(zip(_node_keys(edited_nodes), edited_nodes))
+
+        # New rules go after the nearest preceding rule the model kept
+        anchor = None
+        insertions: Dict[Any, List[Dict[str, Any]]] = {}
+        for key, node in edited_by_key.items():
+            if key in positions:
+                anchor = positions[key]
+            else:
+                insertions.setdefault(anchor, []).append(node)
+
+        for index, (original_node, prompt_node, key) in enumerate(zip(original_nodes, prompt_nodes, prompt_keys)):
+            edited_node = edited_by_key.get(key)
+            start, end = original_node["start"], original_node["end"]
+            if edited_node is None:
+                edits.append((start, extend_to_line_end(source, end), ""))
+            elif serialize_css([prompt_node]) == serialize_css([edited_node]):
+                pass
+            elif original_node["type"] == "group" and _collapse(prompt_node["prelude"]) == _collapse(edited_node["prelude"]):
+                self._splice_level(source, original_node["children"], prompt_node["children"], edited_node["children"],
+                                   original_node["body_start"], original_node["body_end"], edits)
+            else:
+                edits.append((start, end, self._format_node(edited_node, _indent_at(source, start))))
+
+        for anchor_index, nodes in insertions.items():
+            if anchor_index is None:
+                position = original_nodes[0]["start"] if original_nodes else level_end
+                indent = _indent_at(source, position) if original_nodes else ""
+                text = "\n\n".join(self._format_node(node, indent) for node in nodes)
+                edits.append((position, position, text + ("\n\n" + indent if original_nodes else "\n")))
+            else:
+                position = original_nodes[anchor_index]["end"]
+                indent = _indent_at(source, original_nodes[anchor_index]["start"])
+                edits.append((position, position, "".join("\n\n" + indent + self._format_node(node, indent) for node in nodes)))
+
+    def _format_node(self, node: Dict[str, Any], indent: str) -> str:
+        text = self.expand(serialize_css([node], minify=False))
+        return text.replace("\n", "\n" + indent) if indent else text
+
+    def get_report(self) -> Dict[str, Any]:
+        """Summarise how much this compressor saved"""
+        original_tokens = estimate_tokens("x" * self.stats["original_chars"])
+        compressed_tokens = estimate_tokens("x" * self.stats["compressed_chars"])
+        return {
+            "original_chars": self.stats["original_chars"],
+            "compressed_chars": self.stats["compressed_chars"],
+            "original_tokens_est": original_tokens,
+            "compressed_tokens_est": compressed_tokens,
+            "tokens_saved_est": original_tokens - compressed_tokens,
+            "placeholders": len(self.placeholders),
+            "duplicate_declarations_removed": self.stats["duplicate_declarations"],
+        }
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _node_keys(nodes: List[Dict[str, Any]]) -> List[Tuple[str, str, int]]:
+    """(type, selector/prelude/text, occurrence) per node, so repeated selectors stay distinct"""
+    keys = []
+    seen: Dict[Tuple[str, str], int] = {}
+    for node in nodes:
+        name = _collapse(node.get("selector") or node.get("prelude") or node.get("text") or "")
+        base = (node["type"], name)
+        seen[base] = seen.get(base, 0) + 1
+        keys.append((node["type"], name, seen[base]))
+    return keys
+
+
+def _indent_at(source: str, position: int) -> str:
+    """Whitespace between the start of the line and position, if that is all there is"""
+    line_start = source.rfind("\n", 0, position) + 1
+    prefix = source[line_start:position]
+    return prefix if not prefix.strip() else ""
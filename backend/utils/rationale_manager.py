@@ -1,188 +1,322 @@
+import atexit
+import hashlib
 import json
+import logging
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Entries kept per list section when the log is folded, oldest dropped first
+RATIONALE_LIMITS = {
+    ("requirements_analysis",): 5,
+    ("question_generation",): 5,
+    ("ui_editing", "planning_rationale"): 10,
+    ("ui_editing", "execution_summary"): 10,
+    ("overall_workflow", "phase_decisions"): 10,
+    ("overall_workflow", "agent_coordination"): 10,
+}
+
+
+def _default_rationale(session_id: str, created_at: str) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "created_at": created_at,
+        "last_updated": created_at,
+        "requirements_analysis": [],
+        "template_selection": {
+            "recommendations": [],
+            "final_selection": None,
+            "selection_reasoning": ""
+        },
+        "question_generation": [],
+        "ui_editing": {
+            "planning_rationale": [],
+            "execution_summary": []
+        },
+        "overall_workflow": {
+            "phase_decisions": [],
+            "agent_coordination": []
+        }
+    }
+
+
+def _apply_event(rationale_data: Dict[str, Any], event: Dict[str, Any]):
+    """Apply one logged 'set' or 'append' event to the folded structure"""
+    *parents, key = event["path"]
+    target = rationale_data
+    for name in parents:
+        target = target.setdefault(name, {})
+    if event["op"] == "set":
+        target[key] = event["value"]
+    elif event["op"] == "append":
+        entries = target.setdefault(key, [])
+        entries.append(event["value"])
+        limit = RATIONALE_LIMITS.get(tuple(event["path"]))
+        if limit and len(entries) > limit:
+            del entries[:-limit]
+    rationale_data["last_updated"] = event["timestamp"]
+
+
+class RationaleLog:
+    """
+    Append-only JSON Lines log of rationale events per session.
+    Events are buffered in memory per session and appended in one write;
+    the log is folded into rationale.json once it grows past a size limit.
+    The snapshot records which log it folded, so a compaction interrupted
+    before the folded log was removed does not apply its events twice.
+    """
+
+    LOG_NAME = "rationale.log.jsonl"
+    SNAPSHOT_NAME = "rationale.json"
+    MARKER_KEY = "_compacted_log"
+
+    def __init__(self):
+        self.buffer_size = int(os.getenv("RATIONALE_BUFFER_SIZE", "10"))
+        self.flush_interval = float(os.getenv("RATIONALE_FLUSH_INTERVAL_MS", "1000")) / 1000
+        self.compact_bytes = int(os.getenv("RATIONALE_COMPACT_BYTES", str(256 * 1024)))
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._dirs: Dict[str, Path] = {}
+        self._lock = threading.Lock()
+        # session_id -> [lock, number of threads using it]; dropped when unused
+        self._session_locks: Dict[str, list] = {}
+
+    @contextmanager
+    def _session_lock(self, session_id: str):
+        with self._lock:
+            entry = self._session_locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._session_locks[session_id]
+
+    def record(self, session_id: str, session_dir: Path, events: List[Dict[str, Any]]):
+        """Buffer events; flush when the buffer is full or after the flush interval"""
+        with self._lock:
+            buffer = self._buffers.setdefault(session_id, [])
+            self._dirs[session_id] = session_dir
+            start_timer = not buffer
+            buffer.extend(events)
+            full = len(buffer) >= self.buffer_size
+        if full or self.flush_interval <= 0:
+            self.flush(session_id)
+        elif start_timer:
+            timer = threading.Timer(self.flush_interval, self.flush, args=(session_id,))
+            timer.daemon = True
+            timer.start()
+
+    def flush(self, session_id: Optional[str] = None):
+        """Append buffered events of one session (or all) to their logs"""
+        with self._lock:
+            session_ids = [session_id] if session_id else list(self._buffers)
+        for sid in session_ids:
+            with self._session_lock(sid):
+                with self._lock:
+                    events = self._buffers.pop(sid, None)
+                    session_dir = self._dirs.pop(sid, None)
+                if not events or session_dir is None:
+                    continue
+                try:
+                    session_dir.mkdir(parents=True, exist_ok=True)
+                    log_path = session_dir / self.LOG_NAME
+                    # One O_APPEND write per flush, so concurrent writers never overwrite each other
+                    with open(log_path, 'a', encoding='utf-8') as f:
+                        f.write("".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events))
+                    if log_path.stat().st_size > self.compact_bytes:
+                        self._compact(sid, session_dir)
+                except Exception as e:
+                    logger.warning(f"Failed to write rationale log: {e}")
+
+    def fold(self, session_id: str, session_dir: Path) -> Dict[str, Any]:
+        """Snapshot plus every logged event, in order"""
+        self.flush(session_id)
+        with self._session_lock(session_id):
+            return self._fold(session_id, session_dir)
+
+    def _fold(self, session_id: str, session_dir: Path, include_live_log: bool = True) -> Dict[str, Any]:
+        rationale_data = None
+        snapshot_path = session_dir / self.SNAPSHOT_NAME
+        if snapshot_path.exists():
+            try:
+                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                    rationale_data = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load rationale snapshot: {e}")
+        marker = rationale_data.pop(self.MARKER_KEY, None) if rationale_data else None
+
+        compacting_path = session_dir / f"{self.LOG_NAME}.compacting"
+        log_paths = [compacting_path]
+        if include_live_log:
+            log_paths.append(session_dir / self.LOG_NAME)
+        for log_path in log_paths:
+            if not log_path.exists():
+                continue
+            if log_path == compacting_path and marker and marker == self._log_marker(log_path):
+                # Already folded into the snapshot by an interrupted compaction
+                continue
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crashed writer
+                        continue
+                    if rationale_data is None:
+                        rationale_data = _default_rationale(session_id, event["timestamp"])
+                    _apply_event(rationale_data, event)
+
+        return rationale_data or _default_rationale(session_id, datetime.now().isoformat())
+
+    def _log_marker(self, log_path: Path) -> Dict[str, Any]:
+        """Size and digest identifying the exact log content folded into a snapshot"""
+        data = log_path.read_bytes()
+        return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+    def _compact(self, session_id: str, session_dir: Path):
+        """Fold the log into rationale.json and start a new log; caller holds the session lock"""
+        log_path = session_dir / self.LOG_NAME
+        compacting_path = session_dir / f"{self.LOG_NAME}.compacting"
+        if not compacting_path.exists():
+            # Appends after the rename start a fresh log
+            os.replace(log_path, compacting_path)
+        rationale_data = self._fold(session_id, session_dir, include_live_log=False)
+        rationale_data[self.MARKER_KEY] = self._log_marker(compacting_path)
+
+        snapshot_path = session_dir / self.SNAPSHOT_NAME
+        temp_path = session_dir / f".{self.SNAPSHOT_NAME}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(rationale_data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, snapshot_path)
+        compacting_path.unlink()
+
+
+# Global instance
+rationale_log = RationaleLog()
+atexit.register(rationale_log.flush)
+
 
 class RationaleManager:
     """
     Minimal RationaleManager for tracking AI agent decision-making process.
     Only implements essential methods needed by the system.
     """
-    
+
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.rationale_file = self._get_rationale_file_path()
-        self._ensure_rationale_file_exists()
-    
-    def _get_rationale_file_path(self) -> Path:
-        """Get the path to the rationale file for this session."""
+        self.session_dir = self._get_rationale_dir()
+
+    def _get_rationale_dir(self) -> Path:
+        """Get the directory holding this session's rationale log."""
         # Use the same directory structure as the existing system
-        rationale_dir = Path("temp_ui_files") / self.session_id
-        rationale_dir.mkdir(parents=True, exist_ok=True)
-        return rationale_dir / "rationale.json"
-    
-    def _ensure_rationale_file_exists(self):
-        """Create rationale file with default structure if it doesn't exist."""
-        if not self.rationale_file.exists():
-            default_rationale = {
-                "session_id": self.session_id,
-                "created_at": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat(),
-                "requirements_analysis": [],
-                "template_selection": {
-                    "recommendations": [],
-                    "final_selection": None,
-                    "selection_reasoning": ""
-                },
-                "question_generation": [],
-                "ui_editing": {
-                    "planning_rationale": [],
-                    "execution_summary": []
-                },
-                "overall_workflow": {
-                    "phase_decisions": [],
-                    "agent_coordination": []
-                }
-            }
-            self._save_rationale(default_rationale)
-    
-    def _load_rationale(self) -> Dict[str, Any]:
-        """Load rationale data from file."""
-        try:
-            if self.rationale_file.exists():
-                with open(self.rationale_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"Warning: Failed to load rationale: {e}")
-            return {}
-    
-    def _save_rationale(self, rationale_data: Dict[str, Any]):
-        """Save rationale data to file."""
-        try:
-            rationale_data["last_updated"] = datetime.now().isoformat()
-            with open(self.rationale_file, 'w', encoding='utf-8') as f:
-                json.dump(rationale_data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Warning: Failed to save rationale: {e}")
-    
+        return Path("temp_ui_files") / self.session_id
+
+    def _record(self, *events: Dict[str, Any]):
+        """Log rationale events without rewriting earlier ones."""
+        timestamp = datetime.now().isoformat()
+        for event in events:
+            event["timestamp"] = timestamp
+        rationale_log.record(self.session_id, self.session_dir, list(events))
+
     def add_template_recommendation_rationale(self, recommendations: List[Dict[str, Any]], selected_template: Optional[Dict[str, Any]] = None):
         """
         Store template recommendation rationale.
-        
+
         Args:
             recommendations: List of template recommendations
             selected_template: The selected template (optional)
         """
         try:
-            rationale_data = self._load_rationale()
-            
-            # Update recommendations
-            rationale_data["template_selection"]["recommendations"] = recommendations
-            
+            events = [{"op": "set", "path": ["template_selection", "recommendations"], "value": recommendations}]
+
             # Update final selection if provided
             if selected_template:
-                rationale_data["template_selection"]["final_selection"] = selected_template
-                rationale_data["template_selection"]["selection_reasoning"] = f"Template selected at {datetime.now().isoformat()}"
-            
-            self._save_rationale(rationale_data)
-            
+                events.append({"op": "set", "path": ["template_selection", "final_selection"], "value": selected_template})
+                events.append({
+                    "op": "set",
+                    "path": ["template_selection", "selection_reasoning"],
+                    "value": f"Template selected at {datetime.now().isoformat()}"
+                })
+
+            self._record(*events)
+
         except Exception as e:
-            print(f"Warning: Failed to add template recommendation rationale: {e}")
-    
+            logger.warning(f"Failed to add template recommendation rationale: {e}")
+
     def add_ui_editing_planning_rationale(self, plan: Dict[str, Any], user_feedback: str):
         """
         Store UI editing planning rationale.
-        
+
         Args:
             plan: The modification plan
             user_feedback: User's original request
         """
         try:
-            rationale_data = self._load_rationale()
-            
             planning_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "user_request": user_feedback,
                 "plan": plan
             }
-            
-            rationale_data["ui_editing"]["planning_rationale"].append(planning_entry)
-            
-            # Keep only last 10 planning entries to prevent file bloat
-            if len(rationale_data["ui_editing"]["planning_rationale"]) > 10:
-                rationale_data["ui_editing"]["planning_rationale"] = rationale_data["ui_editing"]["planning_rationale"][-10:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["ui_editing", "planning_rationale"], "value": planning_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add UI editing planning rationale: {e}")
-    
+            logger.warning(f"Failed to add UI editing planning rationale: {e}")
+
     def add_ui_editing_execution_summary(self, result: Dict[str, Any], user_request: str):
         """
         Store UI editing execution summary.
-        
+
         Args:
             result: The execution result
             user_request: User's original request
         """
         try:
-            rationale_data = self._load_rationale()
-            
             execution_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "user_request": user_request,
                 "result": result
             }
-            
-            rationale_data["ui_editing"]["execution_summary"].append(execution_entry)
-            
-            # Keep only last 10 execution entries to prevent file bloat
-            if len(rationale_data["ui_editing"]["execution_summary"]) > 10:
-                rationale_data["ui_editing"]["execution_summary"] = rationale_data["ui_editing"]["execution_summary"][-10:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["ui_editing", "execution_summary"], "value": execution_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add UI editing execution summary: {e}")
-    
+            logger.warning(f"Failed to add UI editing execution summary: {e}")
+
     def add_requirements_rationale(self, requirements: Dict[str, Any], analysis_summary: str):
         """
         Store requirements analysis rationale.
-        
+
         Args:
             requirements: The requirements data
             analysis_summary: Summary of the analysis
         """
         try:
-            rationale_data = self._load_rationale()
-            
             requirements_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "requirements": requirements,
                 "analysis_summary": analysis_summary
             }
-            
-            if "requirements_analysis" not in rationale_data:
-                rationale_data["requirements_analysis"] = []
-            
-            rationale_data["requirements_analysis"].append(requirements_entry)
-            
-            # Keep only last 5 entries
-            if len(rationale_data["requirements_analysis"]) > 5:
-                rationale_data["requirements_analysis"] = rationale_data["requirements_analysis"][-5:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["requirements_analysis"], "value": requirements_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add requirements rationale: {e}")
-    
+            logger.warning(f"Failed to add requirements rationale: {e}")
+
     def add_workflow_decision(self, phase: str, decision: str, reasoning: str, context: Dict[str, Any] = None):
         """
         Store workflow decision rationale.
-        
+
         Args:
             phase: The workflow phase
             decision: The decision made
@@ -190,8 +324,6 @@ class RationaleManager:
             context: Additional context
         """
         try:
-            rationale_data = self._load_rationale()
-            
             decision_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "phase": phase,
@@ -199,22 +331,16 @@ class RationaleManager:
                 "reasoning": reasoning,
                 "context": context or {}
             }
-            
-            rationale_data["overall_workflow"]["phase_decisions"].append(decision_entry)
-            
-            # Keep only last 10 decisions
-            if len(rationale_data["overall_workflow"]["phase_decisions"]) > 10:
-                rationale_data["overall_workflow"]["phase_decisions"] = rationale_data["overall_workflow"]["phase_decisions"][-10:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["overall_workflow", "phase_decisions"], "value": decision_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add workflow decision: {e}")
-    
+            logger.warning(f"Failed to add workflow decision: {e}")
+
     def add_agent_coordination(self, from_agent: str, to_agent: str, action: str, reasoning: str, data: Dict[str, Any] = None):
         """
         Store agent coordination rationale.
-        
+
         Args:
             from_agent: Source agent
             to_agent: Target agent
@@ -223,8 +349,6 @@ class RationaleManager:
             data: Data passed between agents
         """
         try:
-            rationale_data = self._load_rationale()
-            
             coordination_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "from_agent": from_agent,
@@ -233,58 +357,41 @@ class RationaleManager:
                 "reasoning": reasoning,
                 "data": data or {}
             }
-            
-            rationale_data["overall_workflow"]["agent_coordination"].append(coordination_entry)
-            
-            # Keep only last 10 coordination entries
-            if len(rationale_data["overall_workflow"]["agent_coordination"]) > 10:
-                rationale_data["overall_workflow"]["agent_coordination"] = rationale_data["overall_workflow"]["agent_coordination"][-10:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["overall_workflow", "agent_coordination"], "value": coordination_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add agent coordination: {e}")
-    
+            logger.warning(f"Failed to add agent coordination: {e}")
+
     def add_question_generation_rationale(self, questions: List[Dict[str, Any]], reasoning: str):
         """
         Store question generation rationale.
-        
+
         Args:
             questions: Generated questions
             reasoning: Reasoning for question generation
         """
         try:
-            rationale_data = self._load_rationale()
-            
             question_entry = {
                 "timestamp": datetime.now().isoformat(),
                 "questions": questions,
                 "reasoning": reasoning
             }
-            
-            if "question_generation" not in rationale_data:
-                rationale_data["question_generation"] = []
-            
-            rationale_data["question_generation"].append(question_entry)
-            
-            # Keep only last 5 entries
-            if len(rationale_data["question_generation"]) > 5:
-                rationale_data["question_generation"] = rationale_data["question_generation"][-5:]
-            
-            self._save_rationale(rationale_data)
-            
+
+            self._record({"op": "append", "path": ["question_generation"], "value": question_entry})
+
         except Exception as e:
-            print(f"Warning: Failed to add question generation rationale: {e}")
-    
+            logger.warning(f"Failed to add question generation rationale: {e}")
+
     def load_rationale(self) -> Dict[str, Any]:
         """
         Load all rationale data for the session.
-        
+
         Returns:
-            Dict containing all rationale data
+            Dict containing all rationale data, folded from the snapshot and the event log
         """
         try:
-            return self._load_rationale()
+            return rationale_log.fold(self.session_id, self.session_dir)
         except Exception as e:
-            print(f"Warning: Failed to load rationale: {e}")
+            logger.warning(f"Failed to load rationale: {e}")
             return {}
@@ -0,0 +1,112 @@
+"""
+Recommendation Cache - Reuses template recommendations for identical requirements
+
+Requirements are reduced to a canonical shape (normalised page type, sorted
+style preferences and key features, target audience) and hashed together with
+the template catalog version, so any template write makes old entries miss.
+The cache is also cleared from the template cache's invalidation listener;
+both rely on the template watcher, which runs from startup.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.template_cache import template_cache
+from utils.category_normalizer import normalize_category
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_terms(values: Any) -> List[str]:
+    if isinstance(values, str):
+        values = [values]
+    return sorted({str(value).strip().lower() for value in values or [] if str(value).strip()})
+
+
+def canonical_requirements(requirements: Dict[str, Any], category: Optional[str] = None) -> Dict[str, Any]:
+    """Reduce requirements to the fields that drive a recommendation"""
+    page_type = requirements.get("page_type") or category
+    return {
+        "page_type": normalize_category(page_type) or "",
+        "style_preferences": _normalize_terms(requirements.get("style_preferences")),
+        "key_features": _normalize_terms(requirements.get("key_features")),
+        "target_audience": str(requirements.get("target_audience") or "").strip().lower(),
+    }
+
+
+class RecommendationCache:
+    """LRU + TTL cache of scored recommendations keyed by requirements and catalog version"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "256"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))
+        self.enabled = os.getenv("RECOMMENDATION_CACHE_ENABLED", "true").lower() != "false"
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "clears": 0}
+
+    def make_key(self, requirements: Dict[str, Any], category: Optional[str] = None) -> str:
+        """Canonical hash of the requirements plus the current catalog version"""
+        payload = {
+            "requirements": canonical_requirements(requirements, category),
+            "catalog_version": template_cache.catalog_version,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Get a copy of cached recommendations, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, recommendations: List[Dict[str, Any]]):
+        """Store recommendations under key"""
+        if not self.enabled or not recommendations:
+            return
+        # Entries are only safe to keep while template writes are being followed
+        # (main.py starts the watcher at startup; this covers scripts that do not)
+        template_cache.start_watcher()
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(recommendations))
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, template_id: Optional[str] = None):
+        """Drop every entry; used as the template invalidation listener"""
+        with self._lock:
+            self._entries.clear()
+            self.stats["clears"] += 1
+        logger.debug(f"Recommendation cache cleared (template {template_id or 'all'} changed)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "enabled": self.enabled,
+                "invalidation_mode": template_cache.get_stats()["invalidation_mode"],
+            }
+
+
+# Global instance
+recommendation_cache = RecommendationCache()
+template_cache.add_invalidation_listener(recommendation_cache.clear)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+SQLite storage for UI codes - Same API as UICodeFileManager
+
+Keeps a session's current and original code, metadata and modification
+history in one SQLite database in WAL mode. Every save is a single
+transaction, so readers never see a half-written session, and listing
+sessions or reading their metadata are indexed queries instead of
+directory scans. Enabled with UI_CODE_STORAGE_BACKEND=sqlite.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .file_manager import UICodeFileManager
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ui_sessions (
+        session_id TEXT PRIMARY KEY,
+        template_id TEXT,
+        last_updated TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        html_export TEXT NOT NULL,
+        style_css TEXT NOT NULL,
+        globals_css TEXT NOT NULL,
+        original_html_export TEXT NOT NULL,
+        original_style_css TEXT NOT NULL,
+        original_globals_css TEXT NOT NULL,
+        pruned_rules TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_ui_sessions_last_updated ON ui_sessions (last_updated);
+    CREATE TABLE IF NOT EXISTS ui_session_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        entry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ui_session_history_session ON ui_session_history (session_id, id);
+"""
+
+
+class SQLiteUICodeFileManager(UICodeFileManager):
+    """Manages UI codes in a transactional SQLite database"""
+
+    def __init__(self, base_dir: str = "temp_ui_files", db_path: Optional[str] = None):
+        super().__init__(base_dir=base_dir)
+        self.db_path = db_path or os.getenv("UI_CODE_SQLITE_PATH", str(self.base_dir / "ui_codes.db"))
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; writes are serialised by SQLite"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def session_exists(self, session_id: str) -> bool:
+        """Check if a session row exists"""
+        row = self._connection().execute("SELECT 1 FROM ui_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None
+
+    def create_session(self, session_id: str, template_data: Dict[str, Any]) -> bool:
+        """Create (or replace) a session in one transaction"""
+        try:
+            self.logger.info(f"Creating session {session_id} with template data: {list(template_data.keys())}")
+            self._discard_pending(session_id)
+            self._invalidate_cached_session(session_id)
+            html_content = self._clean_html_content(template_data.get("html_export", ""))
+            style_css = template_data.get("style_css", "")
+            globals_css = template_data.get("globals_css", "")
+
+            css_pruning = None
+            pruned_rules = ""
+            if os.getenv("CSS_PRUNING_ENABLED", "true").lower() == "true":
+                style_css, globals_css, css_pruning, pruned_rules = self._prune_unused_css(
+                    html_content, style_css, globals_css, template_data.get("template_id", "")
+                )
+
+            metadata = self._build_metadata(session_id, template_data, css_pruning)
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute("DELETE FROM ui_session_history WHERE session_id = ?", (session_id,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO ui_sessions (session_id, template_id, last_updated, metadata, "
+                    "html_export, style_css, globals_css, original_html_export, original_style_css, original_globals_css, pruned_rules) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, metadata["template_id"], metadata["last_updated"], json.dumps(metadata, ensure_ascii=False),
+                     html_content, style_css, globals_css, html_content, style_css, globals_css, pruned_rules or None)
+                )
+
+            self.logger.info(f"Session {session_id} created successfully")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error creating session {session_id}: {e}")
+            return False
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load a session and its history from one read transaction"""
+        try:
+            self.flush(session_id)
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN")
+                # Every save updates last_updated and appends history, so the pair versions the session
+                version = connection.execute(
+                    "SELECT last_updated, (SELECT MAX(id) FROM ui_session_history WHERE session_id = ?) "
+                    "FROM ui_sessions WHERE session_id = ?", (session_id, session_id)
+                ).fetchone()
+                if version is None:
+                    self.logger.warning(f"Session does not exist: {session_id}")
+                    return None
+                cached = self._get_cached_session(session_id, version)
+                if cached is not None:
+                    return cached
+                row = connection.execute(
+                    "SELECT html_export, style_css, globals_css, metadata FROM ui_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                modifications = self._history_entries(connection, session_id)
+
+            html_content, style_css, globals_css, metadata = row
+            session_data = self._build_session_data(session_id, html_content, style_css, globals_css, json.loads(metadata), modifications)
+            self._cache_session(session_id, version, session_data)
+            return session_data
+
+        except Exception as e:
+            self.logger.error(f"Error loading session {session_id}: {e}")
+            return None
+
+    def _persist_save(self, session_id: str, codes: tuple, history_entries: List[Dict[str, Any]]) -> bool:
+        """Save codes, metadata and the history entries atomically"""
+        try:
+            html_content, style_css, globals_css = codes
+
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute("SELECT metadata, pruned_rules FROM ui_sessions WHERE session_id = ?", (session_id,)).fetchone()
+                if row is None:
+                    self.logger.error(f"Session not found: {session_id}")
+                    return False
+                style_css, globals_css = self._restore_pruned_rules(html_content, style_css, globals_css, row[1])
+                metadata = json.loads(row[0])
+                metadata["last_updated"] = datetime.now().isoformat()
+                connection.execute(
+                    "UPDATE ui_sessions SET html_export = ?, style_css = ?, globals_css = ?, metadata = ?, last_updated = ? "
+                    "WHERE session_id = ?",
+                    (html_content, style_css, globals_css, json.dumps(metadata, ensure_ascii=False), metadata["last_updated"], session_id)
+                )
+                self._append_history(connection, session_id, history_entries)
+            self._invalidate_cached_session(session_id)
+
+            self.logger.info(f"Session {session_id} saved successfully")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error saving session {session_id}: {e}")
+            return False
+
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session, its history and any side files in its directory"""
+        try:
+            self._discard_pending(session_id)
+            self._invalidate_cached_session(session_id)
+            self._forget_file_hashes(session_id)
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                deleted = connection.execute("DELETE FROM ui_sessions WHERE session_id = ?", (session_id,)).rowcount
+                connection.execute("DELETE FROM ui_session_history WHERE session_id = ?", (session_id,))
+            session_dir = self.get_session_dir(session_id)
+            if session_dir.exists():
+                import shutil
+                shutil.rmtree(session_dir)
+            return bool(deleted)
+        except Exception as e:
+            self.logger.error(f"Error deleting session {session_id}: {e}")
+            return False
+
+    def reset_to_original(self, session_id: str) -> bool:
+        """Copy the original codes over the current ones in one transaction"""
+        try:
+            self.flush(session_id)
+            now = datetime.now().isoformat()
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute(
+                    "SELECT metadata, original_html_export, original_style_css, original_globals_css, pruned_rules "
+                    "FROM ui_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    self.logger.error(f"Session does not exist: {session_id}")
+                    return False
+                metadata = json.loads(row[0])
+                metadata["last_updated"] = now
+                metadata["reset_to_original"] = True
+                html_content = row[1]
+                style_css, globals_css = self._restore_pruned_rules(html_content, row[2], row[3], row[4])
+                connection.execute(
+                    "UPDATE ui_sessions SET html_export = ?, style_css = ?, globals_css = ?, metadata = ?, last_updated = ? "
+                    "WHERE session_id = ?",
+                    (html_content, style_css, globals_css, json.dumps(metadata, ensure_ascii=False), now, session_id)
+                )
+                self._append_history(connection, session_id, [self._make_reset_entry()])
+            self._invalidate_cached_session(session_id)
+
+            self.logger.info(f"Successfully reset session {session_id} to original state")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error resetting session {session_id} to original: {e}")
+            return False
+
+    def list_sessions(self) -> List[str]:
+        """List all session IDs"""
+        try:
+            return [row[0] for row in self._connection().execute("SELECT session_id FROM ui_sessions")]
+        except Exception as e:
+            self.logger.error(f"Error listing sessions: {e}")
+            return []
+
+    def list_idle_sessions(self, idle_since: float, limit: Optional[int] = None) -> List[str]:
+        """Indexed lookup of sessions last updated before idle_since"""
+        rows = self._connection().execute(
+            "SELECT session_id FROM ui_sessions WHERE last_updated < ? ORDER BY last_updated LIMIT ?",
+            (datetime.fromtimestamp(idle_since).isoformat(), -1 if limit is None else limit)
+        )
+        return [row[0] for row in rows]
+
+    def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get basic session information"""
+        try:
+            self.flush(session_id)
+            row = self._connection().execute("SELECT metadata FROM ui_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            self.logger.error(f"Error getting session info for {session_id}: {e}")
+            return None
+
+    def export_files(self, session_id: str) -> Optional[Dict[str, bytes]]:
+        """The session row and history rendered as the file backend's files"""
+        self.flush(session_id)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            row = connection.execute(
+                "SELECT html_export, style_css, globals_css, original_html_export, original_style_css, "
+                "original_globals_css, pruned_rules, metadata FROM ui_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            modifications = self._history_entries(connection, session_id)
+
+        files = dict(zip(
+            ("index.html", "style.css", "globals.css", "original_index.html", "original_style.css", "original_globals.css", "pruned_rules.css"),
+            row[:7]
+        ))
+        files["metadata.json"] = row[7]
+        files["history.json"] = json.dumps({
+            "modifications": modifications,
+            "total_modifications": len(modifications),
+            "last_modification": modifications[-1].get("timestamp") if modifications else None
+        }, indent=2, ensure_ascii=False)
+        return {name: content.encode('utf-8') for name, content in files.items() if content is not None}
+
+    def import_files(self, session_id: str, files: Dict[str, bytes]) -> bool:
+        """Restore files produced by export_files as one transaction"""
+        try:
+            self._discard_pending(session_id)
+            text = {name: content.decode('utf-8') for name, content in files.items()}
+            metadata = json.loads(text["metadata.json"])
+            metadata["session_id"] = session_id
+            history = json.loads(text.get("history.json", "{}"))
+
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute("DELETE FROM ui_session_history WHERE session_id = ?", (session_id,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO ui_sessions (session_id, template_id, last_updated, metadata, "
+                    "html_export, style_css, globals_css, original_html_export, original_style_css, original_globals_css, pruned_rules) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, metadata.get("template_id", ""), metadata.get("last_updated") or datetime.now().isoformat(),
+                     json.dumps(metadata, ensure_ascii=False), text.get("index.html", ""), text.get("style.css", ""),
+                     text.get("globals.css", ""), text.get("original_index.html", text.get("index.html", "")),
+                     text.get("original_style.css", text.get("style.css", "")),
+                     text.get("original_globals.css", text.get("globals.css", "")), text.get("pruned_rules.css"))
+                )
+                self._append_history(connection, session_id, history.get("modifications", []))
+            self._invalidate_cached_session(session_id)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error importing session {session_id}: {e}")
+            return False
+
+    def _import_history(self, session_id: str, history: Dict[str, Any]) -> None:
+        """Replace a session's history with migrated entries"""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM ui_session_history WHERE session_id = ?", (session_id,))
+            self._append_history(connection, session_id, history.get("modifications", []))
+        self._invalidate_cached_session(session_id)
+
+    def _history_entries(self, connection: sqlite3.Connection, session_id: str) -> List[Dict[str, Any]]:
+        return [
+            json.loads(entry)
+            for (entry,) in connection.execute("SELECT entry FROM ui_session_history WHERE session_id = ? ORDER BY id", (session_id,))
+        ]
+
+    def _append_history(self, connection: sqlite3.Connection, session_id: str, entries: List[Dict[str, Any]]) -> None:
+        connection.executemany(
+            "INSERT INTO ui_session_history (session_id, entry) VALUES (?, ?)",
+            [(session_id, json.dumps(entry, ensure_ascii=False, default=str)) for entry in entries]
+        )
@@ -0,0 +1,173 @@
+"""
+Template Ranker - Local similarity pre-ranking of templates
+
+Scores templates against the analysed requirements with hashed word and
+character n-gram features over tags, name and description, using cosine
+similarity in NumPy. The recommendation agent uses it to shortlist the
+candidates sent to the LLM, or to skip the LLM when the winner is obvious.
+"""
+
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Tags are curated, descriptions are prose
+FIELD_WEIGHTS = {"tags": 2.0, "name": 1.0, "category": 1.0, "description": 1.0}
+
+
+class TemplateRanker:
+    """Hashed n-gram cosine ranker with per-template feature caching"""
+
+    def __init__(self, n_features: int = 2 ** 12, ngram_size: int = 3, max_cache_entries: int = 20000):
+        self.n_features = n_features
+        self.ngram_size = ngram_size
+        self.max_cache_entries = max_cache_entries
+        self._features: "OrderedDict[Tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._batch_keys: Optional[List[Tuple]] = None
+        self._batch: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Feature extraction
+    # ------------------------------------------------------------------
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens = []
+        for word in WORD_PATTERN.findall(text.lower()):
+            tokens.append(f"w:{word}")
+            padded = f"#{word}#"
+            for start in range(max(1, len(padded) - self.ngram_size + 1)):
+                tokens.append(f"c:{padded[start:start + self.ngram_size]}")
+        return tokens
+
+    def _hash_features(self, weighted_texts: List[Tuple[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Signed feature hashing into sparse (indices, values), L2-normalised"""
+        counts: Dict[int, float] = {}
+        for text, weight in weighted_texts:
+            for token in self._tokens(text):
+                hashed = zlib.crc32(token.encode("utf-8"))
+                index = hashed % self.n_features
+                sign = 1.0 if (hashed >> 31) & 1 == 0 else -1.0
+                counts[index] = counts.get(index, 0.0) + sign * weight
+
+        if not counts:
+            # reduceat needs at least one entry per template
+            return np.zeros(1, dtype=np.int32), np.zeros(1, dtype=np.float32)
+
+        indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = float(np.linalg.norm(values))
+        if norm > 0:
+            values /= norm
+        return indices, values
+
+    @staticmethod
+    def _template_key(template: Dict[str, Any]) -> Tuple:
+        """Cache key covering every field that feeds the features"""
+        return (
+            str(template.get("template_id") or template.get("_id") or ""),
+            str(template.get("name") or ""),
+            str(template.get("category") or ""),
+            str(template.get("description") or ""),
+            tuple(str(tag) for tag in template.get("tags") or []),
+        )
+
+    def _template_features(self, key: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            cached = self._features.get(key)
+            if cached is not None:
+                self._features.move_to_end(key)
+                return cached
+
+        _, name, category, description, tags = key
+        features = self._hash_features([
+            (" ".join(tags), FIELD_WEIGHTS["tags"]),
+            (name, FIELD_WEIGHTS["name"]),
+            (category, FIELD_WEIGHTS["category"]),
+            (description, FIELD_WEIGHTS["description"]),
+        ])
+        with self._lock:
+            self._features[key] = features
+            while len(self._features) > self.max_cache_entries:
+                self._features.popitem(last=False)
+        return features
+
+    def _query_vector(self, requirements: Dict[str, Any]) -> np.ndarray:
+        style_preferences = requirements.get("style_preferences") or []
+        key_features = requirements.get("key_features") or []
+        indices, values = self._hash_features([
+            (" ".join(str(item) for item in style_preferences), 2.0),
+            (" ".join(str(item) for item in key_features), 1.5),
+            (str(requirements.get("page_type") or ""), 1.0),
+            (str(requirements.get("target_audience") or ""), 0.5),
+        ])
+        query = np.zeros(self.n_features, dtype=np.float32)
+        np.add.at(query, indices, values)
+        return query
+
+    def _build_batch(self, templates: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Concatenate the sparse template vectors so one reduceat scores all of them"""
+        keys = [self._template_key(template) for template in templates]
+        with self._lock:
+            if self._batch is not None and keys == self._batch_keys:
+                return self._batch
+
+        features = [self._template_features(key) for key in keys]
+        lengths = np.fromiter((len(indices) for indices, _ in features), dtype=np.int64, count=len(features))
+        offsets = np.zeros(len(features), dtype=np.int64)
+        if len(features) > 1:
+            np.cumsum(lengths[:-1], out=offsets[1:])
+        all_indices = np.concatenate([indices for indices, _ in features])
+        all_values = np.concatenate([values for _, values in features])
+
+        batch = (all_indices, all_values, offsets)
+        with self._lock:
+            self._batch_keys = keys
+            self._batch = batch
+        return batch
+
+    # ------------------------------------------------------------------
+    # Ranking
+    # ------------------------------------------------------------------
+
+    def score(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]]) -> np.ndarray:
+        """Cosine similarity of every template to the requirements"""
+        if not templates:
+            return np.zeros(0, dtype=np.float32)
+        query = self._query_vector(requirements)
+        all_indices, all_values, offsets = self._build_batch(templates)
+        return np.add.reduceat(query[all_indices] * all_values, offsets)
+
+    def rank(self, requirements: Dict[str, Any], templates: List[Dict[str, Any]],
+             top_k: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Return (template, similarity) pairs sorted best first"""
+        scores = self.score(requirements, templates)
+        if not len(scores):
+            return []
+        if top_k is not None and top_k < len(scores):
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        return [(templates[index], float(scores[index])) for index in order]
+
+    @staticmethod
+    def is_decisive(ranked: List[Tuple[Dict[str, Any], float]], margin: float, min_score: float) -> bool:
+        """True when the best template clearly beats the runner-up"""
+        if len(ranked) < 2:
+            return False
+        best, runner_up = ranked[0][1], ranked[1][1]
+        return best >= min_score and best - runner_up >= margin
+
+
+# Global instance
+template_ranker = TemplateRanker()
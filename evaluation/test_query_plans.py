@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Query Plan Testing Script
+Runs explain() on the template listing queries and checks that they are served
+by indexes (IXSCAN, no COLLSCAN) and do not return the large code fields
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from db import get_db, ensure_indexes, TEMPLATE_LISTING_PROJECTION
+
+LARGE_FIELDS = ("html_export", "globals_css", "style_css")
+
+
+class QueryPlanTester:
+    def __init__(self):
+        self.db = get_db()
+        self.results_dir = "evaluation_result"
+        self.tags = ["modern", "minimal", "dark"]
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    def listing_queries(self) -> Dict[str, Dict[str, Any]]:
+        """The filters used by the MongoDB/database tools"""
+        return {
+            "templates_by_category": {"category_key": "signup"},
+            "templates_by_tags": {"tags": {"$in": self.tags}},
+            "templates_by_tags_and_category": {"tags": {"$in": self.tags}, "category_key": "login"},
+        }
+
+    @staticmethod
+    def collect_stages(plan: Dict[str, Any]) -> List[str]:
+        """Flatten the stage names of a winning plan"""
+        stages = []
+        stack = [plan]
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, dict):
+                continue
+            if "stage" in node:
+                stages.append(node["stage"])
+            for key in ("inputStage", "queryPlan"):
+                if key in node:
+                    stack.append(node[key])
+            stack.extend(node.get("inputStages", []))
+        return stages
+
+    def check_query(self, name: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        explain = self.db.templates.find(query, TEMPLATE_LISTING_PROJECTION).explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = self.collect_stages(winning_plan)
+        execution = explain.get("executionStats", {})
+
+        sample = self.db.templates.find_one(query, TEMPLATE_LISTING_PROJECTION) or {}
+        leaked_fields = [field for field in LARGE_FIELDS if field in sample]
+
+        result = {
+            "query": name,
+            "stages": stages,
+            "uses_index": "IXSCAN" in stages,
+            "collection_scan": "COLLSCAN" in stages,
+            "docs_examined": execution.get("totalDocsExamined"),
+            "leaked_fields": leaked_fields,
+        }
+        result["passed"] = result["uses_index"] and not result["collection_scan"] and not leaked_fields
+        return result
+
+    def run_query_plan_tests(self) -> List[Dict[str, Any]]:
+        print("🔄 Starting Query Plan Testing")
+        print("=" * 70)
+        print(f"Indexes: {ensure_indexes(self.db)}")
+
+        results = []
+        for name, query in self.listing_queries().items():
+            result = self.check_query(name, query)
+            status = "✅" if result["passed"] else "❌"
+            print(f"{status} {name}: stages={result['stages']} leaked={result['leaked_fields']}")
+            results.append(result)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.results_dir, f"query_plans_{timestamp}.json")
+        with open(output_file, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results saved to {output_file}")
+
+        if not all(result["passed"] for result in results):
+            sys.exit(1)
+        return results
+
+
+if __name__ == "__main__":
+    tester = QueryPlanTester()
+    tester.run_query_plan_tests()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Template Pre-Ranker Latency Testing Script
+Measures local similarity ranking time over a synthetic catalog of 10k templates
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from utils.template_ranker import TemplateRanker
+
+
+class RankerLatencyTester:
+    def __init__(self):
+        self.results_dir = "evaluation_result"
+        self.catalog_size = 10000
+        self.trials = 20
+        self.categories = ["login", "signup", "landing", "profile", "about"]
+        self.vocabulary = [
+            "modern", "minimal", "dark theme", "light", "professional", "colorful", "gradient",
+            "glassmorphism", "social login", "form", "hero section", "pricing", "testimonials",
+            "gallery", "responsive", "sidebar", "dashboard", "card layout", "purple accents",
+            "corporate", "playful", "elegant", "futuristic", "onboarding", "newsletter",
+        ]
+        self.requirement_samples = [
+            {"page_type": "login", "style_preferences": ["dark", "modern"], "key_features": ["social login"]},
+            {"page_type": "landing", "style_preferences": ["colorful"], "key_features": ["pricing", "testimonials"]},
+            {"page_type": "profile", "style_preferences": ["minimal", "elegant"], "key_features": ["gallery"]},
+        ]
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    def build_catalog(self) -> List[Dict[str, Any]]:
+        rng = random.Random(42)
+        catalog = []
+        for index in range(self.catalog_size):
+            category = rng.choice(self.categories)
+            tags = rng.sample(self.vocabulary, 6)
+            catalog.append({
+                "template_id": f"tpl-{index}",
+                "name": f"{category.title()} UI Template {index}",
+                "category": category,
+                "description": f"A {' '.join(tags[:3])} {category} page for {rng.choice(['startups', 'students', 'agencies'])}",
+                "tags": tags,
+            })
+        return catalog
+
+    def time_call(self, func) -> float:
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    def run_ranker_tests(self) -> Dict[str, Any]:
+        print(f"🔄 Starting Pre-Ranker Latency Testing ({self.catalog_size} templates)")
+        print("=" * 70)
+
+        catalog = self.build_catalog()
+        ranker = TemplateRanker()
+
+        cold_ms = self.time_call(lambda: ranker.rank(self.requirement_samples[0], catalog, top_k=6))
+        print(f"Cold rank (feature extraction + scoring): {cold_ms:.1f} ms")
+
+        warm_times = []
+        for trial in range(self.trials):
+            requirements = self.requirement_samples[trial % len(self.requirement_samples)]
+            warm_times.append(self.time_call(lambda: ranker.rank(requirements, catalog, top_k=6)))
+
+        results = {
+            "catalog_size": self.catalog_size,
+            "n_features": ranker.n_features,
+            "cold_ms": round(cold_ms, 2),
+            "warm_mean_ms": round(statistics.mean(warm_times), 2),
+            "warm_median_ms": round(statistics.median(warm_times), 2),
+            "warm_max_ms": round(max(warm_times), 2),
+            "trials": self.trials,
+        }
+        print(f"Warm rank: mean {results['warm_mean_ms']} ms, median {results['warm_median_ms']} ms, max {results['warm_max_ms']} ms")
+
+        top = ranker.rank(self.requirement_samples[0], catalog, top_k=3)
+        print("Top matches for a dark modern login page:")
+        for template, score in top:
+            print(f"  {score:.3f}  {template['name']}  {template['tags']}")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.results_dir, f"ranker_latency_{timestamp}.json")
+        with open(output_file, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results saved to {output_file}")
+        return results
+
+
+if __name__ == "__main__":
+    tester = RankerLatencyTester()
+    tester.run_ranker_tests()